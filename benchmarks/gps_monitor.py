@@ -0,0 +1,110 @@
+'''
+Per-message overhead of GpsMonitor (gpsd connection -> parsing -> history / geofences / odometer / position).
+
+The fake gpsd (msu_manager/gps/fakegpsd.py) runs in a separate process, so the measured CPU time is the monitor's only.
+
+Usage:
+    python -m benchmarks.gps_monitor [--rates 1 10 50 0] [--duration-s 5] [--output result.json]
+
+A rate of 0 sends as fast as possible. The result is printed as JSON (one entry per rate).
+'''
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from gpsd_client_async import TpvMessage
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.monitor import GpsMonitor
+
+STARTUP_TIMEOUT_S = 10
+
+
+class CountingGpsMonitor(GpsMonitor):
+    def __init__(self, config: GpsConfig):
+        super().__init__(config)
+        self.tpv_count = 0
+
+    def _handle_tpv(self, message: TpvMessage) -> None:
+        super()._handle_tpv(message)
+        self.tpv_count += 1
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def run_rate(rate_hz: float, duration_s: float) -> Dict:
+    port = free_port()
+    fake_gpsd = await asyncio.create_subprocess_exec(sys.executable, '-m', 'msu_manager.gps.fakegpsd', '--port', str(port), '--rate-hz', str(rate_hz))
+    try:
+        await wait_for_port(port)
+        monitor = CountingGpsMonitor(GpsConfig(enabled=True, gpsd_port=port))
+        task = asyncio.create_task(monitor.run())
+        # Warm up, then measure
+        await asyncio.sleep(0.5)
+        start_count = monitor.tpv_count
+        start_cpu = time.process_time()
+        start = time.monotonic()
+        await asyncio.sleep(duration_s)
+        cpu_s = time.process_time() - start_cpu
+        elapsed_s = time.monotonic() - start
+        count = monitor.tpv_count - start_count
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    finally:
+        fake_gpsd.terminate()
+        await fake_gpsd.wait()
+
+    return {
+        'rate_hz': rate_hz,
+        'messages_per_s': round(count / elapsed_s, 1),
+        'cpu_percent': round(100 * cpu_s / elapsed_s, 2),
+        'cpu_us_per_message': round(cpu_s * 1e6 / count, 1) if count > 0 else None,
+    }
+
+
+async def run_all(rates: List[float], duration_s: float) -> List[Dict]:
+    return [await run_rate(rate, duration_s) for rate in rates]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the per-message overhead of GpsMonitor')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1, 10, 50, 0], help='TPV rates to test (0 = as fast as possible)')
+    parser.add_argument('--duration-s', type=float, default=5)
+    parser.add_argument('--output', type=Path, default=None, help='Write JSON result to this file (default: stdout only)')
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all(args.rates, args.duration_s))
+    result_json = json.dumps(results, indent=2)
+    print(result_json)
+    if args.output is not None:
+        args.output.write_text(result_json)
+
+
+if __name__ == '__main__':
+    main()
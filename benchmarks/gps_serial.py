@@ -0,0 +1,257 @@
+'''
+Compares the two GpsMonitor sources for the same replayed NMEA stream: reading the receiver directly (source serial)
+and going through gpsd (source gpsd).
+
+A writer thread replays the NMEA epochs on a local TCP port at a fixed rate. For source serial, GpsMonitor reads them
+through pyserial's socket:// URL handler. For source gpsd, a gpsd on the PATH is started reading from that port
+(tcp:// device); without gpsd, the writer converts the epochs to gpsd JSON itself ("simulated", which only shows the
+monitor side of the gpsd path, not the time gpsd needs). Latency is measured from writing an epoch to the monitor
+handling its TPV, CPU time is the event loop thread's (plus the gpsd process's, if real).
+
+Usage:
+    python -m benchmarks.gps_serial [--input recording.nmea] [--rate-hz 10] [--duration-s 10] [--output result.json]
+
+Without --input, a synthetic recording (RMC, GGA, GSA, GSV per epoch) is used. The result is printed as JSON (one entry
+per source).
+'''
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from gpsd_client_async import TpvMessage
+
+from msu_manager.config import GpsConfig, GpsSource
+from msu_manager.gps.fakegpsd import METERS_PER_DEGREE_LAT
+from msu_manager.gps.monitor import GpsMonitor
+from msu_manager.gps.nmea import NmeaParser, format_sentence
+
+from .gps_monitor import free_port
+
+# Time of day (seconds) and the raw sentences of one epoch
+Epoch = Tuple[float, bytes]
+
+STARTUP_TIMEOUT_S = 10
+DRAIN_TIMEOUT_S = 2
+TIMED_SENTENCES = ('RMC', 'GGA', 'GLL', 'GST')
+
+
+def _time_of_day_s(value: str) -> float:
+    return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+
+
+def load_epochs(path: Path) -> List[Epoch]:
+    '''Groups the sentences of an NMEA recording into epochs by their time of day.'''
+    epochs = []
+    current_time = None
+    current = bytearray()
+    for line in path.read_bytes().splitlines():
+        line = line.strip()
+        if not line.startswith(b'$'):
+            continue
+        fields = line.split(b',')
+        if fields[0][3:].decode(errors='replace') in TIMED_SENTENCES and len(fields) > 1 and len(fields[1]) >= 6:
+            time_of_day = _time_of_day_s(fields[1].decode())
+            if time_of_day != current_time:
+                if current_time is not None:
+                    epochs.append((current_time, bytes(current)))
+                current_time = time_of_day
+                current = bytearray()
+        current += line + b'\r\n'
+    if current_time is not None:
+        epochs.append((current_time, bytes(current)))
+    return epochs
+
+
+def synthetic_epochs(count: int, rate_hz: float, lat: float = 52.52, lon: float = 13.40, speed_mps: float = 10) -> List[Epoch]:
+    epochs = []
+    for i in range(count):
+        time_of_day = 8 * 3600 + round(i / rate_hz, 2)
+        hours, rest = divmod(time_of_day, 3600)
+        minutes, seconds = divmod(rest, 60)
+        nmea_time = f'{int(hours):02d}{int(minutes):02d}{seconds:05.2f}'
+        current_lat = lat + i / rate_hz * speed_mps / METERS_PER_DEGREE_LAT
+        nmea_lat = f'{int(current_lat):02d}{(current_lat % 1) * 60:08.5f}'
+        nmea_lon = f'{int(lon):03d}{(lon % 1) * 60:08.5f}'
+        sentences = [
+            f'GNRMC,{nmea_time},A,{nmea_lat},N,{nmea_lon},E,{speed_mps / 0.514444:.3f},0.00,010125,,,A,V',
+            f'GNGGA,{nmea_time},{nmea_lat},N,{nmea_lon},E,1,12,0.80,50.0,M,40.0,M,,',
+            'GNGSA,A,3,02,05,07,09,13,14,20,30,,,,,1.50,0.80,1.20,1',
+            'GPGSV,3,1,12,02,45,060,40,05,45,150,40,07,45,210,40,09,45,270,40',
+            'GPGSV,3,2,12,13,45,030,40,14,45,090,40,20,45,120,40,30,45,180,40',
+            'GPGSV,3,3,12,01,10,240,20,03,10,300,20,04,10,330,20,06,10,000,20',
+        ]
+        epochs.append((time_of_day, b''.join(format_sentence(sentence) for sentence in sentences)))
+    return epochs
+
+
+def to_gpsd_json(data: bytes) -> bytes:
+    '''What gpsd would send for the given NMEA (used if there is no gpsd to run).'''
+    parser = NmeaParser(device='/dev/ttyREPLAY')
+    messages = parser.feed(data) + parser.flush()
+    return b''.join(message.model_dump_json(by_alias=True, exclude_none=True).encode() + b'\r\n' for message in messages)
+
+
+def simulated_gpsd_handshake(conn: socket.socket) -> None:
+    conn.sendall(b'{"class":"VERSION","release":"simulated","rev":"replay","proto_major":3,"proto_minor":15}\r\n')
+    conn.recv(4096)
+    conn.sendall(b'{"class":"DEVICES","devices":[{"class":"DEVICE","path":"/dev/ttyREPLAY"}]}\r\n{"class":"WATCH","enable":true,"json":true}\r\n')
+
+
+class ReplayWriter(threading.Thread):
+    def __init__(self, server_socket: socket.socket, epochs: List[Epoch], rate_hz: float,
+                 encode: Callable[[bytes], bytes] = bytes, handshake: Callable[[socket.socket], None] = None):
+        super().__init__(daemon=True)
+        self._server_socket = server_socket
+        self._epochs = epochs
+        self._rate_hz = rate_hz
+        self._encode = encode
+        self._handshake = handshake
+        # Rounded time of day -> perf_counter when the epoch was written
+        self.send_times: Dict[float, float] = {}
+        self.go = threading.Event()
+        self.done_sending = threading.Event()
+        self.release = threading.Event()
+
+    def run(self) -> None:
+        conn, _ = self._server_socket.accept()
+        with conn:
+            if self._handshake is not None:
+                self._handshake(conn)
+            self.go.wait()
+            start = time.perf_counter()
+            for idx, (time_of_day, data) in enumerate(self._epochs):
+                time.sleep(max(0, start + idx / self._rate_hz - time.perf_counter()))
+                payload = self._encode(data)
+                self.send_times[round(time_of_day, 3)] = time.perf_counter()
+                conn.sendall(payload)
+            self.done_sending.set()
+            # Keep the connection open until the reader has drained the socket
+            self.release.wait()
+
+
+class LatencyRecordingGpsMonitor(GpsMonitor):
+    def __init__(self, config: GpsConfig, send_times: Dict[float, float]):
+        super().__init__(config)
+        self._send_times = send_times
+        self.latencies_s: List[float] = []
+
+    def _handle_tpv(self, message: TpvMessage) -> None:
+        super()._handle_tpv(message)
+        if message.time is None:
+            return
+        t = message.time
+        sent = self._send_times.get(round(t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6, 3))
+        if sent is not None:
+            self.latencies_s.append(time.perf_counter() - sent)
+
+
+def _process_cpu_s(pid: int) -> float:
+    with open(f'/proc/{pid}/stat') as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    # utime and stime (fields 14 and 15)
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def run_source(source: GpsSource, epochs: List[Epoch], rate_hz: float) -> Dict:
+    server_socket = socket.create_server(('127.0.0.1', 0))
+    replay_port = server_socket.getsockname()[1]
+    gpsd_process = None
+    gpsd = None
+
+    if source == GpsSource.SERIAL:
+        writer = ReplayWriter(server_socket, epochs, rate_hz)
+        config = GpsConfig(enabled=True, source=source, serial_device=f'socket://127.0.0.1:{replay_port}')
+    elif shutil.which('gpsd') is not None:
+        gpsd = 'real'
+        writer = ReplayWriter(server_socket, epochs, rate_hz)
+        gpsd_port = free_port()
+        gpsd_process = await asyncio.create_subprocess_exec('gpsd', '-N', '-n', '-b', '-S', str(gpsd_port), f'tcp://127.0.0.1:{replay_port}')
+        config = GpsConfig(enabled=True, gpsd_port=gpsd_port, gpsd_reconnect_min_s=0.1, gpsd_reconnect_max_s=0.5)
+    else:
+        gpsd = 'simulated'
+        writer = ReplayWriter(server_socket, epochs, rate_hz, encode=to_gpsd_json, handshake=simulated_gpsd_handshake)
+        config = GpsConfig(enabled=True, gpsd_port=replay_port)
+
+    writer.start()
+    monitor = LatencyRecordingGpsMonitor(config, writer.send_times)
+    task = asyncio.create_task(monitor.run())
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT_S
+        while not monitor.is_connected:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'GpsMonitor did not connect (source {source.value})')
+            await asyncio.sleep(0.05)
+        # pyserial flushes the input buffer while opening the socket:// port, gpsd needs a moment to open its device
+        await asyncio.sleep(0.5)
+
+        cpu_start = time.thread_time()
+        gpsd_cpu_start = _process_cpu_s(gpsd_process.pid) if gpsd_process is not None else None
+        writer.go.set()
+        while not writer.done_sending.is_set():
+            await asyncio.sleep(0.05)
+        drain_deadline = time.monotonic() + DRAIN_TIMEOUT_S
+        while len(monitor.latencies_s) < len(epochs) and time.monotonic() < drain_deadline:
+            await asyncio.sleep(0.01)
+        cpu_s = time.thread_time() - cpu_start
+        gpsd_cpu_s = _process_cpu_s(gpsd_process.pid) - gpsd_cpu_start if gpsd_process is not None else None
+    finally:
+        writer.release.set()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if gpsd_process is not None:
+            gpsd_process.terminate()
+            await gpsd_process.wait()
+        server_socket.close()
+
+    received = len(monitor.latencies_s)
+    latencies_ms = sorted(latency * 1000 for latency in monitor.latencies_s)
+    quantiles = statistics.quantiles(latencies_ms, n=100) if len(latencies_ms) > 1 else [float('nan')] * 99
+    return {
+        'source': source.value,
+        'gpsd': gpsd,
+        'epochs_sent': len(epochs),
+        'fixes_received': received,
+        'latency_p50_ms': round(quantiles[49], 3),
+        'latency_p99_ms': round(quantiles[98], 3),
+        'cpu_us_per_fix': round(cpu_s / received * 1_000_000, 1) if received else None,
+        'gpsd_cpu_us_per_fix': round(gpsd_cpu_s / received * 1_000_000, 1) if received and gpsd_cpu_s is not None else None,
+    }
+
+
+async def run_all(epochs: List[Epoch], rate_hz: float) -> List[Dict]:
+    return [await run_source(source, epochs, rate_hz) for source in (GpsSource.SERIAL, GpsSource.GPSD)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare GpsMonitor reading NMEA directly with reading it through gpsd')
+    parser.add_argument('--input', type=Path, default=None, help='NMEA recording to replay (default: synthetic)')
+    parser.add_argument('--rate-hz', type=float, default=10, help='Epochs replayed per second')
+    parser.add_argument('--duration-s', type=float, default=10, help='Length of the synthetic recording')
+    parser.add_argument('--output', type=Path, default=None, help='Write JSON result to this file (default: stdout only)')
+    args = parser.parse_args()
+
+    epochs = load_epochs(args.input) if args.input is not None else synthetic_epochs(round(args.duration_s * args.rate_hz), args.rate_hz)
+    if not epochs:
+        sys.exit(f'No NMEA epochs found in {args.input}')
+
+    results = asyncio.run(run_all(epochs, args.rate_hz))
+    result_json = json.dumps(results, indent=2)
+    print(result_json)
+    if args.output is not None:
+        args.output.write_text(result_json)
+
+
+if __name__ == '__main__':
+    main()
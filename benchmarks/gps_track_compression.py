@@ -0,0 +1,156 @@
+'''
+Size and error of the compact track export (msu_manager/gps/compression.py) at different tolerances.
+
+A synthetic drive (straight stretches, turns, stops and ~1m GPS noise, 10Hz) is recorded into a PositionHistory and
+exported like /api/gps/track/export does. Sizes are compared to per-fix JSON (what polling /api/gps/position costs) and
+to the /api/gps/track JSON, both also gzipped. Errors are measured against the original fixes: the distance to the
+decoded track (cross-track) and the distance to the position interpolated from the decoded track at the fix's time.
+
+Usage:
+    python -m benchmarks.gps_track_compression [--duration-s 3600] [--tolerances 0 1 2 5 10 25] [--output result.json]
+
+The result is printed as JSON (one entry per tolerance).
+'''
+import argparse
+import gzip
+import json
+import math
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.compression import compress_track, decode_track
+from msu_manager.gps.history import PositionHistory
+from msu_manager.gps.odometer import METERS_PER_DEGREE, haversine_m
+from msu_manager.gps.types import Position
+
+RATE_HZ = 10
+
+
+def synthetic_drive(duration_s: float, seed: int = 1) -> PositionHistory:
+    rng = random.Random(seed)
+    count = round(duration_s * RATE_HZ)
+    history = PositionHistory(count)
+    lat, lon = 52.52, 13.40
+    heading = 0.0
+    speed = 0.0
+    target_speed = 12.0
+    segment_left_s = 0.0
+    start = 1735689600.0
+    for i in range(count):
+        if segment_left_s <= 0:
+            # Next stretch: turn, maybe stop at a junction first
+            segment_left_s = rng.uniform(20, 120)
+            heading = (heading + rng.choice((-90, 90, 0, rng.uniform(-30, 30)))) % 360
+            target_speed = rng.choice((0, 8, 14, 25))
+        segment_left_s -= 1 / RATE_HZ
+        speed += max(-0.3, min(0.3, target_speed - speed))
+        distance = speed / RATE_HZ
+        lat += distance * math.cos(math.radians(heading)) / METERS_PER_DEGREE
+        lon += distance * math.sin(math.radians(heading)) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        noise_lat = rng.gauss(0, 1) / METERS_PER_DEGREE
+        noise_lon = rng.gauss(0, 1) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        history.append(start + i / RATE_HZ, lat + noise_lat, lon + noise_lon, 50.0, speed, heading, 2.5, 3)
+    return history
+
+
+def per_fix_json_size(track: Dict[str, List]) -> int:
+    size = 0
+    for i in range(len(track['time'])):
+        position = Position(lat=track['lat'][i], lon=track['lon'][i], fix=True, mode=3, alt=track['alt'][i],
+                            speed=track['speed'][i], track=track['track'][i], eph=track['eph'][i])
+        size += len(position.model_dump_json())
+    return size
+
+
+def errors_m(track: Dict[str, List], decoded: Dict[str, List]) -> Dict[str, float]:
+    times = track['time']
+    lats = track['lat']
+    lons = track['lon']
+
+    decoded_history = PositionHistory(max(1, len(decoded['time'])))
+    for t, lat, lon in zip(decoded['time'], decoded['lat'], decoded['lon']):
+        decoded_history.append(t, lat, lon)
+    interpolated = decoded_history.interpolate(times, max_gap_s=math.inf)
+    along = [haversine_m(lat, lon, ilat, ilon) for lat, lon, ilat, ilon in zip(lats, lons, interpolated['lat'], interpolated['lon']) if ilat is not None]
+
+    cross = []
+    segment = 0
+    decoded_times = decoded['time']
+    for t, lat, lon in zip(times, lats, lons):
+        while segment < len(decoded_times) - 2 and decoded_times[segment + 1] < t:
+            segment += 1
+        cross.append(_distance_to_segment_m(lat, lon, decoded['lat'][segment], decoded['lon'][segment],
+                                            decoded['lat'][segment + 1], decoded['lon'][segment + 1]))
+    return {
+        'cross_track_error_max_m': round(max(cross), 2),
+        'cross_track_error_mean_m': round(statistics.fmean(cross), 3),
+        'time_error_max_m': round(max(along), 2),
+        'time_error_mean_m': round(statistics.fmean(along), 3),
+    }
+
+
+def _distance_to_segment_m(lat: float, lon: float, lat0: float, lon0: float, lat1: float, lon1: float) -> float:
+    x_scale = METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    px, py = (lon - lon0) * x_scale, (lat - lat0) * METERS_PER_DEGREE
+    dx, dy = (lon1 - lon0) * x_scale, (lat1 - lat0) * METERS_PER_DEGREE
+    length_sq = dx * dx + dy * dy
+    t = min(1, max(0, (px * dx + py * dy) / length_sq)) if length_sq > 0 else 0
+    return math.hypot(px - t * dx, py - t * dy)
+
+
+def run(duration_s: float, tolerances: List[float], precision: int) -> List[Dict]:
+    history = synthetic_drive(duration_s)
+    track = history.track()
+    fixes = len(track['time'])
+    per_fix_json = per_fix_json_size(track)
+    track_json = json.dumps(track).encode()
+
+    results = []
+    for tolerance_m in tolerances:
+        start = time.perf_counter()
+        data = compress_track(track, tolerance_m, precision)
+        encode_s = time.perf_counter() - start
+        start = time.perf_counter()
+        decoded = decode_track(data)
+        decode_s = time.perf_counter() - start
+
+        results.append({
+            'tolerance_m': tolerance_m,
+            'precision': precision,
+            'fixes': fixes,
+            'fixes_kept': len(decoded['time']),
+            'bytes': len(data),
+            'bytes_gzip': len(gzip.compress(data)),
+            'bytes_per_fix': round(len(data) / fixes, 3),
+            'per_fix_json_bytes': per_fix_json,
+            'track_json_bytes': len(track_json),
+            'track_json_gzip_bytes': len(gzip.compress(track_json)),
+            'ratio_vs_per_fix_json': round(per_fix_json / len(data), 1),
+            **errors_m(track, decoded),
+            'encode_ms': round(encode_s * 1000, 1),
+            'decode_ms': round(decode_s * 1000, 1),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark size and error of the compact GPS track export')
+    parser.add_argument('--duration-s', type=float, default=3600, help='Length of the synthetic drive (10Hz)')
+    parser.add_argument('--tolerances', type=float, nargs='+', default=[0, 1, 2, 5, 10, 25], help='Simplification tolerances in meters')
+    parser.add_argument('--precision', type=int, default=GpsConfig.model_fields['export_precision'].default)
+    parser.add_argument('--output', type=Path, default=None, help='Write JSON result to this file (default: stdout only)')
+    args = parser.parse_args()
+
+    results = run(args.duration_s, args.tolerances, args.precision)
+    result_json = json.dumps(results, indent=2)
+    print(result_json)
+    if args.output is not None:
+        args.output.write_text(result_json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+'''
+Throughput and latency benchmark of the HCU ingestion pipeline (HcuMonitor -> HcuProtocol -> HcuDispatcher -> HcuController).
+
+A writer thread serves a mix of METRIC, LOG and HEARTBEAT messages on a local TCP port at increasing rates and the pipeline
+reads them through pyserial's socket:// URL handler. Every message carries its send time (in the METRIC value, LOG message
+or HEARTBEAT version), which the controller uses to compute byte-to-handler latency.
+
+Usage:
+    python -m benchmarks.hcu_ingestion [--rates 100 1000 5000 0] [--framings json compact] [--duration-s 5] [--output result.json] [--baseline baseline.json]
+
+A rate of 0 sends as fast as possible. Each rate is run for every framing (JSON lines and compact frames, see
+msu_manager/hcu/compact.py); bytes per message and the resulting maximum rate on a 115200 baud link are reported as well. The result is printed as JSON (one entry per rate). If a baseline is given, the
+process exits with code 1 if throughput dropped or p99 latency increased by more than --max-regression.
+'''
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from msu_manager.config import HcuControllerConfig
+from msu_manager.hcu.compact import encode_compact_message
+from msu_manager.hcu.controller import HcuController
+from msu_manager.hcu.dispatcher import HcuDispatcher
+from msu_manager.hcu.messages import (HcuMessage, HeartbeatMessage, LogMessage,
+                                      MetricMessage)
+from msu_manager.hcu.metrics import MetricIngestor
+from msu_manager.hcu.monitor import HcuMonitor
+
+logger = logging.getLogger(__name__)
+
+# Roughly what the HCU firmware emits: mostly metrics, some logs, a heartbeat now and then
+MESSAGE_MIX = ('METRIC',) * 16 + ('LOG',) * 3 + ('HEARTBEAT',)
+TICK_S = 0.005
+# 8N1 encoding needs 10 bits per byte
+SERIAL_BYTES_PER_S = 115200 / 10
+DRAIN_TIMEOUT_S = 30
+
+
+def encode_json_line(message_type: str, idx: int, send_ts_ns: int) -> bytes:
+    if message_type == 'METRIC':
+        return b'{"type":"METRIC","key":"temp%d","value":"%d"}\n' % (idx % 8, send_ts_ns)
+    if message_type == 'LOG':
+        return b'{"type":"LOG","level":"info","message":"%d"}\n' % send_ts_ns
+    return b'{"type":"HEARTBEAT","version":"%d"}\n' % send_ts_ns
+
+
+def encode_compact_frame(message_type: str, idx: int, send_ts_ns: int) -> bytes:
+    if message_type == 'METRIC':
+        message = MetricMessage(type='METRIC', key=f'temp{idx % 8}', value=str(send_ts_ns))
+    elif message_type == 'LOG':
+        message = LogMessage(type='LOG', level='info', message=str(send_ts_ns))
+    else:
+        message = HeartbeatMessage(type='HEARTBEAT', version=str(send_ts_ns))
+    return encode_compact_message(message)
+
+
+ENCODERS = {
+    'json': encode_json_line,
+    'compact': encode_compact_frame,
+}
+
+class _SocketDevice:
+    '''Stands in for the serial device path, so that HcuMonitor opens a pyserial socket:// URL.'''
+    def __init__(self, url: str):
+        self._url = url
+
+    def absolute(self) -> str:
+        return self._url
+
+    def __str__(self) -> str:
+        return self._url
+
+
+class LatencyRecordingController(HcuController):
+    def __init__(self):
+        super().__init__(['true'], 3600, MetricIngestor())
+        self.latencies_ns: List[int] = []
+        self.first_handled_ts = None
+        self.last_handled_ts = None
+
+    async def process_message(self, message: HcuMessage):
+        received_ts_ns = time.perf_counter_ns()
+        await super().process_message(message)
+        match message:
+            case MetricMessage():
+                send_ts_ns = message.value
+            case LogMessage():
+                send_ts_ns = message.message
+            case HeartbeatMessage():
+                send_ts_ns = message.version
+        self.latencies_ns.append(received_ts_ns - int(send_ts_ns))
+        self.last_handled_ts = time.perf_counter()
+        if self.first_handled_ts is None:
+            self.first_handled_ts = self.last_handled_ts
+
+
+class RateLimitedWriter(threading.Thread):
+    def __init__(self, server_socket: socket.socket, rate: int, duration_s: float, encode: Callable[[str, int, int], bytes]):
+        super().__init__(daemon=True)
+        self._server_socket = server_socket
+        self._rate = rate
+        self._duration_s = duration_s
+        self._encode = encode
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.done_sending = threading.Event()
+        self.release = threading.Event()
+
+    def run(self) -> None:
+        conn, _ = self._server_socket.accept()
+        # pyserial flushes the input buffer while opening the socket:// port, wait for that to happen
+        time.sleep(0.2)
+        with conn:
+            start = time.perf_counter()
+            idx = 0
+            while (elapsed := time.perf_counter() - start) < self._duration_s:
+                target = int(elapsed * self._rate) + 1 if self._rate > 0 else idx + 100
+                chunk = bytearray()
+                while idx < target:
+                    chunk += self._encode(MESSAGE_MIX[idx % len(MESSAGE_MIX)], idx, time.perf_counter_ns())
+                    idx += 1
+                if chunk:
+                    conn.sendall(chunk)
+                    self.sent_bytes += len(chunk)
+                if self._rate > 0:
+                    time.sleep(TICK_S)
+            self.sent_messages = idx
+            self.done_sending.set()
+            # Keep the connection open until the reader has drained the socket
+            self.release.wait()
+
+
+async def run_rate(rate: int, duration_s: float, framing: str = 'json') -> Dict:
+    encode = ENCODERS[framing]
+    server_socket = socket.create_server(('127.0.0.1', 0))
+    port = server_socket.getsockname()[1]
+    writer = RateLimitedWriter(server_socket, rate, duration_s, encode)
+    writer.start()
+
+    config = HcuControllerConfig.model_construct(
+        enabled=True,
+        serial_device=_SocketDevice(f'socket://127.0.0.1:{port}'),
+        serial_baud_rate=115200,
+        shutdown_command=['true'],
+        dispatch_queue_size=100_000,
+    )
+    controller = LatencyRecordingController()
+    dispatcher = HcuDispatcher(controller, config.dispatch_queue_size, config.dispatch_overflow_policy)
+    monitor = HcuMonitor(config, dispatcher)
+
+    cpu_start = time.thread_time()
+    dispatch_task = asyncio.create_task(dispatcher.run())
+    monitor_task = asyncio.create_task(monitor.run())
+
+    while not writer.done_sending.is_set():
+        await asyncio.sleep(0.05)
+    drain_deadline = time.perf_counter() + DRAIN_TIMEOUT_S
+    while len(controller.latencies_ns) < writer.sent_messages and time.perf_counter() < drain_deadline:
+        await asyncio.sleep(0.01)
+
+    cpu_s = time.thread_time() - cpu_start
+    writer.release.set()
+
+    for task in (monitor_task, dispatch_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await monitor.close()
+    server_socket.close()
+
+    handled = len(controller.latencies_ns)
+    wall_s = controller.last_handled_ts - controller.first_handled_ts if handled > 1 else float('inf')
+    latencies_ms = sorted(ns / 1_000_000 for ns in controller.latencies_ns)
+    quantiles = statistics.quantiles(latencies_ms, n=100) if len(latencies_ms) > 1 else [0] * 99
+    bytes_per_message = writer.sent_bytes / writer.sent_messages if writer.sent_messages else 0
+    return {
+        'framing': framing,
+        'target_rate': rate,
+        'sent_messages': writer.sent_messages,
+        'sent_bytes': writer.sent_bytes,
+        'bytes_per_message': round(bytes_per_message, 1),
+        'max_messages_per_s_at_115200_baud': round(SERIAL_BYTES_PER_S / bytes_per_message, 1) if bytes_per_message else None,
+        'handled_messages': handled,
+        'messages_per_s': round(handled / wall_s, 1),
+        'latency_p50_ms': round(quantiles[49], 3),
+        'latency_p99_ms': round(quantiles[98], 3),
+        'cpu_us_per_message': round(cpu_s / handled * 1_000_000, 2) if handled else None,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def find_regressions(results: List[Dict], baseline: List[Dict], max_regression: float) -> List[str]:
+    regressions = []
+    baseline_by_run = {(entry.get('framing', 'json'), entry['target_rate']): entry for entry in baseline}
+    for entry in results:
+        reference = baseline_by_run.get((entry['framing'], entry['target_rate']))
+        if reference is None:
+            continue
+        run = f'{entry["framing"]} @ rate {entry["target_rate"]}'
+        if entry['messages_per_s'] < reference['messages_per_s'] * (1 - max_regression):
+            regressions.append(f'{run}: messages_per_s {entry["messages_per_s"]} < {reference["messages_per_s"]}')
+        if entry['latency_p99_ms'] > reference['latency_p99_ms'] * (1 + max_regression):
+            regressions.append(f'{run}: latency_p99_ms {entry["latency_p99_ms"]} > {reference["latency_p99_ms"]}')
+    return regressions
+
+
+async def run_all(rates: List[int], framings: List[str], duration_s: float) -> List[Dict]:
+    results = []
+    for framing in framings:
+        for rate in rates:
+            logger.info(f'Running HCU ingestion benchmark ({framing}) at {rate if rate > 0 else "max"} msg/s for {duration_s}s')
+            results.append(await run_rate(rate, duration_s, framing))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the HCU ingestion pipeline')
+    parser.add_argument('--rates', type=int, nargs='+', default=[100, 500, 1000, 5000, 0], help='Message rates to test (0 = as fast as possible)')
+    parser.add_argument('--framings', nargs='+', choices=list(ENCODERS), default=list(ENCODERS))
+    parser.add_argument('--duration-s', type=float, default=5)
+    parser.add_argument('--output', type=Path, default=None, help='Write JSON result to this file (default: stdout only)')
+    parser.add_argument('--baseline', type=Path, default=None, help='JSON result of a previous run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed relative regression against the baseline')
+    args = parser.parse_args()
+
+    # Logging of the pipeline itself would dominate the measurement
+    logging.getLogger('msu_manager').setLevel(logging.WARNING)
+
+    results = asyncio.run(run_all(args.rates, args.framings, args.duration_s))
+    result_json = json.dumps(results, indent=2)
+    print(result_json)
+    if args.output is not None:
+        args.output.write_text(result_json)
+
+    if args.baseline is not None:
+        regressions = find_regressions(results, json.loads(args.baseline.read_text()), args.max_regression)
+        for regression in regressions:
+            logger.error(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
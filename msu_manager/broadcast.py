@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Generic, Set, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class SubscriberQueue(asyncio.Queue):
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0
+
+
+class Broadcaster(Generic[T]):
+    '''
+    Fans out published items to any number of subscribers.
+
+    Every subscriber gets its own bounded queue. If a subscriber does not keep up, its oldest items are dropped, so slow
+    subscribers neither block the publisher nor grow memory.
+    '''
+
+    def __init__(self, queue_size: int = 100):
+        self._queue_size = queue_size
+        self._subscribers: Set[SubscriberQueue] = set()
+
+    def publish(self, item: T) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                queue.dropped += 1
+            queue.put_nowait(item)
+
+    @asynccontextmanager
+    async def subscribe(self, queue_size: int = None) -> AsyncIterator[SubscriberQueue]:
+        queue = SubscriberQueue(queue_size or self._queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+            if queue.dropped > 0:
+                logger.info(f'Subscriber dropped {queue.dropped} items because it did not keep up')
+
+    @property
+    def has_subscribers(self) -> bool:
+        return len(self._subscribers) > 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
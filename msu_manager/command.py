@@ -6,7 +6,8 @@ from typing import Dict, Tuple
 
 logger = logging.getLogger(__name__)
 
-async def run_command(command: Iterable[str] | str, env: Dict[str, str] = None, log_cmd: bool = False, log_err: bool = False, raise_on_fail: bool = False) -> Tuple[int, str, str]:
+async def run_command(command: Iterable[str] | str, env: Dict[str, str] = None, log_cmd: bool = False, log_err: bool = False, raise_on_fail: bool = False, timeout_s: float = None) -> Tuple[int, str, str]:
+    '''Runs `command` and returns its exit code, stdout and stderr. Raises TimeoutError if it does not finish within `timeout_s`.'''
     if log_cmd:
         logger.info(f'Running command: {" ".join(command)} with env: {env}')
     
@@ -21,7 +22,13 @@ async def run_command(command: Iterable[str] | str, env: Dict[str, str] = None,
             stderr=asyncio.subprocess.PIPE,
             env={**os.environ, **env} if env else None
         )
-        stdout, stderr = await proc.communicate()
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Make sure the process does not outlive the command
+            proc.kill()
+            await proc.wait()
+            raise
         stdout = stdout.decode() if stdout else ''
         stderr = stderr.decode() if stderr else ''
         ret_code = proc.returncode
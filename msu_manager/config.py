@@ -1,9 +1,9 @@
 import os
 from enum import Enum
 from pathlib import Path
-from typing import List, Literal, Optional
+from typing import Annotated, List, Literal, Optional, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import (BaseSettings, SettingsConfigDict,
                                YamlConfigSettingsSource)
 
@@ -21,6 +21,11 @@ class ModemType(str, Enum):
     TCL_IKE41VE1 = 'tcl_ike41ve1'
 
 
+class DispatchOverflowPolicy(str, Enum):
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+
 class PingConfig(BaseModel):
     target: str
     count: int = 3
@@ -51,13 +56,35 @@ class UplinkMonitorConfigDisabled(BaseModel):
     enabled: Literal[False] = False
 
 
+class PreShutdownHookConfig(BaseModel):
+    name: str
+    command: List[str]
+    timeout_s: float = 10
+
+
 class HcuControllerConfig(BaseModel):
     enabled: Literal[True]
     serial_device: Path
     serial_baud_rate: int
+    serial_max_line_length: int = 4096
+    serial_reconnect_min_s: float = 1
+    serial_reconnect_max_s: float = 60
+    dispatch_queue_size: int = 1000
+    dispatch_overflow_policy: DispatchOverflowPolicy = DispatchOverflowPolicy.DROP_OLDEST
+    metric_coalesce_window_s: float = 0.5
+    metric_key_allowlist: Optional[List[str]] = None
+    metric_max_keys: int = 100
+    heartbeat_degraded_timeout_s: float = 15
+    heartbeat_lost_timeout_s: float = 60
+    heartbeat_lost_reopen_serial: bool = True
+    log_buffer_size: int = 1000
+    log_buffer_min_level: LogLevel = LogLevel.DEBUG
     shutdown_delay_s: int = 180
     shutdown_command: List[str]
+    pre_shutdown_hooks: List[PreShutdownHookConfig] = []
+    pre_shutdown_timeout_s: float = 30
     shutdown_inhibit_max_s: int = 1800
+    state_file: Optional[Path] = None
 
 
 class HcuControllerConfigDisabled(BaseModel):
@@ -73,11 +100,66 @@ class FrontendConfigDisabled(BaseModel):
     enabled: Literal[False] = False
 
 
+class GeofenceType(str, Enum):
+    CIRCLE = 'circle'
+    POLYGON = 'polygon'
+
+
+class CircleGeofenceConfig(BaseModel):
+    type: Literal[GeofenceType.CIRCLE] = GeofenceType.CIRCLE
+    name: str
+    lat: float
+    lon: float
+    radius_m: float
+
+
+class PolygonGeofenceConfig(BaseModel):
+    type: Literal[GeofenceType.POLYGON] = GeofenceType.POLYGON
+    name: str
+    points: List[Tuple[float, float]] = Field(min_length=3)   # (lat, lon)
+
+
+GeofenceConfig = Annotated[CircleGeofenceConfig | PolygonGeofenceConfig, Field(discriminator='type')]
+
+
+class GpsSource(str, Enum):
+    GPSD = 'gpsd'
+    SERIAL = 'serial'
+
+
 class GpsConfig(BaseModel):
     enabled: Literal[True]
+    source: GpsSource = GpsSource.GPSD
     init_cmd: Optional[List[str]] = None
     gpsd_host: str = '127.0.0.1'
     gpsd_port: int = 2947
+    gpsd_reconnect_min_s: float = 1
+    gpsd_reconnect_max_s: float = 60
+    serial_device: Optional[str] = None
+    serial_baud_rate: int = 9600
+    serial_ubx: bool = False
+    serial_reconnect_min_s: float = 1
+    serial_reconnect_max_s: float = 60
+    proxy_port: Optional[int] = None
+    proxy_host: str = '127.0.0.1'
+    proxy_queue_size: int = 100
+    history_size: int = 36000
+    kalman_enabled: bool = False
+    kalman_acceleration_sigma_mps2: float = 1.0
+    export_tolerance_m: float = 5
+    export_precision: int = Field(6, ge=0, le=9)
+    export_max_points: int = Field(36000, ge=2)
+    stream_queue_size: int = 10
+    geofences: List[GeofenceConfig] = []
+    odometer_file: Optional[Path] = None
+    odometer_persist_interval_s: float = 60
+    odometer_stationary_speed_mps: float = 0.5
+
+    @model_validator(mode='after')
+    def _check_serial_device(self) -> 'GpsConfig':
+        if self.source == GpsSource.SERIAL and self.serial_device is None:
+            raise ValueError('serial_device is required for source serial')
+        return self
     
 
 class GpsConfigDisabled(BaseModel):
@@ -0,0 +1,161 @@
+'''
+Compact track encoding for uploading the GPS history over the metered uplink.
+
+The track is first simplified with Douglas-Peucker (fixes closer than `tolerance_m` to where the simplified track puts
+the vehicle at the same time are dropped), then the remaining fixes are quantized (time to milliseconds, coordinates to 10^-precision degrees) and
+encoded as deltas to the previous fix, each a zigzag varint. The encoded track is:
+
+    "GT", version (1 byte), precision (1 byte), number of fixes (varint), per fix: delta time, delta lat, delta lon
+
+Example: one hour of driving at 10Hz (36000 fixes) simplified with 5m tolerance is a few kB instead of several MB of
+per-fix JSON.
+'''
+import math
+from typing import Dict, List, Sequence, Tuple
+
+from .odometer import METERS_PER_DEGREE
+
+MAGIC = b'GT'
+VERSION = 1
+DEFAULT_PRECISION = 6
+# Douglas-Peucker is quadratic in the worst case (e.g. a track that never deviates by more than the tolerance from
+# one end but does from the other), so tracks are simplified in windows of at most this many fixes
+SIMPLIFY_WINDOW = 1000
+
+
+class TrackFormatError(ValueError):
+    pass
+
+
+def simplify(times: Sequence[float], lats: Sequence[float], lons: Sequence[float], tolerance_m: float) -> List[int]:
+    '''
+    Returns the indices of the fixes kept by Douglas-Peucker simplification. Instead of the distance to the line, the
+    distance to the position interpolated at the fix's time is used (synchronized euclidean distance), so stops and
+    speed changes are kept as well: interpolating the simplified track at any fix's time is at most `tolerance_m` off.
+    Distances are computed in a local equirectangular projection, which is precise enough at the scale of a track.
+    Every `SIMPLIFY_WINDOW`th fix is kept to bound the work, the error bound holds regardless.
+    '''
+    count = len(lats)
+    if count <= 2 or tolerance_m <= 0:
+        return list(range(count))
+
+    x_scale = METERS_PER_DEGREE * math.cos(math.radians(lats[0]))
+    xs = [lon * x_scale for lon in lons]
+    ys = [lat * METERS_PER_DEGREE for lat in lats]
+    tolerance_sq = tolerance_m * tolerance_m
+
+    keep = bytearray(count)
+    keep[-1] = 1
+    # Iterative instead of recursive, long straight tracks would exceed the recursion limit
+    stack = []
+    for first in range(0, count - 1, SIMPLIFY_WINDOW):
+        keep[first] = 1
+        stack.append((first, min(first + SIMPLIFY_WINDOW, count - 1)))
+    while stack:
+        first, last = stack.pop()
+        x0, y0, t0 = xs[first], ys[first], times[first]
+        dx, dy = xs[last] - x0, ys[last] - y0
+        duration = times[last] - t0
+        max_sq = tolerance_sq
+        max_index = -1
+        for i in range(first + 1, last):
+            ratio = (times[i] - t0) / duration if duration > 0 else 0.0
+            ex = xs[i] - x0 - ratio * dx
+            ey = ys[i] - y0 - ratio * dy
+            distance_sq = ex * ex + ey * ey
+            if distance_sq > max_sq:
+                max_sq = distance_sq
+                max_index = i
+        if max_index >= 0:
+            keep[max_index] = 1
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+
+    return [i for i in range(count) if keep[i]]
+
+
+def encode_track(times: Sequence[float], lats: Sequence[float], lons: Sequence[float], precision: int = DEFAULT_PRECISION) -> bytes:
+    '''Encodes the fixes (unix timestamps and degrees) as described in the module docstring.'''
+    if not 0 <= precision <= 9:
+        raise ValueError(f'precision must be between 0 and 9, got {precision}')
+    scale = 10 ** precision
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out.append(precision)
+    _write_varint(out, len(times))
+
+    previous_time = previous_lat = previous_lon = 0
+    for time, lat, lon in zip(times, lats, lons):
+        # Deltas of the rounded absolute values, so rounding errors do not accumulate
+        quantized_time = round(time * 1000)
+        quantized_lat = round(lat * scale)
+        quantized_lon = round(lon * scale)
+        _write_varint(out, _zigzag(quantized_time - previous_time))
+        _write_varint(out, _zigzag(quantized_lat - previous_lat))
+        _write_varint(out, _zigzag(quantized_lon - previous_lon))
+        previous_time, previous_lat, previous_lon = quantized_time, quantized_lat, quantized_lon
+    return bytes(out)
+
+
+def decode_track(data: bytes) -> Dict[str, List[float]]:
+    '''Decodes a track created by encode_track to columns (time, lat, lon).'''
+    if len(data) < 4 or data[:2] != MAGIC:
+        raise TrackFormatError('Not an encoded track')
+    if data[2] != VERSION:
+        raise TrackFormatError(f'Unsupported track encoding version {data[2]}')
+    scale = 10 ** data[3]
+
+    count, pos = _read_varint(data, 4)
+    times, lats, lons = [], [], []
+    time = lat = lon = 0
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        time += _unzigzag(delta)
+        delta, pos = _read_varint(data, pos)
+        lat += _unzigzag(delta)
+        delta, pos = _read_varint(data, pos)
+        lon += _unzigzag(delta)
+        times.append(time / 1000)
+        lats.append(lat / scale)
+        lons.append(lon / scale)
+    if pos != len(data):
+        raise TrackFormatError(f'{len(data) - pos} trailing bytes after {count} fixes')
+    return {'time': times, 'lat': lats, 'lon': lons}
+
+
+def compress_track(track: Dict[str, List], tolerance_m: float, precision: int = DEFAULT_PRECISION) -> bytes:
+    '''Simplifies and encodes a track as returned by PositionHistory.track().'''
+    times = track['time']
+    lats = track['lat']
+    lons = track['lon']
+    kept = simplify(times, lats, lons, tolerance_m)
+    return encode_track([times[i] for i in kept], [lats[i] for i in kept], [lons[i] for i in kept], precision)
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise TrackFormatError('Truncated track')
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
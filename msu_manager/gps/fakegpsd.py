@@ -0,0 +1,141 @@
+'''
+Fake gpsd for tests and benchmarks without GPS hardware.
+
+Speaks enough of the gpsd JSON protocol for GpsMonitor: it sends VERSION on connect, answers ?WATCH with DEVICES and
+WATCH and then streams TPV messages at the configured rate (and a SKY message once per second), moving north at a
+constant speed.
+
+Usage:
+    python -m msu_manager.gps.fakegpsd [--port 2947] [--rate-hz 10]
+'''
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Set
+
+logger = logging.getLogger(__name__)
+
+DEVICE_PATH = '/dev/ttyFAKE0'
+METERS_PER_DEGREE_LAT = 111195
+
+
+def _line(message: dict) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b'\r\n'
+
+
+class FakeGpsd:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, rate_hz: float = 10, lat: float = 52.52, lon: float = 13.40, speed_mps: float = 10):
+        self._host = host
+        self._port = port
+        self._rate_hz = rate_hz
+        self._lat = lat
+        self._lon = lon
+        self._speed_mps = speed_mps
+        self._activated = datetime.now(timezone.utc)
+        self._server: asyncio.Server = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self.connection_count = 0
+        self.sent_tpv_count = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, self._host, self._port)
+
+    async def stop(self) -> None:
+        self.disconnect_clients()
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def disconnect_clients(self) -> None:
+        for writer in list(self._writers):
+            writer.close()
+
+    def reattach_device(self) -> None:
+        '''Simulates the receiver being unplugged and plugged in again.'''
+        self._activated = datetime.now(timezone.utc)
+        for writer in self._writers:
+            writer.write(_line(self._device()))
+
+    def _device(self) -> dict:
+        return {'class': 'DEVICE', 'path': DEVICE_PATH, 'activated': self._activated.isoformat(), 'driver': 'u-blox', 'stopbits': 1}
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connection_count += 1
+        self._writers.add(writer)
+        try:
+            writer.write(_line({'class': 'VERSION', 'release': '3.25', 'rev': 'fake', 'proto_major': 3, 'proto_minor': 15}))
+            command = await reader.readline()
+            if not command.startswith(b'?WATCH'):
+                return
+            writer.write(_line({'class': 'DEVICES', 'devices': [self._device()]}))
+            writer.write(_line({'class': 'WATCH', 'enable': True, 'json': True}))
+            await self._stream(writer)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        interval_s = 1 / self._rate_hz if self._rate_hz > 0 else 0
+        start = time.monotonic()
+        next_sky = start
+        count = 0
+        while not writer.is_closing():
+            now = time.monotonic()
+            if now >= next_sky:
+                writer.write(_line(self._sky()))
+                next_sky += 1
+            writer.write(_line(self._tpv(now - start)))
+            self.sent_tpv_count += 1
+            count += 1
+            await writer.drain()
+            # Always yield, drain() does not as long as the client keeps up
+            await asyncio.sleep(max(0, start + count * interval_s - time.monotonic()) if interval_s > 0 else 0)
+
+    def _tpv(self, elapsed_s: float) -> dict:
+        return {
+            'class': 'TPV', 'device': DEVICE_PATH, 'mode': 3,
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'lat': self._lat + elapsed_s * self._speed_mps / METERS_PER_DEGREE_LAT, 'lon': self._lon,
+            'altHAE': 50.0, 'alt': 50.0, 'speed': self._speed_mps, 'track': 0.0, 'climb': 0.0,
+            'eph': 2.5, 'epv': 4.0, 'eps': 0.5, 'ept': 0.005,
+        }
+
+    def _sky(self) -> dict:
+        satellites = [{'PRN': prn, 'el': 45.0, 'az': prn * 30.0, 'ss': 40.0, 'used': prn <= 8} for prn in range(1, 13)]
+        return {'class': 'SKY', 'device': DEVICE_PATH, 'nSat': 12, 'uSat': 8, 'hdop': 0.9, 'vdop': 1.2, 'pdop': 1.5, 'satellites': satellites}
+
+
+async def serve(host: str, port: int, rate_hz: float) -> None:
+    fake_gpsd = FakeGpsd(host, port, rate_hz)
+    await fake_gpsd.start()
+    logger.info(f'Fake gpsd listening on {host}:{fake_gpsd.port}, sending TPV at {rate_hz}Hz')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake_gpsd.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake gpsd emitting TPV / SKY messages')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2947)
+    parser.add_argument('--rate-hz', type=float, default=10, help='TPV rate (0 = as fast as possible)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        asyncio.run(serve(args.host, args.port, args.rate_hz))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import logging
+import math
+from collections import deque
+from enum import Enum
+from typing import Deque, Dict, List, Set, Tuple
+
+from prometheus_client import Counter, Gauge
+from pydantic import BaseModel
+
+from ..config import CircleGeofenceConfig, GeofenceConfig, PolygonGeofenceConfig
+from .odometer import METERS_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+GEOFENCE_TRANSITION_COUNTER = Counter('gps_geofence_transitions', 'Counts geofence enter and exit events', ['fence', 'event'])
+GEOFENCE_INSIDE_GAUGE = Gauge('gps_geofence_inside', 'Whether the vehicle is inside a geofence (1) or not (0)', ['fence'])
+
+
+class GeofenceEventType(str, Enum):
+    ENTER = 'enter'
+    EXIT = 'exit'
+
+
+class GeofenceEvent(BaseModel):
+    seq: int
+    fence: str
+    event: GeofenceEventType
+    time: float
+    lat: float
+    lon: float
+
+
+class BoundingBox:
+    def __init__(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        self.min_lat = min_lat
+        self.min_lon = min_lon
+        self.max_lat = max_lat
+        self.max_lon = max_lon
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon
+
+
+class CircleGeofence:
+    def __init__(self, config: CircleGeofenceConfig):
+        self.name = config.name
+        self._lat = config.lat
+        self._lon = config.lon
+        self._radius_m = config.radius_m
+        self._cos_lat = math.cos(math.radians(config.lat))
+        dlat = config.radius_m / METERS_PER_DEGREE
+        dlon = config.radius_m / (METERS_PER_DEGREE * max(self._cos_lat, 1e-6))
+        self.bbox = BoundingBox(config.lat - dlat, config.lon - dlon, config.lat + dlat, config.lon + dlon)
+
+    def contains(self, lat: float, lon: float) -> bool:
+        # Equirectangular approximation, which is accurate enough for fences of a few kilometers
+        dy = (lat - self._lat) * METERS_PER_DEGREE
+        dx = (lon - self._lon) * METERS_PER_DEGREE * self._cos_lat
+        return dx * dx + dy * dy <= self._radius_m * self._radius_m
+
+
+class PolygonGeofence:
+    def __init__(self, config: PolygonGeofenceConfig):
+        self.name = config.name
+        self._points = list(config.points)
+        lats = [p[0] for p in self._points]
+        lons = [p[1] for p in self._points]
+        self.bbox = BoundingBox(min(lats), min(lons), max(lats), max(lons))
+
+    def contains(self, lat: float, lon: float) -> bool:
+        # Ray casting in the lat / lon plane
+        inside = False
+        points = self._points
+        lat_j, lon_j = points[-1]
+        for lat_i, lon_i in points:
+            if (lat_i > lat) != (lat_j > lat):
+                crossing_lon = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+                if lon < crossing_lon:
+                    inside = not inside
+            lat_j, lon_j = lat_i, lon_i
+        return inside
+
+
+Geofence = CircleGeofence | PolygonGeofence
+
+
+def create_geofence(config: GeofenceConfig) -> Geofence:
+    match config:
+        case CircleGeofenceConfig():
+            return CircleGeofence(config)
+        case PolygonGeofenceConfig():
+            return PolygonGeofence(config)
+
+
+class GeofenceEngine:
+    '''
+    Tracks which geofences contain the current position and emits enter / exit events.
+
+    Fences are indexed in a uniform lat / lon grid (cell -> fences whose bounding box overlaps it), so a fix is only
+    tested against the fences of its cell, after a bounding box check. Fences spanning more than `max_cells_per_fence`
+    cells are not indexed, but always bounding box checked instead.
+    '''
+
+    def __init__(self, configs: List[GeofenceConfig], cell_size_deg: float = 0.01, max_cells_per_fence: int = 1024, event_buffer_size: int = 1000):
+        self._cell_size_deg = cell_size_deg
+        self._fences: Dict[str, Geofence] = {}
+        self._grid: Dict[Tuple[int, int], List[Geofence]] = {}
+        self._unindexed: List[Geofence] = []
+        self._inside: Set[str] = set()
+        self._events: Deque[GeofenceEvent] = deque(maxlen=event_buffer_size)
+        self._next_seq = 1
+
+        for config in configs:
+            if config.name in self._fences:
+                raise ValueError(f'Duplicate geofence name {config.name}')
+            fence = create_geofence(config)
+            self._fences[fence.name] = fence
+            self._index(fence, max_cells_per_fence)
+            GEOFENCE_INSIDE_GAUGE.labels(fence.name).set(0)
+
+    def update(self, lat: float, lon: float, timestamp: float) -> List[GeofenceEvent]:
+        '''Evaluates a new fix and returns the resulting events.'''
+        if not self._fences:
+            return []
+
+        candidates = self._grid.get(self._cell(lat, lon), ())
+        inside = {
+            fence.name for fences in (candidates, self._unindexed) for fence in fences
+            if fence.bbox.contains(lat, lon) and fence.contains(lat, lon)
+        }
+        if inside == self._inside:
+            return []
+
+        events = [self._emit(name, GeofenceEventType.EXIT, timestamp, lat, lon) for name in sorted(self._inside - inside)]
+        events += [self._emit(name, GeofenceEventType.ENTER, timestamp, lat, lon) for name in sorted(inside - self._inside)]
+        self._inside = inside
+        return events
+
+    def events(self, after_seq: int = 0) -> List[GeofenceEvent]:
+        return [event for event in self._events if event.seq > after_seq]
+
+    def state(self) -> Dict[str, bool]:
+        '''Geofence name -> whether the latest fix is inside.'''
+        return {name: name in self._inside for name in self._fences}
+
+    def _emit(self, name: str, event_type: GeofenceEventType, timestamp: float, lat: float, lon: float) -> GeofenceEvent:
+        logger.info(f'Geofence {name}: {event_type.value}')
+        event = GeofenceEvent(seq=self._next_seq, fence=name, event=event_type, time=timestamp, lat=lat, lon=lon)
+        self._next_seq += 1
+        self._events.append(event)
+        GEOFENCE_TRANSITION_COUNTER.labels(name, event_type.value).inc()
+        GEOFENCE_INSIDE_GAUGE.labels(name).set(1 if event_type == GeofenceEventType.ENTER else 0)
+        return event
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self._cell_size_deg), math.floor(lon / self._cell_size_deg)
+
+    def _index(self, fence: Geofence, max_cells_per_fence: int) -> None:
+        min_cell = self._cell(fence.bbox.min_lat, fence.bbox.min_lon)
+        max_cell = self._cell(fence.bbox.max_lat, fence.bbox.max_lon)
+        cell_count = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+        if cell_count > max_cells_per_fence:
+            self._unindexed.append(fence)
+            return
+        for lat_cell in range(min_cell[0], max_cell[0] + 1):
+            for lon_cell in range(min_cell[1], max_cell[1] + 1):
+                self._grid.setdefault((lat_cell, lon_cell), []).append(fence)
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Tuple
+
+from gpsd_client_async.messages import AnyGPSDMessage, Message, Watch
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+WATCH_COMMAND = '?WATCH={}\r\n'
+# gpsd lines are at most a few kB (SKY with many satellites)
+MAX_LINE_LENGTH = 64 * 1024
+
+
+class GpsdConnection:
+    '''
+    Minimal gpsd client. In contrast to gpsd_client_async.GpsdClient it hands out the raw lines along with the parsed
+    messages (so they can be forwarded as they are), does not stop on message classes it does not know (e.g. PPS, ERROR)
+    and reports a closed connection as ConnectionError.
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 2947, watch: Watch = None):
+        self._host = host
+        self._port = port
+        self._watch = watch if watch is not None else Watch()
+        self._reader: asyncio.StreamReader = None
+        self._writer: asyncio.StreamWriter = None
+
+    async def __aenter__(self) -> 'GpsdConnection':
+        self._reader, self._writer = await asyncio.open_connection(self._host, self._port, limit=MAX_LINE_LENGTH)
+        self._writer.write(WATCH_COMMAND.format(self._watch.model_dump_json(by_alias=True, exclude={'class_'})).encode())
+        await self._writer.drain()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except (ConnectionError, OSError):
+            # The connection is gone anyway
+            pass
+
+    async def read(self) -> Tuple[bytes, AnyGPSDMessage | None]:
+        '''Returns the next line from gpsd and the parsed message (None if the message class is not known).'''
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by gpsd')
+        try:
+            return line, Message.model_validate_json(line).root
+        except ValidationError:
+            return line, None
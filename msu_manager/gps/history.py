@@ -0,0 +1,149 @@
+import math
+from array import array
+from typing import Dict, List, Sequence
+
+FIELDS = ('time', 'lat', 'lon', 'alt', 'speed', 'track', 'eph')
+NAN = float('nan')
+
+
+class PositionHistory:
+    '''
+    Fixed-capacity ring buffer of GPS fixes. Every field is kept in its own preallocated `array`, so appending a fix does
+    not allocate any Python objects and slices of the history are copied at C level. Missing values are stored as NaN.
+    Fixes are kept in time order, fixes that are not newer than the latest one are ignored.
+    '''
+
+    def __init__(self, capacity: int = 36000):
+        self._capacity = capacity
+        self._columns: Dict[str, array] = {field: array('d', bytes(8 * capacity)) for field in FIELDS}
+        self._mode = array('b', bytes(capacity))
+        self._start = 0
+        self._count = 0
+
+    def append(self, time: float, lat: float, lon: float, alt: float = None, speed: float = None, track: float = None,
+               eph: float = None, mode: int = 0) -> bool:
+        if self._count > 0 and time <= self.latest_time:
+            return False
+
+        if self._count < self._capacity:
+            index = (self._start + self._count) % self._capacity
+            self._count += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self._capacity
+
+        columns = self._columns
+        columns['time'][index] = time
+        columns['lat'][index] = lat
+        columns['lon'][index] = lon
+        columns['alt'][index] = NAN if alt is None else alt
+        columns['speed'][index] = NAN if speed is None else speed
+        columns['track'][index] = NAN if track is None else track
+        columns['eph'][index] = NAN if eph is None else eph
+        self._mode[index] = mode
+        return True
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def latest_time(self) -> float | None:
+        if self._count == 0:
+            return None
+        return self._columns['time'][(self._start + self._count - 1) % self._capacity]
+
+    def time_at(self, position: int) -> float:
+        '''Time of the `position`-th oldest fix.'''
+        return self._columns['time'][(self._start + position) % self._capacity]
+
+    def first_after(self, since: float, low: int = 0) -> int:
+        '''Position of the oldest fix newer than `since` (binary search from `low`, as fixes are in time order).'''
+        high = self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self.time_at(mid) <= since:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def track(self, since: float = None, max_points: int = None) -> Dict[str, List]:
+        '''
+        Returns the fixes newer than `since` in columnar form (field -> list of values, missing values are None).
+        If there are more than `max_points` fixes, the track is downsampled evenly (the latest fix is always included).
+        '''
+        first = self.first_after(since) if since is not None else 0
+        count = self._count - first
+        step = max(1, math.ceil(count / max_points)) if max_points else 1
+        # Align the stride to the end of the track, so that the latest fix is always part of it
+        first += (count - 1) % step if count > 0 else 0
+
+        track = {field: _none_for_nan(self._slice(column, first, step).tolist()) for field, column in self._columns.items()}
+        track['mode'] = self._slice(self._mode, first, step).tolist()
+        return track
+
+    def interpolate(self, timestamps: Sequence[float], max_gap_s: float = 5) -> Dict[str, List]:
+        '''
+        Returns the positions at `timestamps` in columnar form (in the order of `timestamps`), linearly interpolated
+        between the surrounding fixes. Positions are None if a timestamp lies outside of the history or the surrounding
+        fixes are more than `max_gap_s` apart. Timestamps are resolved in ascending order, so each binary search only
+        has to cover the remainder of the history.
+        '''
+        fields = ('lat', 'lon', 'alt', 'speed', 'track')
+        result = {field: [None] * len(timestamps) for field in fields}
+        result['time'] = list(timestamps)
+        columns = self._columns
+        capacity = self._capacity
+
+        low = 0
+        for query_index in sorted(range(len(timestamps)), key=timestamps.__getitem__):
+            t = timestamps[query_index]
+            low = self.first_after(t, low)
+            if low == 0:
+                # Before the first fix (or empty history)
+                continue
+            before = (self._start + low - 1) % capacity
+            t0 = columns['time'][before]
+            if t == t0:
+                after, ratio = before, 0.0
+            elif low == self._count:
+                # After the latest fix
+                continue
+            else:
+                after = (self._start + low) % capacity
+                t1 = columns['time'][after]
+                if t1 - t0 > max_gap_s:
+                    continue
+                ratio = (t - t0) / (t1 - t0)
+
+            for field in fields:
+                v0 = columns[field][before]
+                v1 = columns[field][after]
+                if field == 'track' and abs(v1 - v0) > 180:
+                    # Interpolate along the shorter arc (e.g. 350° -> 10°)
+                    v1 += 360 if v1 < v0 else -360
+                value = v0 + (v1 - v0) * ratio
+                if value == value:
+                    result[field][query_index] = value % 360 if field == 'track' else value
+        return result
+
+    def _slice(self, column: array, first: int, step: int) -> array:
+        start = self._start + first
+        end = self._start + self._count
+        if end <= self._capacity:
+            return column[start:end:step]
+        if start >= self._capacity:
+            return column[start - self._capacity:end - self._capacity:step]
+        # The requested range wraps around the end of the ring
+        return (column[start:self._capacity] + column[:end - self._capacity])[::step]
+
+
+def _none_for_nan(values: List[float]) -> List[float | None]:
+    # NaN is not valid JSON
+    if any(v != v for v in values):
+        return [None if v != v else v for v in values]
+    return values
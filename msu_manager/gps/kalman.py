@@ -0,0 +1,172 @@
+import math
+from typing import List, Tuple
+
+from .odometer import METERS_PER_DEGREE
+from .types import FilteredPosition
+
+# Fallbacks if a TPV carries no error estimate
+DEFAULT_POSITION_SIGMA_M = 5.0
+DEFAULT_SPEED_SIGMA_MPS = 0.5
+# Initial velocity uncertainty if the first fix has no speed / track
+INITIAL_SPEED_SIGMA_MPS = 10.0
+# The local projection is re-anchored once the vehicle is this far from its origin
+MAX_ORIGIN_DISTANCE_M = 10000
+
+
+class _Axis:
+    '''
+    Constant-velocity Kalman filter along one axis (position, velocity). With independent measurement noise per axis,
+    east and north do not interact, so two of these are equivalent to the full 4-state filter.
+    '''
+
+    __slots__ = ('position', 'velocity', 'p_pp', 'p_pv', 'p_vv')
+
+    def __init__(self, position: float, velocity: float, position_var: float, velocity_var: float):
+        self.position = position
+        self.velocity = velocity
+        # Covariance [[p_pp, p_pv], [p_pv, p_vv]]
+        self.p_pp = position_var
+        self.p_pv = 0.0
+        self.p_vv = velocity_var
+
+    def predicted(self, dt: float, q: float) -> Tuple[float, float, float, float, float]:
+        '''State and covariance `dt` seconds ahead (white noise acceleration with spectral density `q`).'''
+        adt = abs(dt)
+        position = self.position + self.velocity * dt
+        p_pp = self.p_pp + 2 * dt * self.p_pv + dt * dt * self.p_vv + q * adt ** 3 / 3
+        p_pv = self.p_pv + dt * self.p_vv + q * dt * adt / 2
+        p_vv = self.p_vv + q * adt
+        return position, self.velocity, p_pp, p_pv, p_vv
+
+    def predict(self, dt: float, q: float) -> None:
+        self.position, self.velocity, self.p_pp, self.p_pv, self.p_vv = self.predicted(dt, q)
+
+    def update_position(self, z: float, r: float) -> None:
+        s = self.p_pp + r
+        k_p = self.p_pp / s
+        k_v = self.p_pv / s
+        innovation = z - self.position
+        self.position += k_p * innovation
+        self.velocity += k_v * innovation
+        self.p_vv -= k_v * self.p_pv
+        self.p_pp *= 1 - k_p
+        self.p_pv *= 1 - k_p
+
+    def update_velocity(self, z: float, r: float) -> None:
+        s = self.p_vv + r
+        k_p = self.p_pv / s
+        k_v = self.p_vv / s
+        innovation = z - self.velocity
+        self.position += k_p * innovation
+        self.velocity += k_v * innovation
+        self.p_pp -= k_p * self.p_pv
+        self.p_pv *= 1 - k_v
+        self.p_vv *= 1 - k_v
+
+
+class PositionFilter:
+    '''
+    Constant-velocity Kalman filter for GPS fixes, in a local east / north plane anchored at a recent fix. Position
+    measurements are weighted by eph, the velocity derived from speed and track by eps. Between fixes, the state can be
+    predicted to any time (e.g. to serve positions at a higher rate than the receiver delivers them).
+
+    The filter restarts from scratch if fixes are more than `max_gap_s` apart, and does not predict further than that.
+    '''
+
+    def __init__(self, acceleration_sigma_mps2: float = 1.0, max_gap_s: float = 10):
+        self._q = acceleration_sigma_mps2 ** 2
+        self._max_gap_s = max_gap_s
+        self._time: float = None
+        self._origin_lat = 0.0
+        self._origin_lon = 0.0
+        self._meters_per_degree_lon = 0.0
+        self._east: _Axis = None
+        self._north: _Axis = None
+
+    def reset(self) -> None:
+        '''Forgets the state, the next fix starts the filter from scratch (e.g. after the receiver was disconnected).'''
+        self._time = None
+        self._east = None
+        self._north = None
+
+    def update(self, timestamp: float, lat: float, lon: float, speed: float = None, track: float = None,
+               eph: float = None, eps: float = None) -> None:
+        if self._time is not None and timestamp <= self._time:
+            return
+
+        # eph / eps are 95% estimates, roughly two standard deviations
+        position_var = (eph / 2 if eph else DEFAULT_POSITION_SIGMA_M) ** 2
+        velocity_var = (eps / 2 if eps else DEFAULT_SPEED_SIGMA_MPS) ** 2
+        velocity = _velocity(speed, track)
+
+        if self._time is None or timestamp - self._time > self._max_gap_s:
+            self._set_origin(lat, lon)
+            v_east, v_north = velocity if velocity is not None else (0.0, 0.0)
+            initial_velocity_var = velocity_var if velocity is not None else INITIAL_SPEED_SIGMA_MPS ** 2
+            self._east = _Axis(0.0, v_east, position_var, initial_velocity_var)
+            self._north = _Axis(0.0, v_north, position_var, initial_velocity_var)
+            self._time = timestamp
+            return
+
+        dt = timestamp - self._time
+        self._time = timestamp
+        x, y = self._project(lat, lon)
+        for axis, z, v in ((self._east, x, velocity[0] if velocity else None), (self._north, y, velocity[1] if velocity else None)):
+            axis.predict(dt, self._q)
+            axis.update_position(z, position_var)
+            if v is not None:
+                axis.update_velocity(v, velocity_var)
+
+        if math.hypot(self._east.position, self._north.position) > MAX_ORIGIN_DISTANCE_M:
+            lat, lon = self._unproject(self._east.position, self._north.position)
+            self._set_origin(lat, lon)
+            self._east.position = self._north.position = 0.0
+
+    def estimate(self, at: float = None) -> FilteredPosition | None:
+        '''Filtered position at the latest fix, or predicted to the unix timestamp `at` (None if more than `max_gap_s` away).'''
+        if self._time is None:
+            return None
+        at = self._time if at is None else at
+        dt = at - self._time
+        if abs(dt) > self._max_gap_s:
+            return None
+        x, v_east, xx, xv, vv_east = self._east.predicted(dt, self._q)
+        y, v_north, yy, yv, vv_north = self._north.predicted(dt, self._q)
+        lat, lon = self._unproject(x, y)
+        # State order east, north, east velocity, north velocity
+        covariance: List[List[float]] = [
+            [xx, 0.0, xv, 0.0],
+            [0.0, yy, 0.0, yv],
+            [xv, 0.0, vv_east, 0.0],
+            [0.0, yv, 0.0, vv_north],
+        ]
+        return FilteredPosition(
+            time=at,
+            lat=lat,
+            lon=lon,
+            speed=math.hypot(v_east, v_north),
+            track=math.degrees(math.atan2(v_east, v_north)) % 360,
+            predicted_s=dt,
+            covariance=covariance,
+        )
+
+    def _set_origin(self, lat: float, lon: float) -> None:
+        self._origin_lat = lat
+        self._origin_lon = lon
+        self._meters_per_degree_lon = METERS_PER_DEGREE * math.cos(math.radians(lat))
+
+    def _project(self, lat: float, lon: float) -> Tuple[float, float]:
+        return (lon - self._origin_lon) * self._meters_per_degree_lon, (lat - self._origin_lat) * METERS_PER_DEGREE
+
+    def _unproject(self, x: float, y: float) -> Tuple[float, float]:
+        return self._origin_lat + y / METERS_PER_DEGREE, self._origin_lon + x / self._meters_per_degree_lon
+
+
+def _velocity(speed: float | None, track: float | None) -> Tuple[float, float] | None:
+    if speed is None:
+        return None
+    if track is None:
+        # Without a direction, only standing still tells anything about the velocity
+        return (0.0, 0.0) if speed == 0 else None
+    track_rad = math.radians(track)
+    return speed * math.sin(track_rad), speed * math.cos(track_rad)
@@ -1,69 +1,331 @@
 import asyncio
 import logging
+import random
 import time
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Sequence, Tuple
 
-from gpsd_client_async import GpsdClient, TpvMessage
-from gpsd_client_async.messages import Mode
-from prometheus_client import Summary
+import serial_asyncio
+from gpsd_client_async import SkyMessage, TpvMessage
+from gpsd_client_async.messages import AnyGPSDMessage, Device, Devices, Mode
+from prometheus_client import Counter
+from prometheus_client import Enum as EnumMetric
+from prometheus_client import Gauge, Summary
+from serial.serialutil import SerialException
 
+from ..broadcast import Broadcaster
 from ..command import run_command
-from ..config import GpsConfig
-from .types import Position
+from ..config import GpsConfig, GpsSource
+from .geofence import GeofenceEngine
+from .gpsd import GpsdConnection
+from .history import PositionHistory
+from .kalman import PositionFilter
+from .nmea import NmeaParser, NmeaProtocol
+from .odometer import Odometer
+from .types import FilteredPosition, Position
 
 logger = logging.getLogger(__name__)
 
 GPS_MEASUREMENT_INTERVAL_SUMMARY = Summary('gps_measurement_interval', 'Tracks intervals between GPS measurements')
+GPS_FIX_MODE_GAUGE = Gauge('gps_fix_mode', 'GPS fix mode as reported by gpsd (0 = unknown, 1 = no fix, 2 = 2D, 3 = 3D)')
+GPS_FIX_AGE_GAUGE = Gauge('gps_fix_age_seconds', 'Time since the latest GPS fix')
+GPS_ERROR_ESTIMATE_GAUGE = Gauge('gps_error_estimate_meters', 'Estimated GPS position error (95% confidence)', ['direction'])
+GPS_SATELLITES_GAUGE = Gauge('gps_satellites', 'Number of GPS satellites', ['state'])
+GPS_DOP_GAUGE = Gauge('gps_dop', 'GPS dilution of precision', ['type'])
+GPSD_CONNECTION_STATE_ENUM = EnumMetric('gps_gpsd_connection_state', 'State of the connection to gpsd', states=['connecting', 'connected', 'disconnected'])
+GPSD_CONNECT_COUNTER = Counter('gps_gpsd_connects', 'Counts successful (re)connections to gpsd')
+GPS_DEVICE_INIT_COUNTER = Counter('gps_device_inits', 'Counts runs of the GPS init command', ['result'])
+GPS_SERIAL_CONNECTED_GAUGE = Gauge('gps_serial_connected', 'Whether the GPS serial port is open (1) or not (0), for source serial')
 
 
 class GpsMonitor:
 
     def __init__(self, config: GpsConfig):
         self._config = config
-        self._gpsd_client = GpsdClient(host=self._config.gpsd_host, port=self._config.gpsd_port)
+        self._connected = False
+        self._line_listeners: List[Callable[[bytes, AnyGPSDMessage | None], None]] = []
+        # Device path -> activation time of the devices init_cmd ran for
+        self._initialized_devices: Dict[str, datetime] = {}
         self._latest_tpv_msg: TpvMessage = None
+        self._latest_sky_msg: SkyMessage = None
+        self._latest_fix_time = None
+        self._latest_tpv_time = None
+        GPS_FIX_AGE_GAUGE.set_function(lambda: self.fix_age_s if self.fix_age_s is not None else float('nan'))
+        self._history = PositionHistory(self._config.history_size)
+        self._geofence_engine = GeofenceEngine(self._config.geofences)
+        self._filter = PositionFilter(self._config.kalman_acceleration_sigma_mps2) if self._config.kalman_enabled else None
+        self._odometer = Odometer(self._config.odometer_stationary_speed_mps, state_file=self._config.odometer_file)
+        # (monotonic time, serialized server-sent event) per fix
+        self._broadcaster: Broadcaster[Tuple[float, str]] = Broadcaster(self._config.stream_queue_size)
         self._inferred_measurement_rate_ms = 0
         
     async def run(self):
+        if self._config.source == GpsSource.SERIAL:
+            await self._run_serial()
+        else:
+            await self._run_gpsd()
+
+    async def _run_gpsd(self):
+        '''
+        Keeps the connection to gpsd open. Reconnects use exponential backoff with jitter, so that a dead gpsd is
+        neither hammered nor (with several clients) hit in lockstep.
+        '''
+        backoff_s = self._config.gpsd_reconnect_min_s
         while True:
+            GPSD_CONNECTION_STATE_ENUM.state('connecting')
             try:
-                if self._config.init_cmd is not None:
-                    await self._init_gps()
-
-                async with self._gpsd_client as client:
-                    previous_msg_time = time.time()
-
-                    async for message in client:
-                        if isinstance(message, TpvMessage):
-                            self._latest_tpv_msg = message
-
-                            current_time = time.time()
-                            GPS_MEASUREMENT_INTERVAL_SUMMARY.observe(current_time - previous_msg_time)
-                            previous_msg_time = current_time
+                async with GpsdConnection(self._config.gpsd_host, self._config.gpsd_port) as connection:
+                    await self._consume(connection)
             except asyncio.CancelledError:
                 logger.debug('GpsMonitor task cancelled.')
                 raise
-            except (ConnectionError, IOError, Exception):
-                logger.debug(f'Error in gpsd monitor', exc_info=True)
-                self._latest_tpv_msg = None
-                await asyncio.sleep(2)
+            except (ConnectionError, OSError) as e:
+                logger.warning(f'gpsd connection to {self._config.gpsd_host}:{self._config.gpsd_port} failed: {e}')
+            except Exception:
+                logger.warning('Unexpected error in gpsd monitor', exc_info=True)
+
+            GPSD_CONNECTION_STATE_ENUM.state('disconnected')
+            self._latest_tpv_time = None
+            self._latest_tpv_msg = None
+            self._latest_sky_msg = None
+            if self._filter is not None:
+                self._filter.reset()
+            if self._connected:
+                # The connection was up, so the outage just started
+                backoff_s = self._config.gpsd_reconnect_min_s
+                self._connected = False
+            delay_s = backoff_s * random.uniform(0.5, 1)
+            logger.info(f'Reconnecting to gpsd in {round(delay_s, 1)}s')
+            await asyncio.sleep(delay_s)
+            backoff_s = min(backoff_s * 2, self._config.gpsd_reconnect_max_s)
 
-    async def _init_gps(self) -> None:
-        logger.info(f'Initializing GPS device (running {' '.join(self._config.init_cmd)})')
+    async def _run_serial(self):
+        '''Reads NMEA / UBX directly from the receiver's serial port, reopening it with exponential backoff.'''
+        device = self._config.serial_device
+        backoff_s = self._config.serial_reconnect_min_s
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                parser = NmeaParser(ubx=self._config.serial_ubx, device=device)
+                _, protocol = await serial_asyncio.create_serial_connection(
+                    loop, lambda: NmeaProtocol(parser, self._handle_serial_message), device, baudrate=self._config.serial_baud_rate,
+                )
+            except (SerialException, OSError) as e:
+                logger.warning(f'Could not open GPS serial port {device}: {e}')
+            else:
+                logger.info(f'Opened GPS serial port {device}')
+                GPS_SERIAL_CONNECTED_GAUGE.set(1)
+                self._connected = True
+                backoff_s = self._config.serial_reconnect_min_s
+                try:
+                    if self._config.init_cmd is not None:
+                        await self._init_gps(device)
+                    await protocol.wait_closed()
+                finally:
+                    protocol.close()
+                    GPS_SERIAL_CONNECTED_GAUGE.set(0)
+                    self._connected = False
+                logger.warning(f'GPS serial port {device} closed')
+
+            self._latest_tpv_time = None
+            self._latest_tpv_msg = None
+            self._latest_sky_msg = None
+            if self._filter is not None:
+                self._filter.reset()
+            await asyncio.sleep(backoff_s)
+            backoff_s = min(backoff_s * 2, self._config.serial_reconnect_max_s)
+
+    def _handle_serial_message(self, message: TpvMessage | SkyMessage) -> None:
+        if self._line_listeners:
+            # Serialized like gpsd would, so the proxy serves the same JSON no matter the source
+            line = message.model_dump_json(by_alias=True, exclude_none=True).encode() + b'\r\n'
+            for listener in self._line_listeners:
+                listener(line, message)
+        if isinstance(message, TpvMessage):
+            self._handle_tpv(message)
+        else:
+            self._handle_sky(message)
+
+    async def _consume(self, connection: GpsdConnection) -> None:
+        while True:
+            line, message = await connection.read()
+            for listener in self._line_listeners:
+                listener(line, message)
+            if not self._connected:
+                # gpsd answers the WATCH command with VERSION, DEVICES and WATCH, so we know it is alive now
+                logger.info(f'Connected to gpsd at {self._config.gpsd_host}:{self._config.gpsd_port}')
+                GPSD_CONNECTION_STATE_ENUM.state('connected')
+                GPSD_CONNECT_COUNTER.inc()
+                self._connected = True
+
+            match message:
+                case TpvMessage():
+                    self._handle_tpv(message)
+                case SkyMessage():
+                    self._handle_sky(message)
+                case Devices():
+                    for device in message.devices:
+                        await self._handle_device(device)
+                case Device():
+                    await self._handle_device(device=message)
+
+    async def _handle_device(self, device: Device) -> None:
+        '''Runs init_cmd once per device activation (i.e. not again after reconnecting to gpsd).'''
+        if device.path is None:
+            return
+        if device.activated is None or device.activated.timestamp() == 0:
+            # gpsd deactivated the device, it needs to be initialized again once it reappears
+            self._initialized_devices.pop(device.path, None)
+            return
+        if self._config.init_cmd is None or self._initialized_devices.get(device.path) == device.activated:
+            return
+
+        if await self._init_gps(device.path):
+            self._initialized_devices[device.path] = device.activated
+
+    async def _init_gps(self, device_path: str) -> bool:
+        logger.info(f'Initializing GPS device {device_path} (running {" ".join(self._config.init_cmd)})')
 
         retcode, stdout, stderr = await run_command(self._config.init_cmd)
         if retcode != 0:
-            logger.error(f'GPS init command {' '.join(self._config.init_cmd)} failed with code {retcode}')
+            logger.error(f'GPS init command {" ".join(self._config.init_cmd)} failed with code {retcode}')
             logger.error(f'STDOUT: {stdout}')
             logger.error(f'STDERR: {stderr}')
-            raise IOError('Count not initialize GPS device')
+            GPS_DEVICE_INIT_COUNTER.labels('failed').inc()
+            return False
+
+        GPS_DEVICE_INIT_COUNTER.labels('success').inc()
+        return True
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def add_line_listener(self, listener: Callable[[bytes, AnyGPSDMessage | None], None]) -> None:
+        '''
+        Calls `listener` with every raw line received from gpsd and the parsed message (None if unknown). For source
+        serial, the lines are the messages serialized as gpsd would.
+        '''
+        self._line_listeners.append(listener)
+
+    def _handle_tpv(self, message: TpvMessage) -> None:
+        current_time = time.time()
+        if self._latest_tpv_time is not None:
+            GPS_MEASUREMENT_INTERVAL_SUMMARY.observe(current_time - self._latest_tpv_time)
+        self._latest_tpv_time = current_time
+        self._latest_tpv_msg = message
+        if message.mode in (Mode.fix2D, Mode.fix3D):
+            self._latest_fix_time = time.monotonic()
+        self._record(message)
+        self._update_tpv_metrics(message)
+        self._publish()
+
+    def _handle_sky(self, message: SkyMessage) -> None:
+        self._latest_sky_msg = message
+        if message.uSat is not None:
+            GPS_SATELLITES_GAUGE.labels('used').set(message.uSat)
+        if message.nSat is not None:
+            GPS_SATELLITES_GAUGE.labels('visible').set(message.nSat)
+        for dop_type in ('hdop', 'vdop', 'pdop'):
+            value = getattr(message, dop_type)
+            if value is not None:
+                GPS_DOP_GAUGE.labels(dop_type).set(value)
+
+    def _update_tpv_metrics(self, message: TpvMessage) -> None:
+        GPS_FIX_MODE_GAUGE.set(message.mode)
+        if message.eph is not None:
+            GPS_ERROR_ESTIMATE_GAUGE.labels('horizontal').set(message.eph)
+        if message.epv is not None:
+            GPS_ERROR_ESTIMATE_GAUGE.labels('vertical').set(message.epv)
+
+    def _record(self, message: TpvMessage) -> None:
+        if message.mode not in (Mode.fix2D, Mode.fix3D) or message.lat is None or message.lon is None:
+            return
+        timestamp = message.time.timestamp() if message.time is not None else time.time()
+        self._history.append(timestamp, message.lat, message.lon, message.alt, message.speed, message.track, message.eph, message.mode)
+        self._geofence_engine.update(message.lat, message.lon, timestamp)
+        self._odometer.update(message.lat, message.lon, timestamp, message.speed, message.eph)
+        if self._filter is not None:
+            self._filter.update(timestamp, message.lat, message.lon, message.speed, message.track, message.eph, message.eps)
+
+    def _publish(self) -> None:
+        if not self._broadcaster.has_subscribers:
+            return
+        # Serialized once, no matter how many subscribers there are
+        self._broadcaster.publish((time.monotonic(), f'data: {self.position.model_dump_json()}\n\n'))
+
+    async def stream(self, min_interval_s: float = 0) -> AsyncIterator[str]:
+        '''Yields a server-sent event per new position, but at most one every `min_interval_s` seconds.'''
+        last_sent = None
+        async with self._broadcaster.subscribe() as queue:
+            while True:
+                timestamp, event = await queue.get()
+                if last_sent is not None and timestamp - last_sent < min_interval_s:
+                    continue
+                last_sent = timestamp
+                yield event
+
+    def positions_at(self, timestamps: Sequence[float], max_gap_s: float = 5) -> Dict[str, List]:
+        '''Positions at the given unix timestamps, interpolated from the history (see PositionHistory.interpolate).'''
+        return self._history.interpolate(timestamps, max_gap_s)
+
+    @property
+    def history(self) -> PositionHistory:
+        return self._history
+
+    @property
+    def geofences(self) -> GeofenceEngine:
+        return self._geofence_engine
+
+    @property
+    def odometer(self) -> Odometer:
+        return self._odometer
+
+    def filtered_position(self, predict_to: float = None) -> FilteredPosition | None:
+        '''
+        Kalman filter estimate at the latest fix, or predicted to the unix timestamp `predict_to`. None if the filter is
+        disabled, the receiver has no fix or `predict_to` is too far from the latest fix (see PositionFilter).
+        '''
+        tpv = self._latest_tpv_msg
+        if self._filter is None or tpv is None or tpv.mode not in (Mode.fix2D, Mode.fix3D):
+            return None
+        return self._filter.estimate(predict_to)
+
+    @property
+    def fix_age_s(self) -> float | None:
+        if self._latest_fix_time is None:
+            return None
+        return time.monotonic() - self._latest_fix_time
 
     @property
     def position(self):
-        if self._latest_tpv_msg is None or self._latest_tpv_msg.mode not in (Mode.fix2D, Mode.fix3D):
-            return Position(lat=0, lon=0, fix=False)
+        sky = self._latest_sky_msg
+        satellites = dict(
+            satellites_used=sky.uSat if sky is not None else None,
+            satellites_visible=sky.nSat if sky is not None else None,
+            hdop=sky.hdop if sky is not None else None,
+        )
+
+        tpv = self._latest_tpv_msg
+        if tpv is None or tpv.mode not in (Mode.fix2D, Mode.fix3D):
+            return Position(lat=0, lon=0, fix=False, mode=tpv.mode if tpv is not None else 0, fix_age_s=self.fix_age_s,
+                            filtered=self.filtered_position(), **satellites)
         
         return Position(
-            lat=self._latest_tpv_msg.lat,
-            lon=self._latest_tpv_msg.lon,
+            lat=tpv.lat,
+            lon=tpv.lon,
             fix=True,
+            mode=tpv.mode,
+            time=tpv.time,
+            fix_age_s=self.fix_age_s,
+            alt=tpv.alt,
+            speed=tpv.speed,
+            track=tpv.track,
+            climb=tpv.climb,
+            eph=tpv.eph,
+            epv=tpv.epv,
+            eps=tpv.eps,
+            ept=tpv.ept,
+            filtered=self.filtered_position(),
+            **satellites,
         )
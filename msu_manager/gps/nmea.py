@@ -0,0 +1,374 @@
+import asyncio
+import logging
+import struct
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Set
+
+from gpsd_client_async import SkyMessage, TpvMessage
+from gpsd_client_async.messages import Mode
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+REJECTED_SENTENCES_COUNTER = Counter('gps_serial_rejected_sentences', 'Counts NMEA sentences / UBX frames from the GPS receiver that were dropped', ['reason'])
+
+# NMEA 0183 limits sentences to 82 characters, leave some room for proprietary ones
+MAX_SENTENCE_LENGTH = 128
+MAX_UBX_PAYLOAD_LENGTH = 1024
+KNOTS_TO_MPS = 1852 / 3600
+
+_UBX_SYNC = b'\xb5\x62'
+_UBX_NAV_PVT = (0x01, 0x07)
+_UBX_NAV_PVT_PAYLOAD = struct.Struct('<IHBBBBBBIiBBBBiiiiIIiiiiiIIHH4xihH')
+# Sentences that carry data of a measurement epoch
+_EPOCH_SENTENCES = frozenset(('RMC', 'GGA', 'GST'))
+
+
+def format_sentence(body: str) -> bytes:
+    '''Returns the NMEA sentence with the given body (everything between "$" and "*"), i.e. adds the checksum.'''
+    checksum = 0
+    for char in body.encode():
+        checksum ^= char
+    return f'${body}*{checksum:02X}\r\n'.encode()
+
+
+def _nmea_checksum_ok(sentence: bytes) -> bool:
+    star = sentence.rfind(b'*')
+    if star < 0 or len(sentence) - star != 3:
+        return False
+    checksum = 0
+    for char in sentence[1:star]:
+        checksum ^= char
+    try:
+        return checksum == int(sentence[star + 1:], 16)
+    except ValueError:
+        return False
+
+
+def _ubx_checksum(data: bytes) -> bytes:
+    ck_a = ck_b = 0
+    for byte in data:
+        ck_a = (ck_a + byte) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return bytes((ck_a, ck_b))
+
+
+def _coordinate(value: str, hemisphere: str) -> float | None:
+    '''Converts NMEA (d)ddmm.mmmm and N/S/E/W to signed decimal degrees.'''
+    if not value:
+        return None
+    dot = value.find('.')
+    degree_digits = (dot if dot >= 0 else len(value)) - 2
+    degrees = int(value[:degree_digits]) + float(value[degree_digits:]) / 60
+    return -degrees if hemisphere in ('S', 'W') else degrees
+
+
+def _float(value: str) -> float | None:
+    return float(value) if value else None
+
+
+def _time_of_day(value: str) -> timedelta | None:
+    if len(value) < 6:
+        return None
+    return timedelta(hours=int(value[0:2]), minutes=int(value[2:4]), seconds=float(value[4:]))
+
+
+class _Epoch:
+    '''Fields of one measurement epoch collected from several sentences.'''
+
+    __slots__ = ('time_of_day', 'sentences', 'lat', 'lon', 'alt', 'speed', 'track', 'quality', 'used', 'eph', 'epv')
+
+    def __init__(self, time_of_day: timedelta):
+        self.time_of_day = time_of_day
+        self.sentences: Set[str] = set()
+        self.lat = None
+        self.lon = None
+        self.alt = None
+        self.speed = None
+        self.track = None
+        self.quality = None
+        self.used = None
+        self.eph = None
+        self.epv = None
+
+
+class NmeaParser:
+    '''
+    Incremental parser for the serial output of a GPS receiver. It turns NMEA sentences (RMC, GGA, GSA, GSV, GST) and,
+    if enabled, UBX NAV-PVT frames into the same TPV / SKY messages gpsd produces, so GpsMonitor can use the receiver
+    without gpsd.
+
+    Sentences of one epoch are merged by their time of day. A TPV is emitted as soon as all of RMC, GGA and GST that
+    were seen in the previous epoch arrived (i.e. without waiting for the next epoch to start), or when the next epoch
+    starts. Sentences with a missing or wrong checksum are dropped, garbage is skipped up to the next "$".
+    '''
+
+    def __init__(self, ubx: bool = False, device: str = None):
+        self._ubx = ubx
+        self._device = device
+        self._buffer = bytearray()
+        self._date: date = None
+        self._epoch: _Epoch = None
+        self._epoch_emitted = False
+        self._expected_sentences: Set[str] = set()
+        self._learned = False
+        self._gsa_mode = None
+        self._pdop = None
+        self._hdop = None
+        self._vdop = None
+        self._visible: Dict[str, int] = {}
+        self._used = None
+
+    def feed(self, data: bytes) -> List[TpvMessage | SkyMessage]:
+        '''Appends `data` to the internal buffer and returns the messages completed by it.'''
+        buffer = self._buffer
+        buffer += data
+        messages = []
+        pos = 0
+        while True:
+            start = buffer.find(b'$', pos)
+            if self._ubx:
+                ubx_start = buffer.find(_UBX_SYNC, pos)
+                if ubx_start >= 0 and (start < 0 or ubx_start < start):
+                    consumed = self._feed_ubx(buffer, ubx_start, messages)
+                    if consumed is None:
+                        pos = ubx_start
+                        break
+                    pos = consumed
+                    continue
+            if start < 0:
+                # Keep a trailing partial UBX sync
+                pos = len(buffer) - 1 if self._ubx and buffer.endswith(_UBX_SYNC[:1]) else len(buffer)
+                break
+
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                if len(buffer) - start > MAX_SENTENCE_LENGTH:
+                    REJECTED_SENTENCES_COUNTER.labels('too_long').inc()
+                    pos = start + 1
+                    continue
+                pos = start
+                break
+            pos = end + 1
+            inner_start = buffer.rfind(b'$', start + 1, end)
+            if inner_start >= 0:
+                # The sentence was cut off (e.g. by a reconnect), the next one starts right away
+                REJECTED_SENTENCES_COUNTER.labels('truncated').inc()
+                start = inner_start
+            if end - start > MAX_SENTENCE_LENGTH:
+                REJECTED_SENTENCES_COUNTER.labels('too_long').inc()
+                continue
+            self._feed_sentence(bytes(buffer[start:end]).rstrip(b'\r'), messages)
+
+        del buffer[:pos]
+        return messages
+
+    def flush(self) -> List[TpvMessage | SkyMessage]:
+        '''Returns the TPV of the current epoch if it was not emitted yet (e.g. when the stream ends).'''
+        messages = []
+        self._finish_epoch(messages)
+        return messages
+
+    def _feed_sentence(self, sentence: bytes, messages: List) -> None:
+        if not _nmea_checksum_ok(sentence):
+            REJECTED_SENTENCES_COUNTER.labels('checksum').inc()
+            return
+        fields = sentence[1:-3].decode('ascii', errors='replace').split(',')
+        # Talker ID (GP, GN, GL, ...) followed by the sentence type
+        sentence_type = fields[0][2:]
+        try:
+            match sentence_type:
+                case 'RMC':
+                    self._parse_rmc(fields, messages)
+                case 'GGA':
+                    self._parse_gga(fields, messages)
+                case 'GSA':
+                    self._parse_gsa(fields)
+                case 'GSV':
+                    self._parse_gsv(fields, messages)
+                case 'GST':
+                    self._parse_gst(fields, messages)
+        except (ValueError, IndexError):
+            logger.debug(f'Invalid NMEA sentence: {sentence}')
+            REJECTED_SENTENCES_COUNTER.labels('invalid').inc()
+
+    def _epoch_for(self, time_field: str, messages: List) -> _Epoch | None:
+        time_of_day = _time_of_day(time_field)
+        if time_of_day is None:
+            return None
+        if self._epoch is None or self._epoch.time_of_day != time_of_day:
+            self._finish_epoch(messages)
+            self._epoch = _Epoch(time_of_day)
+            self._epoch_emitted = False
+        return self._epoch
+
+    def _parse_rmc(self, fields: List[str], messages: List) -> None:
+        # $GPRMC,hhmmss.ss,A,llll.ll,a,yyyyy.yy,a,x.x,x.x,ddmmyy,x.x,a*hh
+        if len(fields[9]) == 6:
+            self._date = date(2000 + int(fields[9][4:6]), int(fields[9][2:4]), int(fields[9][0:2]))
+        epoch = self._epoch_for(fields[1], messages)
+        if epoch is None:
+            return
+        if fields[2] == 'A':
+            epoch.lat = _coordinate(fields[3], fields[4])
+            epoch.lon = _coordinate(fields[5], fields[6])
+            speed_knots = _float(fields[7])
+            epoch.speed = speed_knots * KNOTS_TO_MPS if speed_knots is not None else None
+            epoch.track = _float(fields[8])
+        self._add_sentence(epoch, 'RMC', messages)
+
+    def _parse_gga(self, fields: List[str], messages: List) -> None:
+        # $GPGGA,hhmmss.ss,llll.ll,a,yyyyy.yy,a,q,nn,h.h,a.a,M,g.g,M,...*hh
+        epoch = self._epoch_for(fields[1], messages)
+        if epoch is None:
+            return
+        epoch.quality = int(fields[6] or 0)
+        if epoch.quality > 0:
+            epoch.lat = _coordinate(fields[2], fields[3])
+            epoch.lon = _coordinate(fields[4], fields[5])
+            epoch.alt = _float(fields[9])
+        epoch.used = int(fields[7]) if fields[7] else None
+        self._used = epoch.used
+        self._hdop = _float(fields[8]) if fields[8] else self._hdop
+        self._add_sentence(epoch, 'GGA', messages)
+
+    def _parse_gsa(self, fields: List[str]) -> None:
+        # $GPGSA,a,m,prn x 12,pdop,hdop,vdop*hh (NMEA 4.1 appends the system ID)
+        self._gsa_mode = int(fields[2]) if fields[2] else None
+        self._pdop = _float(fields[15])
+        self._hdop = _float(fields[16])
+        self._vdop = _float(fields[17])
+
+    def _parse_gsv(self, fields: List[str], messages: List) -> None:
+        # $GPGSV,total,number,in view,(prn,el,az,snr) x 4*hh, one series per talker (constellation)
+        self._visible[fields[0][:2]] = int(fields[3] or 0)
+        if fields[1] == fields[2]:
+            messages.append(SkyMessage(
+                device=self._device, nSat=sum(self._visible.values()), uSat=self._used,
+                hdop=self._hdop, vdop=self._vdop, pdop=self._pdop,
+            ))
+
+    def _parse_gst(self, fields: List[str], messages: List) -> None:
+        # $GPGST,hhmmss.ss,rms,major,minor,orient,lat sd,lon sd,alt sd*hh
+        epoch = self._epoch_for(fields[1], messages)
+        if epoch is None:
+            return
+        lat_sd = _float(fields[6])
+        lon_sd = _float(fields[7])
+        if lat_sd is not None and lon_sd is not None:
+            # 2DRMS, roughly the 95% confidence gpsd reports as eph
+            epoch.eph = 2 * (lat_sd ** 2 + lon_sd ** 2) ** 0.5
+        alt_sd = _float(fields[8])
+        if alt_sd is not None:
+            epoch.epv = 2 * alt_sd
+        self._add_sentence(epoch, 'GST', messages)
+
+    def _add_sentence(self, epoch: _Epoch, sentence_type: str, messages: List) -> None:
+        epoch.sentences.add(sentence_type)
+        if self._learned and not self._epoch_emitted and epoch.sentences >= self._expected_sentences:
+            self._emit(epoch, messages)
+
+    def _finish_epoch(self, messages: List) -> None:
+        epoch = self._epoch
+        if epoch is None:
+            return
+        if not self._epoch_emitted:
+            self._emit(epoch, messages)
+        # The receiver's configuration may change, learn again from every epoch
+        self._expected_sentences = epoch.sentences & _EPOCH_SENTENCES
+        self._learned = True
+
+    def _emit(self, epoch: _Epoch, messages: List) -> None:
+        self._epoch_emitted = True
+        timestamp = None
+        if self._date is not None:
+            timestamp = datetime(self._date.year, self._date.month, self._date.day, tzinfo=timezone.utc) + epoch.time_of_day
+
+        if epoch.lat is None or epoch.lon is None or epoch.quality == 0:
+            messages.append(TpvMessage(device=self._device, mode=Mode.no_fix, time=timestamp))
+            return
+
+        if self._gsa_mode in (Mode.fix2D, Mode.fix3D):
+            mode = Mode(self._gsa_mode)
+        else:
+            mode = Mode.fix3D if epoch.alt is not None else Mode.fix2D
+        messages.append(TpvMessage(
+            device=self._device, mode=mode, time=timestamp,
+            lat=epoch.lat, lon=epoch.lon, alt=epoch.alt if mode == Mode.fix3D else None,
+            speed=epoch.speed, track=epoch.track, eph=epoch.eph, epv=epoch.epv,
+        ))
+
+    def _feed_ubx(self, buffer: bytearray, start: int, messages: List) -> int | None:
+        '''Parses the UBX frame at `start`, returns the position after it (None if the frame is incomplete).'''
+        if len(buffer) - start < 6:
+            return None
+        msg_class, msg_id, length = struct.unpack_from('<BBH', buffer, start + 2)
+        if length > MAX_UBX_PAYLOAD_LENGTH:
+            REJECTED_SENTENCES_COUNTER.labels('too_long').inc()
+            return start + 2
+        end = start + 8 + length
+        if len(buffer) < end:
+            return None
+        frame = bytes(buffer[start:end])
+        if _ubx_checksum(frame[2:-2]) != frame[-2:]:
+            REJECTED_SENTENCES_COUNTER.labels('checksum').inc()
+            return start + 2
+        if (msg_class, msg_id) == _UBX_NAV_PVT and length == _UBX_NAV_PVT_PAYLOAD.size:
+            try:
+                self._parse_nav_pvt(frame[6:-2], messages)
+            except (ValueError, struct.error):
+                logger.debug(f'Invalid UBX NAV-PVT frame: {frame.hex()}')
+                REJECTED_SENTENCES_COUNTER.labels('invalid').inc()
+        # The frame is consumed even if it could not be decoded, otherwise the parser would retry it forever
+        return end
+
+    def _parse_nav_pvt(self, payload: bytes, messages: List) -> None:
+        (_, year, month, day, hour, minute, second, valid, _, nano, fix_type, flags, _, num_sv, lon, lat, _, h_msl,
+         h_acc, v_acc, _, _, vel_d, g_speed, head_mot, s_acc, _, p_dop, _, _, _, _) = _UBX_NAV_PVT_PAYLOAD.unpack(payload)
+
+        timestamp = None
+        # validDate and validTime
+        if valid & 0x03 == 0x03:
+            # Leap seconds are reported as second 60, which datetime does not support
+            timestamp = datetime(year, month, day, hour, minute, min(second, 59), tzinfo=timezone.utc) + timedelta(microseconds=nano // 1000)
+
+        # gnssFixOK, fix types 2D, 3D and GNSS + dead reckoning
+        if not flags & 0x01 or fix_type not in (2, 3, 4):
+            messages.append(TpvMessage(device=self._device, mode=Mode.no_fix, time=timestamp))
+        else:
+            mode = Mode.fix2D if fix_type == 2 else Mode.fix3D
+            messages.append(TpvMessage(
+                device=self._device, mode=mode, time=timestamp,
+                lat=lat * 1e-7, lon=lon * 1e-7, alt=h_msl / 1000 if mode == Mode.fix3D else None,
+                speed=g_speed / 1000, track=head_mot * 1e-5, climb=-vel_d / 1000,
+                eph=h_acc / 1000, epv=v_acc / 1000, eps=s_acc / 1000,
+            ))
+        messages.append(SkyMessage(device=self._device, uSat=num_sv, pdop=p_dop * 0.01))
+
+
+class NmeaProtocol(asyncio.Protocol):
+    '''Feeds the serial byte stream into an NmeaParser and hands the resulting messages to `on_message`.'''
+
+    def __init__(self, parser: NmeaParser, on_message: Callable[[TpvMessage | SkyMessage], None]):
+        self._parser = parser
+        self._on_message = on_message
+        self._transport = None
+        self._closed = asyncio.Event()
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self._transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        for message in self._parser.feed(data):
+            self._on_message(message)
+
+    def connection_lost(self, exc):
+        logger.debug('NmeaProtocol serial listener stopped', exc_info=exc)
+        self._closed.set()
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
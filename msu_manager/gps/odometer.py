@@ -0,0 +1,151 @@
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+from prometheus_client import Gauge
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+ODOMETER_GAUGE = Gauge('gps_odometer_meters', 'Total distance travelled according to GPS')
+TRIP_DISTANCE_GAUGE = Gauge('gps_trip_distance_meters', 'Distance travelled in the current trip (ignition on)')
+TRIP_ACTIVE_GAUGE = Gauge('gps_trip_active', 'Whether a trip is in progress (1) or not (0)')
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.radians(1) * EARTH_RADIUS_M
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class Trip(BaseModel):
+    start_time: float
+    end_time: Optional[float] = None
+    distance_m: float = 0
+
+
+class OdometerState(BaseModel):
+    total_m: float = 0
+    trip: Optional[Trip] = None
+    last_trip: Optional[Trip] = None
+
+
+class Odometer:
+    '''
+    Accumulates the distance between consecutive fixes. While stationary (speed below `stationary_speed_mps`), movements
+    within the error estimate of the fix (at least `min_step_m`) are considered jitter and not counted. Jumps faster than
+    `max_speed_mps` are considered outliers. A trip lasts from ignition on to ignition off.
+    '''
+
+    def __init__(self, stationary_speed_mps: float = 0.5, min_step_m: float = 5, max_speed_mps: float = 100, state_file: Path = None):
+        self._stationary_speed_mps = stationary_speed_mps
+        self._min_step_m = min_step_m
+        self._max_speed_mps = max_speed_mps
+        self._state_file = Path(state_file) if state_file is not None else None
+        self._state = self._load() or OdometerState()
+        self._anchor = None
+        self._dirty = False
+        self._update_metrics()
+
+    def update(self, lat: float, lon: float, timestamp: float, speed: float = None, eph: float = None) -> None:
+        if self._anchor is None:
+            self._anchor = (lat, lon, timestamp)
+            return
+
+        anchor_lat, anchor_lon, anchor_time = self._anchor
+        distance_m = haversine_m(anchor_lat, anchor_lon, lat, lon)
+        stationary = speed is not None and speed < self._stationary_speed_mps
+        if stationary and distance_m < max(self._min_step_m, eph or 0):
+            return
+
+        elapsed_s = timestamp - anchor_time
+        if elapsed_s > 0 and distance_m / elapsed_s > self._max_speed_mps:
+            logger.debug(f'Ignoring implausible GPS jump of {round(distance_m)}m in {round(elapsed_s, 2)}s')
+        else:
+            self._state.total_m += distance_m
+            if self._state.trip is not None:
+                self._state.trip.distance_m += distance_m
+            self._dirty = True
+            self._update_metrics()
+        self._anchor = (lat, lon, timestamp)
+
+    def set_ignition(self, on: bool, timestamp: float) -> None:
+        if on and self._state.trip is None:
+            logger.info('Starting trip')
+            self._state.trip = Trip(start_time=timestamp)
+        elif not on and self._state.trip is not None:
+            trip = self._state.trip
+            trip.end_time = timestamp
+            logger.info(f'Trip ended after {round(trip.distance_m)}m')
+            self._state.last_trip = trip
+            self._state.trip = None
+        else:
+            return
+        self._dirty = True
+        self._update_metrics()
+        self.persist()
+
+    @property
+    def state(self) -> OdometerState:
+        return self._state
+
+    def persist(self) -> None:
+        '''
+        Writes the state to the state file if it changed. The state is written to a temp file, synced and then renamed,
+        so the file is complete even after a power cut (which is how the vehicle usually shuts down).
+        '''
+        if self._state_file is None or not self._dirty:
+            return
+        tmp_file = self._state_file.with_name(f'.{self._state_file.name}.tmp')
+        try:
+            with open(tmp_file, 'w') as file:
+                file.write(self._state.model_dump_json())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file, self._state_file)
+            _fsync_directory(self._state_file.parent)
+            self._dirty = False
+        except OSError as e:
+            logger.error(f'Could not write odometer file {self._state_file}: {e}')
+
+    def _load(self) -> OdometerState | None:
+        if self._state_file is None:
+            return None
+        try:
+            return OdometerState.model_validate_json(self._state_file.read_bytes())
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f'Ignoring unreadable odometer file {self._state_file}: {e}')
+            return None
+        except ValidationError as e:
+            # Keep the file for inspection / manual recovery, the next persist() would overwrite it otherwise
+            corrupt_file = self._state_file.with_name(f'{self._state_file.name}.corrupt')
+            logger.warning(f'Invalid odometer file {self._state_file}, moving it to {corrupt_file} and starting from 0: {e}')
+            try:
+                os.replace(self._state_file, corrupt_file)
+            except OSError as e:
+                logger.error(f'Could not move invalid odometer file {self._state_file}: {e}')
+            return None
+
+    def _update_metrics(self) -> None:
+        ODOMETER_GAUGE.set(self._state.total_m)
+        TRIP_DISTANCE_GAUGE.set(self._state.trip.distance_m if self._state.trip is not None else 0)
+        TRIP_ACTIVE_GAUGE.set(1 if self._state.trip is not None else 0)
+
+
+def _fsync_directory(path: Path) -> None:
+    '''Makes a rename within `path` durable.'''
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Set, Tuple
+
+from gpsd_client_async.messages import AnyGPSDMessage, Device, Devices, Sky, TPV, Version, Watch
+from prometheus_client import Counter, Gauge
+
+from ..broadcast import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+PROXY_CLIENTS_GAUGE = Gauge('gps_proxy_clients', 'Number of clients connected to the local gpsd proxy')
+PROXY_DROPPED_COUNTER = Counter('gps_proxy_dropped_messages', 'Counts messages dropped for slow gpsd proxy clients')
+
+_COMMAND_PATTERN = re.compile(r'^\?(\w+)(?:=(.*?))?;?$')
+# The proxy only ever serves JSON, this is what it answers to clients not sending WATCH
+_DEFAULT_VERSION = b'{"class":"VERSION","release":"msu-manager","rev":"proxy","proto_major":3,"proto_minor":11}\r\n'
+_EMPTY_DEVICES = b'{"class":"DEVICES","devices":[]}\r\n'
+
+
+class GpsdProxy:
+    '''
+    Re-serves the upstream gpsd stream of GpsMonitor to local TCP clients using the gpsd JSON protocol, so that there is
+    only one upstream gpsd client. Upstream lines are forwarded as they are (no re-serialization).
+
+    Supported commands are ?WATCH (enable and device filtering), ?POLL, ?VERSION and ?DEVICES. Every client has a
+    bounded queue, the oldest messages are dropped if it does not keep up.
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 2948, queue_size: int = 100):
+        self._host = host
+        self._port = port
+        self._broadcaster: Broadcaster[Tuple[bytes, str | None]] = Broadcaster(queue_size)
+        self._server: asyncio.Server = None
+        self._client_tasks: Set[asyncio.Task] = set()
+        self._version_line = _DEFAULT_VERSION
+        self._devices_line = _EMPTY_DEVICES
+        self._latest_tpv_line: bytes = None
+        self._latest_sky_line: bytes = None
+        PROXY_CLIENTS_GAUGE.set(0)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, self._host, self._port)
+        logger.info(f'gpsd proxy listening on {self._host}:{self.port}')
+
+    async def stop(self) -> None:
+        self._server.close()
+        for task in list(self._client_tasks):
+            task.cancel()
+        await self._server.wait_closed()
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def publish(self, line: bytes, message: AnyGPSDMessage | None) -> None:
+        '''Forwards an upstream line to all watching clients (to be registered as line listener of GpsMonitor).'''
+        match message:
+            case Version():
+                self._version_line = line
+                return
+            case Devices():
+                self._devices_line = line
+                return
+            case Watch():
+                # Answer to our own WATCH command
+                return
+            case TPV():
+                self._latest_tpv_line = line
+            case Sky():
+                self._latest_sky_line = line
+
+        if self._broadcaster.has_subscribers:
+            self._broadcaster.publish((line, _device_of(message)))
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        PROXY_CLIENTS_GAUGE.inc()
+        forward_task = None
+        try:
+            writer.write(self._version_line)
+            while True:
+                command = await reader.readline()
+                if not command:
+                    break
+                match = _COMMAND_PATTERN.match(command.strip().decode(errors='replace'))
+                if match is None:
+                    writer.write(b'{"class":"ERROR","message":"Unrecognized request"}\r\n')
+                    continue
+
+                name, argument = match.groups()
+                if name == 'WATCH':
+                    try:
+                        watch = json.loads(argument) if argument else {}
+                    except ValueError:
+                        watch = None
+                    if not isinstance(watch, dict):
+                        writer.write(b'{"class":"ERROR","message":"Invalid WATCH argument"}\r\n')
+                        continue
+                    if forward_task is not None:
+                        forward_task.cancel()
+                        forward_task = None
+                    if watch.get('enable', True):
+                        writer.write(self._devices_line)
+                        forward_task = asyncio.create_task(self._forward(writer, watch.get('device')))
+                    writer.write(json.dumps({'class': 'WATCH', 'enable': watch.get('enable', True), 'json': True}, separators=(',', ':')).encode() + b'\r\n')
+                elif name == 'POLL':
+                    writer.write(self._poll_line())
+                elif name == 'VERSION':
+                    writer.write(self._version_line)
+                elif name == 'DEVICES':
+                    writer.write(self._devices_line)
+                else:
+                    writer.write(b'{"class":"ERROR","message":"Unrecognized request"}\r\n')
+                await writer.drain()
+        except (ConnectionError, OSError, ValueError):
+            logger.debug('gpsd proxy client failed', exc_info=True)
+        finally:
+            if forward_task is not None:
+                forward_task.cancel()
+            writer.close()
+            PROXY_CLIENTS_GAUGE.dec()
+            self._client_tasks.discard(task)
+
+    async def _forward(self, writer: asyncio.StreamWriter, device: str | None) -> None:
+        try:
+            async with self._broadcaster.subscribe() as queue:
+                reported_drops = 0
+                while True:
+                    line, message_device = await queue.get()
+                    if queue.dropped > reported_drops:
+                        PROXY_DROPPED_COUNTER.inc(queue.dropped - reported_drops)
+                        reported_drops = queue.dropped
+                    if device is not None and message_device is not None and message_device != device:
+                        continue
+                    writer.write(line)
+                    await writer.drain()
+        except (ConnectionError, OSError):
+            # The client is gone, _handle_client notices on its next read and cleans up
+            logger.debug('gpsd proxy client disconnected while forwarding', exc_info=True)
+
+    def _poll_line(self) -> bytes:
+        tpv = self._latest_tpv_line.strip() if self._latest_tpv_line is not None else b''
+        sky = self._latest_sky_line.strip() if self._latest_sky_line is not None else b''
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z').encode()
+        active = b'1' if tpv else b'0'
+        return b'{"class":"POLL","time":"%s","active":%s,"tpv":[%s],"sky":[%s]}\r\n' % (timestamp, active, tpv, sky)
+
+
+def _device_of(message: AnyGPSDMessage | None) -> str | None:
+    if isinstance(message, Device):
+        return message.path
+    return getattr(message, 'device', None)
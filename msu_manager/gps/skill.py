@@ -1,10 +1,18 @@
 import asyncio
 import logging
+import time
+from typing import Dict, List
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from ..config import GpsConfig
+from .compression import compress_track
+from .geofence import GeofenceEvent
 from .monitor import GpsMonitor
+from .odometer import OdometerState
+from .proxy import GpsdProxy
+from .types import PositionLookupRequest
 
 logger = logging.getLogger(__name__)
 
@@ -14,25 +22,102 @@ class GpsSkill:
         self._config = config
         self._gps_monitor = None
         self._monitor_task = None
+        self._persist_task = None
+        self._gpsd_proxy = None
 
     async def run(self) -> None:
         self._gps_monitor = GpsMonitor(self._config)
+        if self._config.proxy_port is not None:
+            self._gpsd_proxy = GpsdProxy(self._config.proxy_host, self._config.proxy_port, self._config.proxy_queue_size)
+            await self._gpsd_proxy.start()
+            self._gps_monitor.add_line_listener(self._gpsd_proxy.publish)
         self._monitor_task = asyncio.create_task(self._gps_monitor.run())
+        self._persist_task = asyncio.create_task(self._persist_periodically())
 
         logger.info('Started GPS skill')
 
     async def close(self) -> None:
-        self._monitor_task.cancel()
-        try:
-            await self._monitor_task
-        except asyncio.CancelledError:
-            # Task cancellation is expected here as we've called cancel()
-            pass
+        for task in (self._persist_task, self._monitor_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Task cancellation is expected here as we've called cancel()
+                pass
+        self._gps_monitor.odometer.persist()
+        if self._gpsd_proxy is not None:
+            await self._gpsd_proxy.stop()
 
         logger.info('Stopped GPS skill')
 
+    def handle_ignition(self, ignition_state: str) -> None:
+        '''Starts / ends odometer trips, to be registered as ignition listener of the HCU skill.'''
+        if ignition_state in ('on', 'off'):
+            self._gps_monitor.odometer.set_ignition(ignition_state == 'on', time.time())
+
+    async def _persist_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._config.odometer_persist_interval_s)
+            self._gps_monitor.odometer.persist()
+
     def add_routes(self, router: APIRouter) -> None:
 
         @router.get('/position', status_code=status.HTTP_200_OK)
-        async def position_endpoint():
-            return self._gps_monitor.position
\ No newline at end of file
+        async def position_endpoint(predict_to: float = None):
+            '''
+            Returns the latest position. With the Kalman filter enabled, `filtered` holds the smoothed position, predicted
+            to the unix timestamp `predict_to` if given (e.g. the current time, to get positions between fixes). `filtered`
+            is null without a fix or if `predict_to` is further from the latest fix than the filter bridges.
+            '''
+            if predict_to is not None and not self._config.kalman_enabled:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='predict_to requires the Kalman filter (gps.kalman_enabled)')
+            position = self._gps_monitor.position
+            if predict_to is not None:
+                position.filtered = self._gps_monitor.filtered_position(predict_to)
+            return position
+
+        @router.get('/track', status_code=status.HTTP_200_OK)
+        async def track_endpoint(since: float = None, max_points: int = Query(None, ge=1)):
+            '''Returns the recorded fixes newer than `since` (unix timestamp) as columns, downsampled to at most `max_points`.'''
+            # The track is plain lists already, so skip FastAPI's per-item serialization
+            return JSONResponse(self._gps_monitor.history.track(since, max_points))
+
+        @router.get('/track/export', status_code=status.HTTP_200_OK)
+        async def track_export_endpoint(since: float = None, tolerance_m: float = Query(None, ge=0), precision: int = Query(None, ge=0, le=9)):
+            '''
+            Returns the fixes newer than `since` simplified to `tolerance_m` and delta-encoded (see gps/compression.py) for
+            uploading over the metered uplink. Defaults to the configured export tolerance / precision.
+            '''
+            track = self._gps_monitor.history.track(since, self._config.export_max_points)
+            # Simplifying a long track takes up to a few hundred milliseconds, keep the event loop responsive meanwhile
+            data = await asyncio.to_thread(
+                compress_track,
+                track,
+                tolerance_m if tolerance_m is not None else self._config.export_tolerance_m,
+                precision if precision is not None else self._config.export_precision,
+            )
+            return Response(data, media_type='application/octet-stream')
+
+        @router.post('/positions/lookup', status_code=status.HTTP_200_OK)
+        async def positions_lookup_endpoint(request: PositionLookupRequest):
+            '''Returns the interpolated positions at the given unix timestamps as columns (None where there is no data).'''
+            return JSONResponse(self._gps_monitor.positions_at(request.timestamps, request.max_gap_s))
+
+        @router.get('/odometer', status_code=status.HTTP_200_OK)
+        async def odometer_endpoint() -> OdometerState:
+            return self._gps_monitor.odometer.state
+
+        @router.get('/geofences', status_code=status.HTTP_200_OK)
+        async def geofences_endpoint() -> Dict[str, bool]:
+            '''Returns whether the latest fix is inside each configured geofence.'''
+            return self._gps_monitor.geofences.state()
+
+        @router.get('/geofences/events', status_code=status.HTTP_200_OK)
+        async def geofence_events_endpoint(after: int = Query(0, ge=0)) -> List[GeofenceEvent]:
+            '''Returns the recent geofence enter / exit events with a sequence number greater than `after`.'''
+            return self._gps_monitor.geofences.events(after)
+
+        @router.get('/stream', status_code=status.HTTP_200_OK)
+        async def stream_endpoint(min_interval_s: float = Query(0, ge=0)):
+            '''Pushes every new position as server-sent event, decimated to at most one per `min_interval_s`.'''
+            return StreamingResponse(self._gps_monitor.stream(min_interval_s), media_type='text/event-stream')
\ No newline at end of file
@@ -1,6 +1,46 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class FilteredPosition(BaseModel):
+    # Unix timestamp the estimate is for
+    time: float
+    lat: float
+    lon: float
+    speed: float
+    track: float
+    # Seconds the estimate is extrapolated beyond the latest fix
+    predicted_s: float
+    # State order east, north (m), east velocity, north velocity (m/s)
+    covariance: List[List[float]]
+
 
 class Position(BaseModel):
     lat: float
     lon: float
-    fix: bool
\ No newline at end of file
+    fix: bool
+    mode: int = 0
+    time: Optional[datetime] = None
+    # Seconds since the latest fix was received, i.e. how stale lat / lon are
+    fix_age_s: Optional[float] = None
+    alt: Optional[float] = None
+    speed: Optional[float] = None
+    track: Optional[float] = None
+    climb: Optional[float] = None
+    # Error estimates (95% confidence) as reported by gpsd
+    eph: Optional[float] = None
+    epv: Optional[float] = None
+    eps: Optional[float] = None
+    ept: Optional[float] = None
+    satellites_used: Optional[int] = None
+    satellites_visible: Optional[int] = None
+    hdop: Optional[float] = None
+    # Kalman filter estimate (if enabled)
+    filtered: Optional[FilteredPosition] = None
+
+
+class PositionLookupRequest(BaseModel):
+    timestamps: List[float] = Field(max_length=100000)
+    max_gap_s: float = 5
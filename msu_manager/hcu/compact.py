@@ -0,0 +1,125 @@
+'''
+Compact binary framing for the HCU serial link.
+
+A compact frame on the wire is a 0x00 start marker, the COBS-encoded payload and a 0x00 terminator. The payload is a
+one byte type code followed by the string fields of the message in declaration order, each prefixed with its length
+(one byte, i.e. at most 255 bytes of UTF-8). Optional fields (HEARTBEAT version) are simply left out.
+
+Example: METRIC temp0=42.0 is 15 bytes on the wire instead of 47 bytes as JSON line.
+'''
+from .messages import (HcuMessage, HeartbeatMessage, LogMessage, MessageType,
+                       MetricMessage, ResumeMessage, ShutdownMessage)
+
+FRAME_MARKER = b'\x00'
+# Type code and two length-prefixed fields, plus COBS overhead
+MAX_FRAME_LENGTH = 3 + 2 * 256 + 3
+
+TYPE_CODES = {
+    MessageType.SHUTDOWN: 1,
+    MessageType.RESUME: 2,
+    MessageType.HEARTBEAT: 3,
+    MessageType.LOG: 4,
+    MessageType.METRIC: 5,
+}
+_FIELDS = {
+    MessageType.SHUTDOWN: (),
+    MessageType.RESUME: (),
+    MessageType.HEARTBEAT: ('version',),
+    MessageType.LOG: ('level', 'message'),
+    MessageType.METRIC: ('key', 'value'),
+}
+_MODELS = {
+    1: (ShutdownMessage, MessageType.SHUTDOWN),
+    2: (ResumeMessage, MessageType.RESUME),
+    3: (HeartbeatMessage, MessageType.HEARTBEAT),
+    4: (LogMessage, MessageType.LOG),
+    5: (MetricMessage, MessageType.METRIC),
+}
+
+
+class CompactFormatError(ValueError):
+    pass
+
+
+def cobs_encode(data: bytes) -> bytes:
+    '''Consistent Overhead Byte Stuffing: removes all 0x00 bytes from `data` at the cost of at most one byte per 254 bytes.'''
+    encoded = bytearray()
+    block_start = 0
+    while True:
+        zero_pos = data.find(b'\x00', block_start, block_start + 254)
+        if zero_pos == -1:
+            block = data[block_start:block_start + 254]
+            if len(block) == 254:
+                encoded.append(255)
+                encoded += block
+                block_start += 254
+                continue
+            encoded.append(len(block) + 1)
+            encoded += block
+            return bytes(encoded)
+        encoded.append(zero_pos - block_start + 1)
+        encoded += data[block_start:zero_pos]
+        block_start = zero_pos + 1
+
+
+def cobs_decode(data: bytes) -> bytes:
+    decoded = bytearray()
+    pos = 0
+    length = len(data)
+    while pos < length:
+        code = data[pos]
+        if code == 0:
+            raise CompactFormatError('Unexpected zero byte in COBS data')
+        block_end = pos + code
+        if block_end > length:
+            raise CompactFormatError('COBS block exceeds frame')
+        decoded += data[pos + 1:block_end]
+        pos = block_end
+        if code != 255 and pos < length:
+            decoded.append(0)
+    return bytes(decoded)
+
+
+def encode_compact_message(message: HcuMessage) -> bytes:
+    '''Encodes `message` as complete compact frame, ready to be written to the wire.'''
+    payload = bytearray((TYPE_CODES[message.type],))
+    for field in _FIELDS[message.type]:
+        value = getattr(message, field)
+        if value is None:
+            continue
+        encoded_value = value.encode('utf-8')
+        if len(encoded_value) > 255:
+            raise CompactFormatError(f'Field {field} exceeds 255 bytes')
+        payload.append(len(encoded_value))
+        payload += encoded_value
+    return FRAME_MARKER + cobs_encode(bytes(payload)) + FRAME_MARKER
+
+
+def decode_compact_message(payload: bytes) -> HcuMessage:
+    '''Decodes a (COBS-decoded) compact payload into the matching HcuMessage model.'''
+    if not payload or payload[0] not in _MODELS:
+        raise CompactFormatError('Unknown message type code')
+
+    model, message_type = _MODELS[payload[0]]
+    values = {'type': message_type}
+    pos = 1
+    try:
+        for field in _FIELDS[message_type]:
+            if pos == len(payload) and field == 'version':
+                break
+            length = payload[pos]
+            end = pos + 1 + length
+            if end > len(payload):
+                raise CompactFormatError(f'Field {field} exceeds frame')
+            values[field] = payload[pos + 1:end].decode('utf-8')
+            pos = end
+    except IndexError:
+        raise CompactFormatError('Frame is truncated') from None
+    except UnicodeDecodeError:
+        raise CompactFormatError('Field is not valid UTF-8') from None
+
+    if pos != len(payload):
+        raise CompactFormatError('Unexpected trailing bytes')
+
+    # All fields are strings by construction, so validation can be skipped
+    return model.model_construct(**values)
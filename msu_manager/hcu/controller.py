@@ -1,29 +1,49 @@
 import asyncio
 import logging
 import time
-from typing import List
+from typing import Callable, Dict, List
 
-from prometheus_client import Enum, Gauge, Summary
+from prometheus_client import Enum, Summary
 
 from ..command import run_command
+from ..config import PreShutdownHookConfig
+from .hooks import run_pre_shutdown_hooks
 from .messages import (HcuMessage, HeartbeatMessage, LogMessage, MetricMessage,
                        ResumeMessage, ShutdownMessage)
-from .shutdown import ShutdownError, ShutdownModel
+from .liveness import LivenessTracker
+from .logbuffer import HcuLogBuffer
+from .metrics import MetricIngestor
+from .shutdown import DEFAULT_INHIBIT_CLIENT, ShutdownModel, ShutdownPhase
+from .state import PersistedHcuState, StateStore
 
 logger = logging.getLogger(__name__)
 
 TIME_SINCE_LAST_HEARTBEAT_SUMMARY = Summary('hcu_time_since_last_heartbeat', 'Tracks time intervals between HCU heartbeats')
-METRIC_GAUGE = Gauge('hcu_metric', 'Tracks numeric HCU METRIC event values', ['key'])
 IGNITION_STATE_ENUM = Enum('hcu_ignition_state', 'Ignition state of the vehicle as reported by the HCU', states=['on', 'off', 'unknown'])
+SHUTDOWN_PHASE_ENUM = Enum('hcu_shutdown_phase', 'Phase of the HCU-triggered shutdown', states=[p.value for p in ShutdownPhase])
 
 
 class HcuController:
-    def __init__(self, shutdown_command: List[str], shutdown_delay_s: int):
+    def __init__(self, shutdown_command: List[str], shutdown_delay_s: int, metric_ingestor: MetricIngestor = None, liveness_tracker: LivenessTracker = None,
+                 log_buffer: HcuLogBuffer = None, pre_shutdown_hooks: List[PreShutdownHookConfig] = None, pre_shutdown_timeout_s: float = 30,
+                 state_store: StateStore = None):
         self._shutdown_command = shutdown_command
-        self._shutdown_task = None
+        self._pre_shutdown_hooks = pre_shutdown_hooks or []
+        self._pre_shutdown_timeout_s = pre_shutdown_timeout_s
+        self._metric_ingestor = metric_ingestor if metric_ingestor is not None else MetricIngestor()
+        self._liveness_tracker = liveness_tracker if liveness_tracker is not None else LivenessTracker()
+        self._log_buffer = log_buffer if log_buffer is not None else HcuLogBuffer()
         self._shutdown_model = ShutdownModel(shutdown_delay_s)
-        self._last_heartbeat_time = time.time()
+        self._shutdown_timer: asyncio.TimerHandle = None
+        self._shutdown_timer_deadline = None
+        self._shutdown_task = None
+        self._shutdown_phase = ShutdownPhase.IDLE
+        SHUTDOWN_PHASE_ENUM.state(ShutdownPhase.IDLE.value)
+        self._ignition_state = 'unknown'
         IGNITION_STATE_ENUM.state('unknown')
+        self._state_store = state_store
+        self._ignition_listeners: List[Callable[[str], None]] = []
+        self._last_heartbeat_time = time.time()
 
     async def process_message(self, message: HcuMessage):
         logger.debug(f'Processing {type(message).__name__}')
@@ -33,41 +53,78 @@ class HcuController:
             case ResumeMessage():
                 await self.handle_resume()
             case HeartbeatMessage():
-                self._handle_heartbeat()
+                self._handle_heartbeat(message)
             case LogMessage():
                 self._handle_log(message)
             case MetricMessage():
                 self._handle_metric(message)
 
-    async def inhibit_shutdown(self, seconds: int):
-        self._shutdown_model.inhibit(seconds)
-        
-        if self.is_shutdown_scheduled:
-            await self._cancel_shutdown()
-            await self._schedule_shutdown()
+    def inhibit_shutdown(self, seconds: int, client_id: str = DEFAULT_INHIBIT_CLIENT):
+        self._shutdown_model.inhibit(seconds, client_id)
+        self._reschedule_shutdown()
+        self._persist_state()
+
+    def release_shutdown_inhibit(self, client_id: str) -> bool:
+        released = self._shutdown_model.release_inhibit(client_id)
+        if released:
+            self._reschedule_shutdown()
+            self._persist_state()
+        return released
+
+    def restore_state(self):
+        '''Restores the state persisted before the last restart, i.e. resumes a pending shutdown. Must be called before messages are processed.'''
+        state = self._state_store.load() if self._state_store is not None else None
+        if state is None:
+            return
+
+        self._ignition_state = state.ignition_state
+        IGNITION_STATE_ENUM.state(state.ignition_state)
+        self._shutdown_model.restore(state.shutdown_timer_expiry, state.inhibit_leases)
+        if state.shutdown_phase != ShutdownPhase.IDLE and self._shutdown_model.is_active:
+            # An interrupted execution is retried right away, as its deadline has passed already
+            logger.info(f'Resuming pending shutdown in {round(self._shutdown_model.time_remaining, 2)} seconds')
+            self._set_shutdown_phase(ShutdownPhase.SCHEDULED)
+            self._arm_shutdown_timer()
+        else:
+            self._shutdown_model.stop()
+
+    @property
+    def ignition_state(self) -> str:
+        return self._ignition_state
+
+    def add_ignition_listener(self, listener: Callable[[str], None]) -> None:
+        '''Calls `listener` with the current ignition state and on every change ('on', 'off' or 'unknown').'''
+        self._ignition_listeners.append(listener)
+        listener(self._ignition_state)
+
+    @property
+    def shutdown_inhibit_leases(self) -> Dict[str, float]:
+        return self._shutdown_model.inhibit_leases
+
+    @property
+    def shutdown_phase(self) -> ShutdownPhase:
+        return self._shutdown_phase
 
     @property
     def is_shutdown_scheduled(self) -> bool:
-        return self._shutdown_task is not None
+        return self._shutdown_phase != ShutdownPhase.IDLE
 
     @property
     def remaining_shutdown_time(self) -> float | None:
-        try:
-            time_remaining = self._shutdown_model.time_remaining
-            return time_remaining if self.is_shutdown_scheduled else None
-        except ShutdownError:
+        if self._shutdown_phase == ShutdownPhase.IDLE:
             return None
-                
+        return self._shutdown_model.time_remaining
+
     async def handle_shutdown(self):
-        IGNITION_STATE_ENUM.state('off')
+        self._set_ignition_state('off')
 
         if self.is_shutdown_scheduled:
             logger.warning('Shutdown already scheduled, ignoring duplicate request.')
             return
 
-        await self._schedule_shutdown()
-        
-    async def _schedule_shutdown(self):
+        self._schedule_shutdown()
+
+    def _schedule_shutdown(self):
         self._shutdown_model.start()
         time_remaining = self._shutdown_model.time_remaining
 
@@ -75,22 +132,27 @@ class HcuController:
             logger.info(f'Scheduling shutdown in {round(time_remaining, 2)} seconds (inhibited by user)')
         else:
             logger.info(f'Scheduling shutdown in {self._shutdown_model.static_delay} seconds.')
-            
-        self._shutdown_task = asyncio.create_task(self._delayed_shutdown(time_remaining))
+
+        self._set_shutdown_phase(ShutdownPhase.SCHEDULED)
+        self._arm_shutdown_timer()
 
     async def handle_resume(self):
-        IGNITION_STATE_ENUM.state('on')
-        
+        self._set_ignition_state('on')
+
         if not self.is_shutdown_scheduled:
             logger.warning('No shutdown scheduled, nothing to resume.')
             return
-        
+
         logger.info('Cancelling scheduled shutdown.')
         await self._cancel_shutdown()
         logger.info('Scheduled shutdown cancelled successfully.')
 
     async def _cancel_shutdown(self):
-        if self.is_shutdown_scheduled:
+        if self._shutdown_timer is not None:
+            self._shutdown_timer.cancel()
+            self._shutdown_timer = None
+
+        if self._shutdown_task is not None:
             self._shutdown_task.cancel()
             try:
                 await self._shutdown_task
@@ -98,11 +160,40 @@ class HcuController:
                 # Task cancellation is expected here as we've called cancel()
                 pass
             self._shutdown_task = None
-            self._shutdown_model.stop()
-        
-    async def _delayed_shutdown(self, delay_s: int):
-        await asyncio.sleep(delay_s)
-        
+
+        self._shutdown_model.stop()
+        self._set_shutdown_phase(ShutdownPhase.IDLE)
+
+    def _reschedule_shutdown(self):
+        if self._shutdown_phase == ShutdownPhase.SCHEDULED:
+            # Leases are renewed frequently, so this is not worth an info message
+            logger.debug(f'Rescheduling shutdown in {round(self._shutdown_model.time_remaining, 2)} seconds')
+            self._arm_shutdown_timer()
+
+    def _arm_shutdown_timer(self):
+        deadline = self._shutdown_model.deadline
+        if self._shutdown_timer is not None:
+            if deadline >= self._shutdown_timer_deadline:
+                # The timer fires early and re-arms itself, so postponing the shutdown needs no rescheduling
+                return
+            self._shutdown_timer.cancel()
+
+        loop = asyncio.get_running_loop()
+        self._shutdown_timer = loop.call_at(loop.time() + self._shutdown_model.time_remaining, self._on_shutdown_timer)
+        self._shutdown_timer_deadline = deadline
+
+    def _on_shutdown_timer(self):
+        self._shutdown_timer = None
+        if self._shutdown_model.time_remaining > 0:
+            self._arm_shutdown_timer()
+            return
+
+        self._set_shutdown_phase(ShutdownPhase.EXECUTING)
+        self._shutdown_task = asyncio.create_task(self._execute_shutdown())
+
+    async def _execute_shutdown(self):
+        await run_pre_shutdown_hooks(self._pre_shutdown_hooks, self._pre_shutdown_timeout_s)
+
         logger.info('Executing shutdown now.')
         retcode, stdout, stderr = await run_command(self._shutdown_command)
 
@@ -115,23 +206,49 @@ class HcuController:
         # Cleanup
         self._shutdown_task = None
         self._shutdown_model.stop()
+        self._set_shutdown_phase(ShutdownPhase.IDLE)
+
+    def _set_shutdown_phase(self, phase: ShutdownPhase):
+        self._shutdown_phase = phase
+        SHUTDOWN_PHASE_ENUM.state(phase.value)
+        self._persist_state()
+
+    def _set_ignition_state(self, ignition_state: str):
+        changed = ignition_state != self._ignition_state
+        self._ignition_state = ignition_state
+        IGNITION_STATE_ENUM.state(ignition_state)
+        self._persist_state()
+        if changed:
+            for listener in self._ignition_listeners:
+                listener(ignition_state)
+
+    def _persist_state(self):
+        if self._state_store is None:
+            return
+        self._state_store.save(PersistedHcuState(
+            ignition_state=self._ignition_state,
+            shutdown_phase=self._shutdown_phase,
+            shutdown_timer_expiry=self._shutdown_model.timer_expiry,
+            inhibit_leases=self._shutdown_model.inhibit_lease_expiries,
+        ))
+
+    @property
+    def liveness(self) -> LivenessTracker:
+        return self._liveness_tracker
+
+    @property
+    def log_buffer(self) -> HcuLogBuffer:
+        return self._log_buffer
 
-    def _handle_heartbeat(self):
+    def _handle_heartbeat(self, message: HeartbeatMessage):
         current_time = time.time()
         TIME_SINCE_LAST_HEARTBEAT_SUMMARY.observe(current_time - self._last_heartbeat_time)
-        self._last_heartbeat_time = current_time        
+        self._last_heartbeat_time = current_time
+        self._liveness_tracker.heartbeat(message.version)
 
     def _handle_log(self, message: LogMessage):
         logger.debug(f'LOG - {message.level}: {message.message}')
+        self._log_buffer.append(message.level, message.message)
 
     def _handle_metric(self, message: MetricMessage):
-        logger.debug(f'METRIC - {message.key}: {message.value}')
-        if self._is_number(message.value):
-            METRIC_GAUGE.labels(message.key).set(float(message.value))
-        
-    def _is_number(self, value: str) -> bool:
-        try:
-            float(value)
-            return True
-        except ValueError:
-            return False
\ No newline at end of file
+        self._metric_ingestor.ingest(message.key, message.value)
\ No newline at end of file
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import socket
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast groups: 1 = raw kernel events, 2 = events re-broadcast by udev (after device nodes / symlinks have been created)
+_UEVENT_GROUPS = 0b11
+
+
+class DeviceWatcher:
+    '''
+    Watches for tty devices being added to the system by listening to kernel / udev uevents on a netlink socket.
+
+    `wait()` returns as soon as a tty device has been added or the timeout expired, whichever happens first. If uevents
+    are not available (e.g. in containers or on non-Linux systems), `wait()` degrades to a plain timeout.
+    '''
+
+    def __init__(self):
+        self._socket: socket.socket = None
+        self._device_added = asyncio.Event()
+
+    def start(self) -> None:
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.setblocking(False)
+            sock.bind((0, _UEVENT_GROUPS))
+        except (AttributeError, OSError):
+            logger.info('Device events not available, falling back to periodic reconnect attempts', exc_info=logger.isEnabledFor(logging.DEBUG))
+            return
+
+        self._socket = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._on_readable)
+
+    def stop(self) -> None:
+        if self._socket is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+
+    @property
+    def is_event_driven(self) -> bool:
+        return self._socket is not None
+
+    async def wait(self, timeout_s: float) -> bool:
+        '''Waits for a tty device to be added (since the last call returned). Returns False if the timeout expired.'''
+        try:
+            await asyncio.wait_for(self._device_added.wait(), timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._device_added.clear()
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # Receive buffer overruns (ENOBUFS) are possible during event storms, we just carry on
+                logger.debug('Error reading device events', exc_info=True)
+                return
+
+            # Both kernel and udev messages contain NUL-separated KEY=VALUE properties
+            if b'ACTION=add\0' in data and b'SUBSYSTEM=tty\0' in data:
+                logger.debug('tty device added')
+                self._device_added.set()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..config import DispatchOverflowPolicy
+from .controller import HcuController
+from .messages import HcuMessage, MessageType
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH_GAUGE = Gauge('hcu_dispatch_queue_depth', 'Number of HCU messages waiting to be processed')
+DISPATCH_LATENCY_HISTOGRAM = Histogram('hcu_dispatch_latency', 'Time in seconds between receiving an HCU message and handing it to the controller',
+                                       buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
+DROPPED_MESSAGES_COUNTER = Counter('hcu_dispatch_dropped', 'Counts HCU messages dropped because the dispatch queue was full', ['type'])
+
+# Lower values are dropped first, message types not listed here (SHUTDOWN, RESUME) are never dropped
+DROP_PRIORITY = {
+    MessageType.LOG: 0,
+    MessageType.METRIC: 0,
+    MessageType.HEARTBEAT: 1,
+}
+_PRIORITIES = sorted(set(DROP_PRIORITY.values()))
+
+
+class HcuDispatcher:
+    '''
+    Hands HCU messages to the controller one at a time and in the order they were received.
+
+    The queue is bounded by `max_size`. If it is full, less important messages are dropped (see `DROP_PRIORITY`)
+    according to the overflow policy. SHUTDOWN and RESUME are never dropped and are always enqueued, even if that
+    means exceeding `max_size`.
+
+    Droppable messages are additionally kept in one deque per priority, so finding and dropping a victim is O(1).
+    Dropped messages are only marked in the main queue (message set to None) and skipped when they come up.
+    '''
+
+    def __init__(self, controller: HcuController, max_size: int = 1000, overflow_policy: DispatchOverflowPolicy = DispatchOverflowPolicy.DROP_OLDEST):
+        self._controller = controller
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        # Entries are [enqueue time, message], shared between the main queue and the per-priority queues
+        self._queue: Deque[List] = deque()
+        self._droppable: Dict[int, Deque[List]] = {priority: deque() for priority in _PRIORITIES}
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        QUEUE_DEPTH_GAUGE.set(0)
+
+    def submit(self, message: HcuMessage) -> None:
+        if self._size >= self._max_size and not self._make_room(message):
+            return
+
+        entry = [time.monotonic(), message]
+        self._queue.append(entry)
+        priority = DROP_PRIORITY.get(message.type)
+        if priority is not None:
+            self._droppable[priority].append(entry)
+        self._size += 1
+        QUEUE_DEPTH_GAUGE.set(self._size)
+        self._not_empty.set()
+
+    async def run(self) -> None:
+        while True:
+            while not self._size:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+            enqueue_time, message = self._pop()
+            QUEUE_DEPTH_GAUGE.set(self._size)
+            DISPATCH_LATENCY_HISTOGRAM.observe(time.monotonic() - enqueue_time)
+
+            try:
+                await self._controller.process_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning(f'Error processing {type(message).__name__}', exc_info=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._size
+
+    def _pop(self) -> List:
+        '''Removes and returns the oldest entry that has not been dropped (the queue must not be empty).'''
+        while True:
+            entry = self._queue.popleft()
+            message = entry[1]
+            if message is None:
+                continue
+            priority = DROP_PRIORITY.get(message.type)
+            if priority is not None:
+                # Per-priority queues are in the same order as the main queue
+                self._droppable[priority].popleft()
+            self._size -= 1
+            return entry
+
+    def _make_room(self, message: HcuMessage) -> bool:
+        '''Drops one message to make room for `message`. Returns False if `message` itself has been dropped.'''
+        victim_priority = next((priority for priority in _PRIORITIES if self._droppable[priority]), None)
+        incoming_priority = DROP_PRIORITY.get(message.type)
+
+        if incoming_priority is not None and (victim_priority is None or incoming_priority < victim_priority):
+            self._drop(message)
+            return False
+
+        if victim_priority is None:
+            # Queue consists of control messages only, we must not drop any of them
+            return True
+
+        if incoming_priority == victim_priority and self._overflow_policy == DispatchOverflowPolicy.DROP_NEWEST:
+            self._drop(message)
+            return False
+
+        candidates = self._droppable[victim_priority]
+        entry = candidates.pop() if self._overflow_policy == DispatchOverflowPolicy.DROP_NEWEST else candidates.popleft()
+        victim = entry[1]
+        entry[1] = None
+        self._size -= 1
+        self._drop(victim)
+        if len(self._queue) > 2 * max(self._size, self._max_size):
+            # Too many dropped entries piled up while the controller was busy, amortized over the drops
+            self._queue = deque(e for e in self._queue if e[1] is not None)
+        return True
+
+    def _drop(self, message: HcuMessage) -> None:
+        logger.debug(f'Dispatch queue full, dropping {type(message).__name__}')
+        DROPPED_MESSAGES_COUNTER.labels(str(message.type)).inc()
@@ -0,0 +1,197 @@
+import logging
+from typing import List
+
+from prometheus_client import Counter
+
+from .compact import (MAX_FRAME_LENGTH, TYPE_CODES, CompactFormatError,
+                      cobs_decode)
+
+logger = logging.getLogger(__name__)
+
+FRAMING_ERROR_COUNTER = Counter('hcu_framing_errors', 'Counts dropped frames and stripped garbage on the HCU serial link', ['reason'])
+
+_TEXT = 1
+_COMPACT = 2
+_COMPACT_TYPE_CODES = frozenset(TYPE_CODES.values())
+
+
+class LineFramer:
+    '''
+    Splits the raw serial byte stream into frames. Two framings are auto-detected per frame:
+    - JSON lines, terminated by a newline
+    - compact frames (see compact.py), starting with a 0x00 marker and terminated by 0x00. If the first decoded byte
+      is not a type code, or no terminator follows within the maximum compact frame length, the marker was line noise
+      and the data is reinterpreted as JSON lines. Consecutive markers start a single frame.
+
+    JSON frames are returned as they are, compact frames are returned COBS-decoded (their first byte is the type code,
+    which can never be "{").
+
+    Incoming data is appended to a single bytearray and only the newly received part is scanned for delimiters,
+    so a long unterminated line does not get rescanned on every chunk. Frames exceeding `max_line_length` are dropped
+    and everything up to the next delimiter is discarded (resync). Leading garbage before the start of a JSON object
+    (e.g. line noise after a reconnect) is stripped, frames without any JSON object are dropped.
+    '''
+
+    NEWLINE = ord('\n')
+    NUL = 0
+    FRAME_START = ord('{')
+
+    def __init__(self, max_line_length: int = 4096):
+        self._max_line_length = max_line_length
+        self._buffer = bytearray()
+        self._scan_pos = 0
+        self._frame_kind = None
+        self._discarding = False
+
+        self.received_bytes = 0
+        self.frame_count = 0
+        self.oversize_count = 0
+        self.garbage_count = 0
+
+    def feed(self, data: bytes) -> List[bytes]:
+        '''Appends `data` to the internal buffer and returns all frames completed by it (without delimiters).'''
+        buffer = self._buffer
+        buffer += data
+        self.received_bytes += len(data)
+
+        frames = []
+        frame_start = 0
+        scan_pos = self._scan_pos
+        buffer_len = len(buffer)
+        while True:
+            if self._frame_kind is None:
+                if frame_start >= buffer_len:
+                    break
+                if buffer[frame_start] == self.NUL:
+                    self._frame_kind = _COMPACT
+                    frame_start += 1
+                else:
+                    self._frame_kind = _TEXT
+                scan_pos = frame_start
+
+            if self._frame_kind == _COMPACT and scan_pos == frame_start and not self._discarding:
+                # Check the frame start right away, so that a stray marker does not hold back the following JSON lines
+                if frame_start < buffer_len and buffer[frame_start] == self.NUL:
+                    # Consecutive markers (noise right before a frame, empty resync frames) start a single frame
+                    frame_start = scan_pos = frame_start + 1
+                    continue
+                header_valid = self._compact_header_valid(buffer, frame_start, buffer_len)
+                if header_valid is None:
+                    break
+                if not header_valid:
+                    # The marker was line noise, the data is parsed as JSON line(s) instead
+                    self._drop_garbage()
+                    self._frame_kind = _TEXT
+
+            if self._frame_kind == _COMPACT:
+                frame_end = buffer.find(self.NUL, scan_pos, frame_start + MAX_FRAME_LENGTH + 1)
+                if frame_end == -1 and buffer_len - frame_start > MAX_FRAME_LENGTH and not self._discarding:
+                    # This cannot be a compact frame, the start marker was probably line noise. Retry as JSON line(s).
+                    self._drop_garbage()
+                    self._frame_kind = _TEXT
+                    scan_pos = frame_start
+                    continue
+                next_frame_start = frame_end + 1
+            else:
+                frame_end = buffer.find(self.NEWLINE, scan_pos)
+                # JSON never contains NUL, so it can only be the start marker of a compact frame
+                nul_pos = buffer.find(self.NUL, scan_pos, buffer_len if frame_end == -1 else frame_end)
+                if nul_pos != -1:
+                    frame_end = next_frame_start = nul_pos
+                else:
+                    next_frame_start = frame_end + 1
+
+            if frame_end == -1:
+                scan_pos = buffer_len
+                break
+
+            if self._discarding:
+                # We are resyncing after an oversize frame, the remainder of that frame is dropped
+                self._discarding = False
+            elif frame_end - frame_start > self._max_line_length:
+                self._drop_oversize()
+            else:
+                frame = self._extract_frame(buffer, frame_start, frame_end)
+                if frame is not None:
+                    frames.append(frame)
+
+            frame_start = next_frame_start
+            self._frame_kind = None
+
+        # Compact once per chunk instead of once per frame
+        if frame_start > 0:
+            del buffer[:frame_start]
+            scan_pos = max(0, scan_pos - frame_start)
+
+        if self._discarding or len(buffer) > self._max_line_length:
+            if not self._discarding:
+                self._drop_oversize()
+                self._discarding = True
+            buffer.clear()
+            scan_pos = 0
+
+        self._scan_pos = scan_pos
+        return frames
+
+    def reset(self) -> None:
+        self._buffer.clear()
+        self._scan_pos = 0
+        self._frame_kind = None
+        self._discarding = False
+
+    @property
+    def buffered_bytes(self) -> int:
+        return len(self._buffer)
+
+    def _extract_frame(self, buffer: bytearray, start: int, end: int) -> bytes | None:
+        if self._frame_kind == _COMPACT:
+            return self._extract_compact_frame(buffer, start, end)
+
+        object_start = buffer.find(self.FRAME_START, start, end)
+        if object_start == -1:
+            # Blank lines (e.g. from \r\n line endings) are not worth counting
+            if buffer[start:end].strip():
+                self._drop_garbage()
+            return None
+
+        if object_start > start and buffer[start:object_start].strip():
+            # There is garbage in front of the frame, we still try to use the remaining frame
+            self.garbage_count += 1
+            FRAMING_ERROR_COUNTER.labels('garbage_prefix').inc()
+
+        self.frame_count += 1
+        return bytes(buffer[object_start:end])
+
+    def _compact_header_valid(self, buffer: bytearray, start: int, end: int) -> bool | None:
+        '''Whether the compact frame at `start` decodes to a type code first (None if that is not received yet).'''
+        if end - start < 2:
+            return None
+        # The first byte is the COBS code, 1 would mean that the decoded frame starts with 0
+        return buffer[start] != 1 and buffer[start + 1] in _COMPACT_TYPE_CODES
+
+    def _extract_compact_frame(self, buffer: bytearray, start: int, end: int) -> bytes | None:
+        if start == end:
+            # Empty frames can be used by the HCU to resync the link
+            return None
+
+        try:
+            payload = cobs_decode(buffer[start:end])
+        except CompactFormatError:
+            self._drop_garbage()
+            return None
+
+        if not payload or payload[0] == self.FRAME_START:
+            self._drop_garbage()
+            return None
+
+        self.frame_count += 1
+        return payload
+
+    def _drop_oversize(self) -> None:
+        logger.warning(f'Dropping HCU frame exceeding maximum line length of {self._max_line_length} bytes')
+        self.oversize_count += 1
+        FRAMING_ERROR_COUNTER.labels('oversize').inc()
+
+    def _drop_garbage(self) -> None:
+        self.garbage_count += 1
+        FRAMING_ERROR_COUNTER.labels('garbage').inc()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+from typing import List, NamedTuple
+
+from prometheus_client import Counter, Gauge
+
+from ..command import run_command
+from ..config import PreShutdownHookConfig
+
+logger = logging.getLogger(__name__)
+
+
+class HookResult(str, Enum):
+    SUCCESS = 'success'
+    FAILED = 'failed'
+    TIMEOUT = 'timeout'
+    DEADLINE_EXCEEDED = 'deadline_exceeded'
+
+
+class HookOutcome(NamedTuple):
+    name: str
+    result: HookResult
+    duration_s: float
+    retcode: int | None = None
+
+
+HOOK_RESULT_COUNTER = Counter('hcu_pre_shutdown_hook_results', 'Counts pre-shutdown hook runs by result', ['hook', 'result'])
+HOOK_DURATION_GAUGE = Gauge('hcu_pre_shutdown_hook_duration_seconds', 'Duration of the last run of each pre-shutdown hook', ['hook'])
+
+
+async def run_pre_shutdown_hooks(hooks: List[PreShutdownHookConfig], deadline_s: float) -> List[HookOutcome]:
+    '''
+    Runs all `hooks` concurrently. Every hook is killed after its own `timeout_s`, all hooks still running after
+    `deadline_s` are killed as well, so that the shutdown command is executed in time. Never raises on hook failures.
+    '''
+    if len(hooks) == 0:
+        return []
+
+    logger.info(f'Running {len(hooks)} pre-shutdown hook(s)')
+    start = time.monotonic()
+    tasks = {asyncio.create_task(_run_hook(hook)): hook for hook in hooks}
+    done, pending = await asyncio.wait(tasks, timeout=deadline_s)
+
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+
+    outcomes = []
+    for task, hook in tasks.items():
+        if task in done:
+            outcome = task.result()
+        else:
+            outcome = HookOutcome(hook.name, HookResult.DEADLINE_EXCEEDED, time.monotonic() - start)
+            logger.error(f'Pre-shutdown hook {hook.name} killed, global deadline of {deadline_s}s exceeded')
+        HOOK_RESULT_COUNTER.labels(hook.name, outcome.result.value).inc()
+        HOOK_DURATION_GAUGE.labels(hook.name).set(outcome.duration_s)
+        outcomes.append(outcome)
+
+    logger.info(f'Pre-shutdown hooks finished after {round(time.monotonic() - start, 2)}s')
+    return outcomes
+
+
+async def _run_hook(hook: PreShutdownHookConfig) -> HookOutcome:
+    start = time.monotonic()
+    try:
+        retcode, stdout, stderr = await run_command(hook.command, timeout_s=hook.timeout_s)
+    except asyncio.TimeoutError:
+        logger.error(f'Pre-shutdown hook {hook.name} killed after timeout of {hook.timeout_s}s')
+        return HookOutcome(hook.name, HookResult.TIMEOUT, time.monotonic() - start)
+
+    duration_s = time.monotonic() - start
+    if retcode != 0:
+        logger.error(f'Pre-shutdown hook {hook.name} failed with exit code {retcode} after {round(duration_s, 2)}s')
+        logger.error(f'[stdout]\n{stdout}')
+        logger.error(f'[stderr]\n{stderr}')
+        return HookOutcome(hook.name, HookResult.FAILED, duration_s, retcode)
+
+    logger.info(f'Pre-shutdown hook {hook.name} succeeded after {round(duration_s, 2)}s')
+    return HookOutcome(hook.name, HookResult.SUCCESS, duration_s, retcode)
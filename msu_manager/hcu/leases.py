@@ -0,0 +1,67 @@
+import heapq
+import time
+from typing import Callable, Dict, List, Tuple
+
+
+class LeaseTable:
+    '''
+    Keeps named leases (client id -> expiry) and answers which lease expires last.
+
+    Leases are kept in a dict, plus a max-heap on expiry for the latest expiry. Renewing or releasing a lease does not
+    touch the heap entry of its previous expiry, outdated entries are skipped lazily once they reach the top (and the
+    heap is rebuilt if they accumulate), so renewals are O(log n).
+    '''
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._expiries: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def acquire(self, client_id: str, duration_s: float) -> float:
+        '''Creates or renews the lease of `client_id` and returns its expiry.'''
+        expiry = self._clock() + duration_s
+        self._expiries[client_id] = expiry
+        heapq.heappush(self._heap, (-expiry, client_id))
+        if len(self._heap) > 2 * len(self._expiries) + 16:
+            self._compact()
+        return expiry
+
+    def release(self, client_id: str) -> bool:
+        '''Removes the lease of `client_id`. Returns False if there was none.'''
+        return self._expiries.pop(client_id, None) is not None
+
+    @property
+    def expiries(self) -> Dict[str, float]:
+        '''All leases (including expired ones) as client id -> expiry.'''
+        return dict(self._expiries)
+
+    def restore(self, expiries: Dict[str, float]) -> None:
+        self._expiries = dict(expiries)
+        self._compact()
+
+    def clear(self) -> None:
+        self._expiries.clear()
+        self._heap.clear()
+
+    @property
+    def latest_expiry(self) -> float | None:
+        '''Expiry of the lease that expires last (may be in the past), None if there are no leases.'''
+        heap = self._heap
+        while heap:
+            neg_expiry, client_id = heap[0]
+            if self._expiries.get(client_id) == -neg_expiry:
+                return -neg_expiry
+            heapq.heappop(heap)
+        return None
+
+    def active(self) -> Dict[str, float]:
+        '''Returns all live leases as client id -> remaining time, expired leases are dropped.'''
+        now = self._clock()
+        expired = [client_id for client_id, expiry in self._expiries.items() if expiry <= now]
+        for client_id in expired:
+            del self._expiries[client_id]
+        return {client_id: expiry - now for client_id, expiry in self._expiries.items()}
+
+    def _compact(self) -> None:
+        self._heap = [(-expiry, client_id) for client_id, expiry in self._expiries.items()]
+        heapq.heapify(self._heap)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Callable
+
+from prometheus_client import Enum as EnumMetric
+from prometheus_client import Info
+
+logger = logging.getLogger(__name__)
+
+
+class LinkState(str, Enum):
+    UNKNOWN = 'unknown'
+    UP = 'up'
+    DEGRADED = 'degraded'
+    LOST = 'lost'
+
+
+LINK_STATE_ENUM = EnumMetric('hcu_link_state', 'Liveness of the HCU as derived from heartbeats', states=[s.value for s in LinkState])
+FIRMWARE_INFO = Info('hcu_firmware', 'Firmware version as reported by HCU heartbeats')
+
+
+class LivenessTracker:
+    '''
+    Derives the liveness of the HCU from its heartbeats.
+
+    The link is UP while heartbeats arrive, DEGRADED if there was none for `degraded_timeout_s` and LOST after
+    `lost_timeout_s`. On LOST `on_lost` is called once, e.g. to reopen the serial port. Until the first heartbeat the
+    state is UNKNOWN, so firmware that sends no heartbeats at all is never considered lost. Timeouts are tracked with a single timer on the loop clock. Heartbeats only record their time, the timer
+    re-arms itself lazily when it fires early, so there is no rescheduling per heartbeat.
+    '''
+
+    def __init__(self, degraded_timeout_s: float = 15, lost_timeout_s: float = 60, on_lost: Callable[[], None] = None):
+        self._degraded_timeout_s = degraded_timeout_s
+        self._lost_timeout_s = lost_timeout_s
+        self.on_lost = on_lost
+        self._state = LinkState.UNKNOWN
+        self._firmware_version = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._timer: asyncio.TimerHandle = None
+        self._last_heartbeat = None
+        LINK_STATE_ENUM.state(self._state.value)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self._last_heartbeat is not None:
+            self._arm(self._last_heartbeat + self._degraded_timeout_s)
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def heartbeat(self, version: str | None = None) -> None:
+        loop = self._loop or asyncio.get_running_loop()
+        self._last_heartbeat = loop.time()
+
+        if version is not None and version != self._firmware_version:
+            logger.info(f'HCU firmware version is {version}')
+            self._firmware_version = version
+            FIRMWARE_INFO.info({'version': version})
+
+        if self._state != LinkState.UP:
+            self._set_state(LinkState.UP)
+            if self._loop is not None:
+                self._arm(self._last_heartbeat + self._degraded_timeout_s)
+
+    @property
+    def state(self) -> LinkState:
+        return self._state
+
+    @property
+    def firmware_version(self) -> str | None:
+        return self._firmware_version
+
+    @property
+    def seconds_since_last_heartbeat(self) -> float | None:
+        if self._last_heartbeat is None:
+            return None
+        return (self._loop or asyncio.get_running_loop()).time() - self._last_heartbeat
+
+    def _arm(self, deadline: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self._loop.call_at(deadline, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        # Only armed after the first heartbeat
+        silence = self._loop.time() - self._last_heartbeat
+
+        if silence >= self._lost_timeout_s:
+            # Not re-armed, the next heartbeat brings the link back up
+            self._set_state(LinkState.LOST)
+            if self.on_lost is not None:
+                self.on_lost()
+        elif silence >= self._degraded_timeout_s:
+            self._set_state(LinkState.DEGRADED)
+            self._arm(self._last_heartbeat + self._lost_timeout_s)
+        else:
+            # Heartbeats arrived in the meantime
+            self._arm(self._last_heartbeat + self._degraded_timeout_s)
+
+    def _set_state(self, state: LinkState) -> None:
+        if state == self._state:
+            return
+        log = logger.info if state == LinkState.UP else logger.warning
+        log(f'HCU link state changed from {self._state.value} to {state.value}')
+        self._state = state
+        LINK_STATE_ENUM.state(state.value)
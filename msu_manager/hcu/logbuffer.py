@@ -0,0 +1,94 @@
+import itertools
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List, NamedTuple
+
+from pydantic import BaseModel
+
+from ..broadcast import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+
+class HcuLogRecord(BaseModel):
+    seq: int
+    timestamp: float
+    level: str
+    message: str
+
+
+class _SerializedRecord(NamedTuple):
+    seq: int
+    level_no: int
+    json: str
+
+
+def level_number(level: str) -> int:
+    '''Maps an HCU log level (e.g. "info", "WARN") to the corresponding Python logging level, unknown levels map to INFO.'''
+    level_no = logging.getLevelName(level.upper())
+    return level_no if isinstance(level_no, int) else logging.INFO
+
+
+class HcuLogBuffer:
+    '''
+    Keeps the most recent `capacity` HCU LOG records (at or above `min_level`) in memory and pushes new records to
+    streaming subscribers. Memory is bounded by the capacity and the per-subscriber queue size.
+    '''
+
+    def __init__(self, capacity: int = 1000, min_level: str = 'DEBUG', subscriber_queue_size: int = 100):
+        self._min_level_no = level_number(min_level)
+        self._records: Deque[_SerializedRecord] = deque(maxlen=capacity)
+        self._next_seq = 1
+        self._broadcaster: Broadcaster[_SerializedRecord] = Broadcaster(subscriber_queue_size)
+
+    def append(self, level: str, message: str) -> None:
+        level_no = level_number(level)
+        if level_no < self._min_level_no:
+            return
+
+        record = HcuLogRecord(seq=self._next_seq, timestamp=time.time(), level=level, message=message)
+        self._next_seq += 1
+        # Records are serialized exactly once, no matter how often they are queried or streamed
+        serialized = _SerializedRecord(record.seq, level_no, record.model_dump_json())
+        self._records.append(serialized)
+        self._broadcaster.publish(serialized)
+
+    def get(self, after_seq: int = 0, limit: int = 100, min_level: str = 'DEBUG') -> List[HcuLogRecord]:
+        '''Returns up to `limit` records with a sequence number greater than `after_seq`, oldest first.'''
+        return [HcuLogRecord.model_validate_json(r.json) for r in self._iter_after(after_seq, level_number(min_level), limit)]
+
+    async def stream(self, min_level: str = 'DEBUG', last_seq: int = None) -> AsyncIterator[str]:
+        '''
+        Yields server-sent events for new records. If `last_seq` is given (i.e. the client reconnected with a
+        Last-Event-ID), buffered records after it are sent first.
+        '''
+        min_level_no = level_number(min_level)
+        async with self._broadcaster.subscribe() as queue:
+            # Everything appended from here on is queued, so anything up to here is either backlog or not wanted
+            last_yielded = self._next_seq - 1
+            if last_seq is not None:
+                # Snapshot, the buffer may be appended to (and rotate) while the client consumes the backlog
+                for record in list(self._iter_after(last_seq, min_level_no)):
+                    yield self._to_event(record)
+            while True:
+                record = await queue.get()
+                # Records appended while the backlog was sent are both in the snapshot and queued
+                if record.seq > last_yielded and record.level_no >= min_level_no:
+                    last_yielded = record.seq
+                    yield self._to_event(record)
+
+    @property
+    def size(self) -> int:
+        return len(self._records)
+
+    def _iter_after(self, after_seq: int, min_level_no: int, limit: int = None):
+        if not self._records:
+            return iter(())
+        # Sequence numbers within the buffer are contiguous, so we can skip directly to the first relevant record
+        start = max(0, after_seq - self._records[0].seq + 1)
+        records = (r for r in itertools.islice(self._records, start, None) if r.level_no >= min_level_no)
+        return itertools.islice(records, limit)
+
+    def _to_event(self, record: _SerializedRecord) -> str:
+        return f'id: {record.seq}\ndata: {record.json}\n\n'
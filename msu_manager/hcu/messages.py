@@ -1,3 +1,4 @@
+import re
 from enum import StrEnum
 from typing import Annotated, Literal, Union
 
@@ -50,6 +51,18 @@ HcuMessage = Annotated[
 ]
 
 
+_MESSAGE_MODELS = {
+    MessageType.SHUTDOWN: ShutdownMessage,
+    MessageType.RESUME: ResumeMessage,
+    MessageType.HEARTBEAT: HeartbeatMessage,
+    MessageType.LOG: LogMessage,
+    MessageType.METRIC: MetricMessage,
+}
+
+# HCU messages are flat objects, so the first "type" key is the discriminator
+_TYPE_PATTERN = re.compile(rb'"type"\s*:\s*"([A-Z]{1,16})"')
+
+
 # Some helper functions for explicitly parsing messages
 _message_adapter = TypeAdapter(HcuMessage)
 
@@ -57,6 +70,19 @@ def validate_python_message(data: dict) -> HcuMessage:
     """Parse and validate a message dictionary into the appropriate command type."""
     return _message_adapter.validate_python(data)
 
-def validate_json_message(data: str) -> HcuMessage:
-    """Parse and validate a JSON string message into the appropriate command type."""
-    return _message_adapter.validate_json(data)
\ No newline at end of file
+def validate_json_message(data: str | bytes, message_type: MessageType = None) -> HcuMessage:
+    """Parse and validate a JSON string message into the appropriate command type.
+    If the message type is already known (see `peek_message_type()`), the matching model is validated directly."""
+    if message_type is not None:
+        return _MESSAGE_MODELS[message_type].model_validate_json(data)
+    return _message_adapter.validate_json(data)
+
+def peek_message_type(data: bytes) -> MessageType | None:
+    """Cheaply extract the message type from a raw JSON message without parsing it. Returns None if the type is missing or unknown."""
+    match = _TYPE_PATTERN.search(data)
+    if match is None:
+        return None
+    try:
+        return MessageType(match.group(1).decode('ascii'))
+    except ValueError:
+        return None
\ No newline at end of file
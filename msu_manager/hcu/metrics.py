@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+METRIC_GAUGE = Gauge('hcu_metric', 'Tracks numeric HCU METRIC event values', ['key'])
+REJECTED_METRICS_COUNTER = Counter('hcu_metric_rejected', 'Counts HCU METRIC events that have not been exported', ['reason'])
+
+
+class MetricIngestor:
+    '''
+    Exports HCU METRIC values as `hcu_metric` gauge.
+
+    Values for the same key arriving within `coalesce_window_s` are coalesced (last write wins) and written to the gauge
+    once at the end of the window. Keys must be on the allowlist (if configured) and at most `max_keys` distinct keys
+    are exported, everything else is counted as rejected to protect Prometheus from label explosions.
+    '''
+
+    def __init__(self, coalesce_window_s: float = 0.5, key_allowlist: Optional[List[str]] = None, max_keys: int = 100):
+        self._coalesce_window_s = coalesce_window_s
+        self._key_allowlist = frozenset(key_allowlist) if key_allowlist is not None else None
+        self._max_keys = max_keys
+        self._gauges: Dict[str, Gauge] = {}
+        self._pending: Dict[str, float] = {}
+        self._flush_handle: asyncio.TimerHandle = None
+
+    def ingest(self, key: str, value: str) -> None:
+        # Parsed first, so a non-numeric value does not use up one of the max_keys slots
+        try:
+            numeric_value = float(value)
+        except ValueError:
+            REJECTED_METRICS_COUNTER.labels('not_numeric').inc()
+            return
+
+        gauge = self._gauges.get(key)
+        if gauge is None:
+            gauge = self._register_key(key)
+            if gauge is None:
+                return
+
+        if self._coalesce_window_s <= 0:
+            gauge.set(numeric_value)
+            return
+
+        self._pending[key] = numeric_value
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self._coalesce_window_s, self.flush)
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        for key, value in self._pending.items():
+            self._gauges[key].set(value)
+        self._pending.clear()
+
+    @property
+    def key_count(self) -> int:
+        return len(self._gauges)
+
+    def _register_key(self, key: str) -> Gauge | None:
+        if self._key_allowlist is not None and key not in self._key_allowlist:
+            REJECTED_METRICS_COUNTER.labels('not_allowed').inc()
+            return None
+
+        if len(self._gauges) >= self._max_keys:
+            REJECTED_METRICS_COUNTER.labels('max_keys_exceeded').inc()
+            return None
+
+        logger.info(f'Exporting new HCU metric "{key}"')
+        gauge = METRIC_GAUGE.labels(key)
+        self._gauges[key] = gauge
+        return gauge
@@ -1,33 +1,90 @@
 import asyncio
 import logging
+import time
 
 import serial_asyncio
+from prometheus_client import Counter, Gauge
 from serial.serialutil import SerialException
 
 from ..config import HcuControllerConfig
-from .controller import HcuController
+from .device import DeviceWatcher
+from .dispatcher import HcuDispatcher
 from .protocol import HcuProtocol
 
 logger = logging.getLogger(__name__)
 
+SERIAL_CONNECTED_GAUGE = Gauge('hcu_serial_connected', 'Whether the serial connection to the HCU is open (1) or not (0)')
+SERIAL_DOWNTIME_COUNTER = Counter('hcu_serial_downtime_seconds', 'Accumulated time in seconds the serial connection to the HCU was down before being reestablished')
+SERIAL_RECONNECT_COUNTER = Counter('hcu_serial_reconnects', 'Counts successful (re)connections of the HCU serial port')
+
+# The reconnect backoff is only reset once a connection stayed open this long, so that a port which can be opened but
+# drops right away (e.g. a flaky USB link) is not reopened in a tight loop
+STABLE_CONNECTION_S = 10
+
 
 class HcuMonitor:
-    def __init__(self, config: HcuControllerConfig, controller: HcuController):
+    def __init__(self, config: HcuControllerConfig, dispatcher: HcuDispatcher):
         self._config = config
-        self._hcu_controller = controller
+        self._hcu_dispatcher = dispatcher
         self._hcu_protocol = None
+        self._device_watcher = DeviceWatcher()
+        SERIAL_CONNECTED_GAUGE.set(0)
 
     async def run(self) -> None:
-        while True:
-            try:
-                if self._hcu_protocol is None or not self._hcu_protocol.is_connected:
-                    await self._init_serial()
-            except SerialException as e:
-                logger.warning(f'Serial connection error: {e}')
-            except Exception:
-                logger.warning(f'Unexpected exception in HCU skill main loop', exc_info=True)
-            finally:
-                await asyncio.sleep(2)
+        '''
+        Keeps the serial connection open. There is no polling while connected, the loop wakes up when the connection is lost.
+        While disconnected, reconnects are triggered by tty devices appearing, with exponential backoff as fallback.
+        '''
+        self._device_watcher.start()
+        backoff_s = self._config.serial_reconnect_min_s
+        down_since = time.monotonic()
+        try:
+            while True:
+                if not await self._try_init_serial():
+                    await self._wait_for_device(backoff_s)
+                    backoff_s = min(backoff_s * 2, self._config.serial_reconnect_max_s)
+                    continue
+
+                SERIAL_CONNECTED_GAUGE.set(1)
+                SERIAL_RECONNECT_COUNTER.inc()
+                connected_since = time.monotonic()
+                SERIAL_DOWNTIME_COUNTER.inc(connected_since - down_since)
+
+                await self._hcu_protocol.wait_closed()
+
+                logger.warning(f'Serial connection to HCU lost ({self._config.serial_device})')
+                SERIAL_CONNECTED_GAUGE.set(0)
+                down_since = time.monotonic()
+                if down_since - connected_since >= STABLE_CONNECTION_S:
+                    backoff_s = self._config.serial_reconnect_min_s
+                await self._wait_for_device(backoff_s)
+                backoff_s = min(backoff_s * 2, self._config.serial_reconnect_max_s)
+        finally:
+            self._device_watcher.stop()
+
+    def reopen(self) -> None:
+        '''Closes the serial port, it is reopened by run() after the reconnect backoff.'''
+        if self._hcu_protocol is not None:
+            logger.warning(f'Reopening serial port ({self._config.serial_device})')
+            self._hcu_protocol.close()
+
+    async def _try_init_serial(self) -> bool:
+        try:
+            await self._init_serial()
+            return True
+        except SerialException as e:
+            logger.warning(f'Serial connection error: {e}')
+        except Exception:
+            logger.warning(f'Unexpected exception in HCU skill main loop', exc_info=True)
+        return False
+
+    async def _wait_for_device(self, timeout_s: float) -> None:
+        if await self._device_watcher.wait(timeout_s):
+            logger.info('Serial device added, trying to reconnect')
+
+    @property
+    def is_connected(self) -> bool:
+        return self._hcu_protocol is not None and self._hcu_protocol.is_connected
 
     async def _init_serial(self) -> None:
         if self._hcu_protocol is not None:
@@ -37,7 +94,7 @@ class HcuMonitor:
         loop = asyncio.get_running_loop()
         _, protocol = await serial_asyncio.create_serial_connection(
             loop,
-            lambda: HcuProtocol(controller=self._hcu_controller),
+            lambda: HcuProtocol(dispatcher=self._hcu_dispatcher, max_line_length=self._config.serial_max_line_length),
             str(self._config.serial_device.absolute()),
             baudrate=self._config.serial_baud_rate,
         )
@@ -46,4 +103,5 @@ class HcuMonitor:
         logger.info(f'Initialized serial port ({self._config.serial_device})')
 
     async def close(self):
-        self._hcu_protocol.close()
\ No newline at end of file
+        if self._hcu_protocol is not None:
+            self._hcu_protocol.close()
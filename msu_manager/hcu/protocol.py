@@ -1,48 +1,79 @@
 import asyncio
-import json
 import logging
-from json import JSONDecodeError
 
-from .controller import HcuController
-from .messages import validate_python_message
+from prometheus_client import Counter
+
+from .compact import CompactFormatError, decode_compact_message
+from .dispatcher import HcuDispatcher
+from .framing import LineFramer
+from .messages import HcuMessage, peek_message_type, validate_json_message
 
 logger = logging.getLogger(__name__)
 
+REJECTED_MESSAGES_COUNTER = Counter('hcu_rejected_messages', 'Counts HCU messages that could not be validated', ['reason'])
+
 
 class HcuProtocol(asyncio.Protocol):
-    def __init__(self, controller: HcuController = None):
-        self._controller = controller
+    def __init__(self, dispatcher: HcuDispatcher = None, max_line_length: int = 4096):
+        self._dispatcher = dispatcher
         self._transport = None
-        self._buffer = ''
+        self._framer = LineFramer(max_line_length)
         self._is_connected = False
+        self._closed = asyncio.Event()
         
     def connection_made(self, transport: asyncio.Transport) -> None:
         self._transport = transport
         self._is_connected = True
 
     def data_received(self, data: bytes) -> None:
-        logger.debug(f'Received {len(data)} bytes from HCU: {data.hex()}')
-
-        self._buffer += data.decode(encoding='ascii', errors='ignore')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Received {len(data)} bytes from HCU: {data.hex()}')
 
-        while '\n' in self._buffer:
-            logger.debug(f'Received raw message from HCU')
-            raw_message, self._buffer = self._buffer.split('\n', maxsplit=1)
+        for raw_message in self._framer.feed(data):
             self._process_message(raw_message)
 
-    def _process_message(self, message: str) -> None:
+    def _process_message(self, message: bytes) -> None:
+        if message[0] != LineFramer.FRAME_START:
+            self._process_compact_message(message)
+            return
+
+        message_type = peek_message_type(message)
+        if message_type is None:
+            logger.error(f'Received HCU message with missing or unknown type: {message.strip()}')
+            REJECTED_MESSAGES_COUNTER.labels('unknown_type').inc()
+            return
+
+        try:
+            message_obj = validate_json_message(message, message_type)
+        except ValueError:
+            logger.error(f'Failed to validate {message_type} message from HCU: {message.strip()}')
+            logger.debug(f'Validation error', exc_info=True)
+            REJECTED_MESSAGES_COUNTER.labels('invalid').inc()
+            return
+
+        self._submit(message_obj)
+
+    def _process_compact_message(self, payload: bytes) -> None:
         try:
-            json_dict = json.loads(message.strip())
-        except (UnicodeDecodeError, JSONDecodeError):
-            logger.error(f'Failed to parse JSON message from HCU: {message.strip()}')
+            message_obj = decode_compact_message(payload)
+        except CompactFormatError:
+            logger.error(f'Failed to decode compact message from HCU: {payload.hex()}')
             logger.debug(f'Decode error', exc_info=True)
+            REJECTED_MESSAGES_COUNTER.labels('invalid').inc()
             return
-        
-        message_obj = validate_python_message(json_dict)
-        logger.debug(f'Received {type(message_obj).__name__} from HCU: {message_obj.model_dump_json(indent=2)}')
 
-        if self._controller:
-            asyncio.create_task(self._controller.process_message(message_obj))
+        self._submit(message_obj)
+
+    def _submit(self, message_obj: HcuMessage) -> None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Received {type(message_obj).__name__} from HCU: {message_obj.model_dump_json(indent=2)}')
+
+        if self._dispatcher:
+            self._dispatcher.submit(message_obj)
+
+    @property
+    def framer(self) -> LineFramer:
+        return self._framer
 
     @property
     def is_connected(self) -> bool:
@@ -51,6 +82,11 @@ class HcuProtocol(asyncio.Protocol):
     def connection_lost(self, exc):
         logger.debug('HcuProtocol serial listener stopped', exc_info=exc)
         self._is_connected = False
-    
+        self._closed.set()
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
     def close(self) -> None:
-        self._transport.close()
+        if self._transport is not None:
+            self._transport.close()
@@ -0,0 +1,221 @@
+'''
+Record the raw HCU serial stream and replay it into HcuProtocol / HcuController.
+
+Usage:
+    python -m msu_manager.hcu.replay record --device /dev/ttyUSB0 --baud-rate 115200 --output hcu.rec
+    python -m msu_manager.hcu.replay replay --input hcu.rec --speed 10
+
+Replay serves the recorded byte stream on a local TCP port and connects HcuProtocol to it through pyserial's
+socket:// URL handler, i.e. the same serial stand-in the tests use.
+'''
+import argparse
+import asyncio
+import logging
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, NamedTuple, Tuple
+
+import serial_asyncio
+
+from .controller import HcuController
+from .dispatcher import HcuDispatcher
+from .protocol import HcuProtocol
+
+logger = logging.getLogger(__name__)
+
+FILE_MAGIC = b'HCUREC1\n'
+
+# Each chunk is prefixed with the time since the previous chunk (in microseconds) and its length
+_CHUNK_HEADER = struct.Struct('<II')
+_MAX_DELTA_US = 0xFFFFFFFF
+DEFAULT_DRAIN_TIMEOUT_S = 10
+
+
+class RecordingError(Exception):
+    pass
+
+
+class ReplayStats(NamedTuple):
+    chunks: int
+    bytes: int
+    duration_s: float
+    frames: int
+    oversize_frames: int
+    garbage_frames: int
+
+
+class RecordingWriter:
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self._previous_ts = None
+        self._file.write(FILE_MAGIC)
+
+    def write(self, timestamp: float, data: bytes) -> None:
+        '''Append a chunk received at `timestamp` (monotonic clock, in seconds).'''
+        if self._previous_ts is None:
+            self._previous_ts = timestamp
+        # Gaps longer than ~71 minutes are clamped, which is irrelevant for replay purposes
+        delta_us = min(max(0, round((timestamp - self._previous_ts) * 1_000_000)), _MAX_DELTA_US)
+        self._previous_ts = timestamp
+        self._file.write(_CHUNK_HEADER.pack(delta_us, len(data)))
+        self._file.write(data)
+
+
+def read_recording(file: BinaryIO) -> Iterator[Tuple[float, bytes]]:
+    '''Yields (offset from first chunk in seconds, data) for every chunk in the recording.'''
+    if file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise RecordingError('Not an HCU recording (invalid file header)')
+
+    offset_us = 0
+    while header := file.read(_CHUNK_HEADER.size):
+        if len(header) < _CHUNK_HEADER.size:
+            raise RecordingError('Recording is truncated')
+        delta_us, length = _CHUNK_HEADER.unpack(header)
+        data = file.read(length)
+        if len(data) < length:
+            raise RecordingError('Recording is truncated')
+        offset_us += delta_us
+        yield offset_us / 1_000_000, data
+
+
+class _RecordingProtocol(asyncio.Protocol):
+    def __init__(self, writer: RecordingWriter):
+        self._writer = writer
+        self.closed = asyncio.get_running_loop().create_future()
+        self.chunks = 0
+        self.bytes = 0
+
+    def data_received(self, data: bytes) -> None:
+        self._writer.write(time.monotonic(), data)
+        self.chunks += 1
+        self.bytes += len(data)
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+
+async def record(device: str, baud_rate: int, output: Path, duration_s: float = None) -> None:
+    '''Records the raw serial stream from `device` into `output` until the device disappears, `duration_s` has passed or the task is cancelled.'''
+    with open(output, 'wb') as file:
+        writer = RecordingWriter(file)
+        transport, protocol = await serial_asyncio.create_serial_connection(
+            asyncio.get_running_loop(),
+            lambda: _RecordingProtocol(writer),
+            device,
+            baudrate=baud_rate,
+        )
+        logger.info(f'Recording {device} to {output}')
+        try:
+            await asyncio.wait_for(asyncio.shield(protocol.closed), timeout=duration_s)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            transport.close()
+            logger.info(f'Recorded {protocol.chunks} chunks ({protocol.bytes} bytes)')
+
+
+async def replay(input: Path, dispatcher: HcuDispatcher, speed: float = 1.0, drain_timeout_s: float = DEFAULT_DRAIN_TIMEOUT_S) -> ReplayStats:
+    '''
+    Replays a recording into a HcuProtocol feeding `dispatcher`.
+    `speed` is the replay speed relative to the recording (e.g. 10 for 10x), 0 replays as fast as possible.
+    After the last chunk, waits at most `drain_timeout_s` for the protocol and dispatcher to process everything.
+    '''
+    loop = asyncio.get_running_loop()
+    connected = loop.create_future()
+
+    def connect_cb(_, writer):
+        connected.set_result(writer)
+
+    server = await asyncio.start_server(connect_cb, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    transport, protocol = await serial_asyncio.create_serial_connection(
+        loop,
+        lambda: HcuProtocol(dispatcher=dispatcher),
+        f'socket://127.0.0.1:{port}',
+    )
+    writer = await connected
+
+    chunks = 0
+    total_bytes = 0
+    start_time = loop.time()
+    try:
+        with open(input, 'rb') as file:
+            for offset_s, data in read_recording(file):
+                if speed > 0:
+                    delay = start_time + offset_s / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+                chunks += 1
+                total_bytes += len(data)
+
+        # Wait until everything has made it through the serial stand-in and the dispatch queue
+        deadline = loop.time() + drain_timeout_s
+        while protocol.framer.received_bytes < total_bytes or dispatcher.queue_depth > 0:
+            if not protocol.is_connected:
+                logger.warning(f'Serial stand-in closed after {protocol.framer.received_bytes} of {total_bytes} bytes')
+                break
+            if loop.time() > deadline:
+                logger.warning(f'Replay not drained after {drain_timeout_s}s ({protocol.framer.received_bytes} of {total_bytes} bytes received, {dispatcher.queue_depth} messages queued)')
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        duration_s = loop.time() - start_time
+        writer.close()
+        transport.close()
+        server.close()
+        await server.wait_closed()
+
+    framer = protocol.framer
+    return ReplayStats(chunks, total_bytes, duration_s, framer.frame_count, framer.oversize_count, framer.garbage_count)
+
+
+async def _replay_main(args) -> None:
+    controller = HcuController(args.shutdown_command, args.shutdown_delay_s)
+    dispatcher = HcuDispatcher(controller)
+    dispatch_task = asyncio.create_task(dispatcher.run())
+    try:
+        stats = await replay(args.input, dispatcher, args.speed, args.drain_timeout_s)
+    finally:
+        dispatch_task.cancel()
+
+    logger.info(f'Replayed {stats.chunks} chunks ({stats.bytes} bytes) in {round(stats.duration_s, 3)}s')
+    logger.info(f'Frames: {stats.frames}, oversize: {stats.oversize_frames}, garbage: {stats.garbage_frames}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay HCU serial traffic')
+    parser.add_argument('--log-level', default='INFO')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='Record the raw serial stream of the HCU')
+    record_parser.add_argument('--device', required=True, help='Serial device (or any pyserial URL)')
+    record_parser.add_argument('--baud-rate', type=int, default=115200)
+    record_parser.add_argument('--output', type=Path, required=True)
+    record_parser.add_argument('--duration-s', type=float, default=None, help='Stop recording after this time (default: until interrupted)')
+
+    replay_parser = subparsers.add_parser('replay', help='Replay a recording into HcuProtocol / HcuController')
+    replay_parser.add_argument('--input', type=Path, required=True)
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='Replay speed relative to the recording (0 = as fast as possible)')
+    replay_parser.add_argument('--shutdown-command', nargs='+', default=['true'], help='Command executed on SHUTDOWN (default: true)')
+    replay_parser.add_argument('--shutdown-delay-s', type=int, default=180)
+    replay_parser.add_argument('--drain-timeout-s', type=float, default=DEFAULT_DRAIN_TIMEOUT_S, help='Maximum time to wait for the replayed stream to be processed')
+
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    try:
+        if args.command == 'record':
+            asyncio.run(record(args.device, args.baud_rate, args.output, args.duration_s))
+        else:
+            asyncio.run(_replay_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,51 +1,100 @@
 import time
+from enum import Enum
+from typing import Callable, Dict
+
+from .leases import LeaseTable
+
+# Client id of inhibitions without a lease (i.e. through PUT /shutdown/inhibit), the last caller overwrites it
+DEFAULT_INHIBIT_CLIENT = 'default'
 
 
 class ShutdownError(Exception):
     pass
 
 
+class ShutdownPhase(str, Enum):
+    IDLE = 'idle'
+    SCHEDULED = 'scheduled'
+    EXECUTING = 'executing'
+
+
 class ShutdownModel:
+    '''
+    Keeps track of the shutdown deadline. All timestamps are taken from `clock`, which defaults to the monotonic clock,
+    so wall clock steps (e.g. NTP / GPS time sync during boot) neither fire nor postpone a shutdown.
+
+    Shutdown can be inhibited by multiple clients independently, each holding a lease. The latest live lease wins.
+    '''
 
-    def __init__(self, delay_s: int):
+    def __init__(self, delay_s: int, clock: Callable[[], float] = time.monotonic):
         self._delay = delay_s
+        self._clock = clock
         self._timer_expiry_ts = None
-        self._inhibition_end_ts = None
+        self._inhibit_leases = LeaseTable(clock)
 
     @property
     def static_delay(self) -> int:
         return self._delay
 
     @property
-    def time_remaining(self) -> float:
+    def deadline(self) -> float:
+        '''Point in time (on the model's clock) at which the shutdown is due.'''
         if not self.is_active:
             raise ShutdownError('Shutdown is not active, has start() been called?')
-        
+
         # Only consider inhibition if it extends beyond the current shutdown time
-        if self.is_inhibited and self._inhibition_end_ts > self._timer_expiry_ts:
-            return max(0, self._inhibition_end_ts - time.time())
-        
-        return max(0, self._timer_expiry_ts - time.time())
+        inhibition_end_ts = self._inhibit_leases.latest_expiry
+        if inhibition_end_ts is not None and inhibition_end_ts > self._timer_expiry_ts:
+            return inhibition_end_ts
+
+        return self._timer_expiry_ts
+
+    @property
+    def timer_expiry(self) -> float | None:
+        '''Point in time at which the (uninhibited) shutdown timer expires, None if not active.'''
+        return self._timer_expiry_ts
+
+    @property
+    def time_remaining(self) -> float:
+        return max(0, self.deadline - self._clock())
 
     @property
     def is_active(self) -> bool:
         return self._timer_expiry_ts is not None
-    
+
     @property
     def is_inhibited(self) -> bool:
-        return self._inhibition_end_ts is not None and self._inhibition_end_ts > time.time()
+        inhibition_end_ts = self._inhibit_leases.latest_expiry
+        return inhibition_end_ts is not None and inhibition_end_ts > self._clock()
+
+    @property
+    def inhibit_leases(self) -> Dict[str, float]:
+        '''Live inhibit leases as client id -> remaining time.'''
+        return self._inhibit_leases.active()
 
     def start(self):
         if not self.is_active:
-            self._timer_expiry_ts = time.time() + self._delay
+            self._timer_expiry_ts = self._clock() + self._delay
 
     def stop(self):
         self._timer_expiry_ts = None
 
-    def inhibit(self, inhibit_time_s: int):
-        self._inhibition_end_ts = time.time() + inhibit_time_s
+    def inhibit(self, inhibit_time_s: int, client_id: str = DEFAULT_INHIBIT_CLIENT):
+        '''Creates or renews the inhibit lease of `client_id`.'''
+        self._inhibit_leases.acquire(client_id, inhibit_time_s)
+
+    def release_inhibit(self, client_id: str) -> bool:
+        return self._inhibit_leases.release(client_id)
+
+    def restore(self, timer_expiry_ts: float | None, inhibit_leases: Dict[str, float]):
+        '''Restores the state previously read from `timer_expiry` and `inhibit_lease_expiries`.'''
+        self._timer_expiry_ts = timer_expiry_ts
+        self._inhibit_leases.restore(inhibit_leases)
+
+    @property
+    def inhibit_lease_expiries(self) -> Dict[str, float]:
+        return self._inhibit_leases.expiries
 
     def reset(self):
         self._timer_expiry_ts = None
-        self._inhibition_end_ts = None
-    
\ No newline at end of file
+        self._inhibit_leases.clear()
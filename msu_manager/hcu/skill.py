@@ -1,12 +1,19 @@
 import asyncio
 import logging
+from typing import Callable, List, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
-from ..config import HcuControllerConfig
+from ..config import HcuControllerConfig, LogLevel
 from .controller import HcuController
+from .dispatcher import HcuDispatcher
+from .liveness import LivenessTracker
+from .logbuffer import HcuLogBuffer, HcuLogRecord
 from .messages import HcuMessage
+from .metrics import MetricIngestor
 from .monitor import HcuMonitor
+from .state import StateStore
 
 logger = logging.getLogger(__name__)
 
@@ -15,26 +22,54 @@ class HcuSkill:
     def __init__(self, config: HcuControllerConfig):
         self._config = config
         self._hcu_controller = None
+        self._liveness_tracker = None
+        self._log_buffer = None
+        self._hcu_dispatcher = None
         self._hcu_monitor = None
+        self._dispatch_task = None
         self._monitor_task = None
 
     async def run(self) -> None:
-        self._hcu_controller = HcuController(self._config.shutdown_command, self._config.shutdown_delay_s)
-        self._hcu_monitor = HcuMonitor(self._config, self._hcu_controller)
+        metric_ingestor = MetricIngestor(self._config.metric_coalesce_window_s, self._config.metric_key_allowlist, self._config.metric_max_keys)
+        self._liveness_tracker = LivenessTracker(self._config.heartbeat_degraded_timeout_s, self._config.heartbeat_lost_timeout_s)
+        self._log_buffer = HcuLogBuffer(self._config.log_buffer_size, self._config.log_buffer_min_level.value)
+        self._hcu_controller = HcuController(self._config.shutdown_command, self._config.shutdown_delay_s, metric_ingestor, self._liveness_tracker, self._log_buffer,
+                                             self._config.pre_shutdown_hooks, self._config.pre_shutdown_timeout_s,
+                                             StateStore(self._config.state_file) if self._config.state_file is not None else None)
+        # Pending shutdowns must be resumed before the first message from the HCU is processed
+        self._hcu_controller.restore_state()
+        self._hcu_dispatcher = HcuDispatcher(self._hcu_controller, self._config.dispatch_queue_size, self._config.dispatch_overflow_policy)
+        self._hcu_monitor = HcuMonitor(self._config, self._hcu_dispatcher)
+        if self._config.heartbeat_lost_reopen_serial:
+            self._liveness_tracker.on_lost = self._hcu_monitor.reopen
+        self._liveness_tracker.start()
+        self._dispatch_task = asyncio.create_task(self._hcu_dispatcher.run())
         self._monitor_task = asyncio.create_task(self._hcu_monitor.run())
 
         logger.info(f'Started HCU skill')
 
     async def close(self):
-        self._monitor_task.cancel()
-        try:
-            await self._monitor_task
-        except asyncio.CancelledError:
-            # Task cancellation is expected during shutdown; suppress the exception.
-            pass
+        self._liveness_tracker.stop()
+        for task in (self._monitor_task, self._dispatch_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Task cancellation is expected during shutdown; suppress the exception.
+                pass
 
         logger.info('Stopped HCU skill')
 
+    def add_ignition_listener(self, listener: Callable[[str], None]) -> None:
+        self._hcu_controller.add_ignition_listener(listener)
+
+    def _validate_inhibit_time(self, seconds: int) -> None:
+        if seconds < 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Inhibition time cannot be negative')
+
+        if seconds > self._config.shutdown_inhibit_max_s:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'Inhibition time exceeds maximum of {self._config.shutdown_inhibit_max_s}s')
+
     def add_routes(self, router: APIRouter) -> None:
 
         @router.post('/message', status_code=status.HTTP_204_NO_CONTENT, responses={404: {'description': 'HcuController is disabled'}})
@@ -50,18 +85,56 @@ class HcuSkill:
             400: {'description': 'The inhibition time is invalid (either negative or exceeded the maximum value)'}
         })
         async def shutdown_inhibit_endpoint(seconds: int):
-            if seconds < 0:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Inhibition time cannot be negative')
-            
-            if seconds > self._config.shutdown_inhibit_max_s:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'Inhibition time exceeds maximum of {self._config.shutdown_inhibit_max_s}s')
+            self._validate_inhibit_time(seconds)
             
             logger.info(f'Inhibiting shutdown for {seconds}s per user request')
-            await self._hcu_controller.inhibit_shutdown(seconds)
+            self._hcu_controller.inhibit_shutdown(seconds)
+
+        @router.put('/shutdown/leases/{client_id}/{seconds}', status_code=status.HTTP_204_NO_CONTENT, responses={
+            400: {'description': 'The inhibition time is invalid (either negative or exceeded the maximum value)'}
+        })
+        async def shutdown_lease_endpoint(client_id: str, seconds: int):
+            '''Creates or renews the inhibit lease of `client_id`.'''
+            self._validate_inhibit_time(seconds)
+
+            logger.debug(f'Inhibiting shutdown for {seconds}s per lease of {client_id}')
+            self._hcu_controller.inhibit_shutdown(seconds, client_id)
+
+        @router.delete('/shutdown/leases/{client_id}', status_code=status.HTTP_204_NO_CONTENT, responses={
+            404: {'description': 'There is no lease for this client'}
+        })
+        async def shutdown_lease_release_endpoint(client_id: str):
+            if not self._hcu_controller.release_shutdown_inhibit(client_id):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'No lease for client {client_id}')
+            logger.info(f'Released shutdown inhibit lease of {client_id}')
+
+        @router.get('/shutdown/leases')
+        async def shutdown_leases_endpoint():
+            return [
+                {'client_id': client_id, 'remaining_s': remaining_s}
+                for client_id, remaining_s in self._hcu_controller.shutdown_inhibit_leases.items()
+            ]
+
+        @router.get('/link/status')
+        async def link_status_endpoint():
+            return {
+                'state': self._liveness_tracker.state.value.upper(),
+                'firmware_version': self._liveness_tracker.firmware_version,
+                'seconds_since_last_heartbeat': self._liveness_tracker.seconds_since_last_heartbeat,
+            }
+
+        @router.get('/logs')
+        async def logs_endpoint(after: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), min_level: LogLevel = LogLevel.DEBUG) -> List[HcuLogRecord]:
+            return self._log_buffer.get(after, limit, min_level.value)
+
+        @router.get('/logs/stream')
+        async def logs_stream_endpoint(min_level: LogLevel = LogLevel.DEBUG, last_event_id: Optional[int] = Header(None)):
+            return StreamingResponse(self._log_buffer.stream(min_level.value, last_event_id), media_type='text/event-stream')
 
         @router.get('/shutdown/status')
         async def shutdown_status_endpoint():
             return {
                 'shutdown_in_progress': self._hcu_controller.is_shutdown_scheduled,
+                'phase': self._hcu_controller.shutdown_phase.value.upper(),
                 'remaining_runtime_s': self._hcu_controller.remaining_shutdown_time,
             }
\ No newline at end of file
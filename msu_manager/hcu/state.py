@@ -0,0 +1,73 @@
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from .shutdown import ShutdownPhase
+
+logger = logging.getLogger(__name__)
+
+BOOT_ID_PATH = Path('/proc/sys/kernel/random/boot_id')
+
+
+class PersistedHcuState(BaseModel):
+    '''
+    Controller state that survives a restart of the service. Timestamps are taken from the monotonic clock, which
+    keeps counting across process restarts, but not across reboots (hence the boot id).
+    '''
+    boot_id: Optional[str] = None
+    ignition_state: str = 'unknown'
+    shutdown_phase: ShutdownPhase = ShutdownPhase.IDLE
+    shutdown_timer_expiry: Optional[float] = None
+    inhibit_leases: Dict[str, float] = {}
+
+
+def read_boot_id() -> str | None:
+    try:
+        return BOOT_ID_PATH.read_text().strip()
+    except OSError:
+        return None
+
+
+class StateStore:
+    '''
+    Persists PersistedHcuState to a small JSON file. The file is written to a temporary file first and then renamed,
+    so it is never observed half-written. There is no fsync: the page cache survives a crash of the service and after
+    a power loss the state is discarded anyway (different boot id).
+    '''
+
+    def __init__(self, path: Path):
+        self._path = Path(path)
+        self._tmp_path = self._path.with_name(f'.{self._path.name}.tmp')
+        self._boot_id = read_boot_id()
+        self._last_written = None
+
+    def load(self) -> PersistedHcuState | None:
+        try:
+            state = PersistedHcuState.model_validate_json(self._path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValidationError) as e:
+            logger.warning(f'Ignoring unreadable HCU state file {self._path}: {e}')
+            return None
+
+        if state.boot_id != self._boot_id:
+            logger.info(f'Ignoring HCU state file {self._path} from previous boot')
+            return None
+
+        return state
+
+    def save(self, state: PersistedHcuState) -> None:
+        state.boot_id = self._boot_id
+        data = state.model_dump_json()
+        if data == self._last_written:
+            return
+
+        try:
+            self._tmp_path.write_text(data)
+            os.replace(self._tmp_path, self._path)
+            self._last_written = data
+        except OSError as e:
+            logger.error(f'Could not write HCU state file {self._path}: {e}')
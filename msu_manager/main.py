@@ -47,6 +47,9 @@ async def before_startup(app: FastAPI):
         app.state.gps_skill = gps
         app.include_router(gps_router)
 
+        if CONFIG.hcu_controller.enabled:
+            app.state.hcu_skill.add_ignition_listener(gps.handle_ignition)
+
 async def after_shutdown(app: FastAPI):
     if app.state.CONFIG.hcu_controller.enabled:
         await app.state.hcu_skill.close()
@@ -0,0 +1,101 @@
+import math
+
+import pytest
+
+from msu_manager.gps.compression import (SIMPLIFY_WINDOW, TrackFormatError,
+                                         compress_track, decode_track,
+                                         encode_track, simplify)
+from msu_manager.gps.history import PositionHistory
+from msu_manager.gps.odometer import haversine_m
+
+
+def test_roundtrip():
+    times = [1735689600.0, 1735689600.1, 1735689600.25, 1735689700.0]
+    lats = [52.520001, 52.5201, 52.519, -33.9]
+    lons = [13.400001, 13.4, 13.41, 151.2]
+    data = encode_track(times, lats, lons)
+
+    decoded = decode_track(data)
+    assert decoded['time'] == pytest.approx(times, abs=0.0005)
+    assert decoded['lat'] == pytest.approx(lats, abs=5e-7)
+    assert decoded['lon'] == pytest.approx(lons, abs=5e-7)
+
+    coarse = decode_track(encode_track(times, lats, lons, precision=3))
+    assert coarse['lat'] == pytest.approx([52.52, 52.52, 52.519, -33.9], abs=1e-9)
+
+
+def test_small_deltas_are_small():
+    count = 1000
+    data = encode_track([1735689600 + i / 10 for i in range(count)], [52.52 + i * 1e-5 for i in range(count)], [13.4] * count)
+    # 100ms takes two bytes, 1e-5 degrees and no change in longitude one byte each
+    assert len(data) == 4 * count + 16
+
+
+def test_simplify_straight_line():
+    lats = [52.52 + i * 1e-5 for i in range(100)]
+    assert simplify(list(range(100)), lats, [13.4] * 100, tolerance_m=1) == [0, 99]
+    assert simplify(list(range(100)), lats, [13.4] * 100, tolerance_m=0) == list(range(100))
+
+
+def test_simplify_in_windows():
+    count = 2 * SIMPLIFY_WINDOW + 10
+    lats = [52.52 + i * 1e-5 for i in range(count)]
+    assert simplify(list(range(count)), lats, [13.4] * count, tolerance_m=1) == [0, SIMPLIFY_WINDOW, 2 * SIMPLIFY_WINDOW, count - 1]
+
+
+def test_simplify_keeps_corners_and_reversing():
+    # North, then east, then back west
+    lats = [52.52 + i * 1e-4 for i in range(10)] + [52.5209] * 20
+    lons = [13.4] * 10 + [13.4 + i * 1e-4 for i in range(1, 11)] + [13.401 - i * 1e-4 for i in range(1, 11)]
+    kept = simplify(list(range(30)), lats, lons, tolerance_m=1)
+    assert kept == [0, 9, 19, 29]
+
+
+def test_simplify_error_bound():
+    # Noisy slalom
+    count = 2000
+    lats = [52.52 + i * 2e-6 + math.sin(i / 7) * 1e-5 for i in range(count)]
+    lons = [13.4 + math.sin(i / 50) * 3e-4 for i in range(count)]
+    kept = simplify(list(range(count)), lats, lons, tolerance_m=2)
+    assert len(kept) < count / 4
+
+    for i in range(count):
+        # Distance of every fix to the position interpolated from the simplified track at its time
+        segment = next(j for j in range(len(kept) - 1) if kept[j] <= i <= kept[j + 1])
+        a, b = kept[segment], kept[segment + 1]
+        ratio = (i - a) / (b - a)
+        lat = lats[a] + (lats[b] - lats[a]) * ratio
+        lon = lons[a] + (lons[b] - lons[a]) * ratio
+        assert haversine_m(lats[i], lons[i], lat, lon) <= 2.01
+
+
+def test_simplify_keeps_stops():
+    # Straight north with a stop in between, i.e. the shape alone is a straight line
+    lats = [52.52 + i * 1e-4 for i in range(10)] + [52.5209] * 10 + [52.5209 + i * 1e-4 for i in range(1, 11)]
+    kept = simplify(list(range(30)), lats, [13.4] * 30, tolerance_m=1)
+    assert kept == [0, 9, 19, 29]
+
+
+def test_compress_history_track():
+    history = PositionHistory(100)
+    for i in range(50):
+        history.append(1000 + i, 52.52 + i * 1e-4, 13.4)
+    decoded = decode_track(compress_track(history.track(), tolerance_m=1))
+    assert decoded['time'] == [1000, 1049]
+    assert haversine_m(decoded['lat'][-1], decoded['lon'][-1], 52.5249, 13.4) < 0.1
+
+    empty = decode_track(compress_track(PositionHistory(10).track(), tolerance_m=1))
+    assert empty == {'time': [], 'lat': [], 'lon': []}
+
+
+def test_decode_errors():
+    data = encode_track([1.0, 2.0], [52.52, 52.53], [13.4, 13.4])
+    with pytest.raises(TrackFormatError):
+        decode_track(b'{"lat": 1}')
+    with pytest.raises(TrackFormatError):
+        decode_track(data[:-1])
+    with pytest.raises(TrackFormatError):
+        decode_track(data + b'\x00')
+    with pytest.raises(TrackFormatError):
+        decode_track(data[:2] + b'\x02' + data[3:])
+
@@ -0,0 +1,60 @@
+import random
+
+from prometheus_client import REGISTRY
+
+from msu_manager.config import CircleGeofenceConfig, PolygonGeofenceConfig
+from msu_manager.gps.geofence import GeofenceEngine, GeofenceEventType
+
+DEPOT = CircleGeofenceConfig(name='depot', lat=52.52, lon=13.40, radius_m=100)
+ZONE = PolygonGeofenceConfig(name='zone', points=[(52.50, 13.38), (52.51, 13.38), (52.51, 13.39), (52.50, 13.39)])
+
+
+def test_circle():
+    engine = GeofenceEngine([DEPOT])
+
+    assert engine.update(52.5215, 13.40, 0) == []                  # ~167m north
+    events = engine.update(52.5205, 13.40, 1)                      # ~56m north
+    assert [(e.fence, e.event) for e in events] == [('depot', GeofenceEventType.ENTER)]
+    assert engine.state() == {'depot': True}
+    assert engine.update(52.52, 13.4005, 2) == []
+    events = engine.update(52.52, 13.402, 3)                       # ~135m east
+    assert [(e.fence, e.event) for e in events] == [('depot', GeofenceEventType.EXIT)]
+
+    assert [e.seq for e in engine.events()] == [1, 2]
+    assert [e.seq for e in engine.events(after_seq=1)] == [2]
+    assert REGISTRY.get_sample_value('gps_geofence_transitions_total', {'fence': 'depot', 'event': 'enter'}) >= 1
+
+
+def test_polygon():
+    engine = GeofenceEngine([ZONE, DEPOT])
+
+    assert [e.fence for e in engine.update(52.505, 13.385, 0)] == ['zone']
+    assert engine.state() == {'zone': True, 'depot': False}
+    assert engine.update(52.505, 13.3899, 1) == []
+    assert [(e.fence, e.event) for e in engine.update(52.511, 13.385, 2)] == [('zone', GeofenceEventType.EXIT)]
+
+
+def test_concave_polygon():
+    u_shape = PolygonGeofenceConfig(name='u', points=[(0, 0), (3, 0), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3)])
+    engine = GeofenceEngine([u_shape], cell_size_deg=1)
+
+    engine.update(0.5, 2, 0)
+    assert engine.state() == {'u': True}
+    engine.update(1.5, 2, 1)
+    assert engine.state() == {'u': False}
+
+
+def test_index_matches_brute_force():
+    random.seed(42)
+    configs = [
+        CircleGeofenceConfig(name=f'circle{i}', lat=random.uniform(52.4, 52.6), lon=random.uniform(13.3, 13.5), radius_m=random.uniform(50, 3000))
+        for i in range(200)
+    ]
+    indexed = GeofenceEngine(configs)
+    unindexed = GeofenceEngine(configs, max_cells_per_fence=0)
+
+    for t in range(500):
+        lat, lon = random.uniform(52.4, 52.6), random.uniform(13.3, 13.5)
+        indexed.update(lat, lon, t)
+        unindexed.update(lat, lon, t)
+        assert indexed.state() == unindexed.state()
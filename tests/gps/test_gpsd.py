@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.fakegpsd import FakeGpsd
+from msu_manager.gps.monitor import GpsMonitor
+
+
+@pytest_asyncio.fixture
+async def fake_gpsd():
+    fake_gpsd = FakeGpsd(rate_hz=50)
+    await fake_gpsd.start()
+    yield fake_gpsd
+    await fake_gpsd.stop()
+
+
+@pytest_asyncio.fixture
+async def run_monitor():
+    tasks = []
+
+    async def factory(config: GpsConfig) -> GpsMonitor:
+        monitor = GpsMonitor(config)
+        tasks.append(asyncio.create_task(monitor.run()))
+        return monitor
+
+    yield factory
+
+    for task in tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+@pytest.mark.asyncio
+async def test_receives_positions(fake_gpsd, run_monitor):
+    monitor = await run_monitor(GpsConfig(enabled=True, gpsd_port=fake_gpsd.port))
+    await asyncio.sleep(0.3)
+
+    assert monitor.is_connected
+    assert monitor.position.fix == True
+    assert monitor.position.satellites_used == 8
+    assert len(monitor.history) > 5
+
+
+@pytest.mark.asyncio
+async def test_init_cmd_once_per_device_attach(fake_gpsd, run_monitor, tmp_path):
+    init_log = tmp_path / 'init.log'
+    monitor = await run_monitor(GpsConfig(
+        enabled=True,
+        gpsd_port=fake_gpsd.port,
+        gpsd_reconnect_min_s=0.1,
+        init_cmd=['sh', '-c', f'echo init >> {init_log}'],
+    ))
+    await asyncio.sleep(0.3)
+    assert init_log.read_text().count('init') == 1
+
+    fake_gpsd.disconnect_clients()
+    await asyncio.sleep(0.5)
+    assert fake_gpsd.connection_count == 2
+    assert monitor.is_connected
+    assert init_log.read_text().count('init') == 1
+
+    fake_gpsd.reattach_device()
+    await asyncio.sleep(0.3)
+    assert init_log.read_text().count('init') == 2
+
+
+@pytest.mark.asyncio
+async def test_reconnect_backoff(unused_tcp_port, run_monitor):
+    monitor = await run_monitor(GpsConfig(enabled=True, gpsd_port=unused_tcp_port, gpsd_reconnect_min_s=0.1, gpsd_reconnect_max_s=0.2))
+    await asyncio.sleep(0.5)
+    assert not monitor.is_connected
+
+    fake_gpsd = FakeGpsd(port=unused_tcp_port)
+    await fake_gpsd.start()
+    try:
+        await asyncio.sleep(0.5)
+        assert monitor.is_connected
+        assert fake_gpsd.connection_count == 1
+    finally:
+        await fake_gpsd.stop()
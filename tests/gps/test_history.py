@@ -0,0 +1,91 @@
+import pytest
+
+from msu_manager.gps.history import PositionHistory
+
+
+def fill(history: PositionHistory, count: int, start: float = 0):
+    for i in range(count):
+        history.append(start + i, 50 + i / 1000, 10 + i / 1000, alt=100.0 + i, speed=1.0, track=90.0, eph=2.0, mode=3)
+
+
+def test_track_columns():
+    history = PositionHistory(10)
+    fill(history, 3)
+    history.append(3, 50.5, 10.5, mode=2)
+
+    track = history.track()
+    assert track['time'] == [0, 1, 2, 3]
+    assert track['lat'] == [50.0, 50.001, 50.002, 50.5]
+    assert track['alt'] == [100.0, 101.0, 102.0, None]
+    assert track['mode'] == [3, 3, 3, 2]
+
+
+def test_capacity_wraps_around():
+    history = PositionHistory(5)
+    fill(history, 12)
+
+    assert len(history) == 5
+    assert history.track()['time'] == [7, 8, 9, 10, 11]
+    assert history.track(since=8.5)['time'] == [9, 10, 11]
+    assert history.track(since=11)['time'] == []
+
+
+def test_out_of_order_fixes_are_ignored():
+    history = PositionHistory(5)
+    fill(history, 3)
+
+    assert history.append(2, 0, 0) == False
+    assert history.append(1.5, 0, 0) == False
+    assert history.track()['time'] == [0, 1, 2]
+
+
+def test_downsampling_includes_latest_fix():
+    history = PositionHistory(100)
+    fill(history, 95)
+
+    track = history.track(max_points=10)
+    assert len(track['time']) == 10
+    assert track['time'][-1] == 94
+    assert track['time'][1] - track['time'][0] == 10
+
+    track = history.track(since=89, max_points=2)
+    assert track['time'] == [91, 94]
+
+
+def test_downsampling_across_wrap():
+    history = PositionHistory(10)
+    fill(history, 15)
+
+    track = history.track(max_points=5)
+    assert track['time'] == [6, 8, 10, 12, 14]
+
+
+def test_empty_history():
+    history = PositionHistory(10)
+    assert history.track(since=5, max_points=3)['time'] == []
+    assert history.latest_time is None
+
+
+def test_interpolate():
+    history = PositionHistory(10)
+    history.append(10, 50.0, 10.0, alt=100.0, speed=2.0, track=350.0)
+    history.append(11, 50.1, 10.2, alt=None, speed=4.0, track=10.0)
+    history.append(20, 51.0, 11.0)
+
+    result = history.interpolate([10.5, 9, 11, 15, 10, 20, 21])
+    assert result['time'] == [10.5, 9, 11, 15, 10, 20, 21]
+    assert result['lat'] == pytest.approx([50.05, None, 50.1, None, 50.0, 51.0, None])
+    assert result['lon'][0] == pytest.approx(10.1)
+    assert result['alt'][0] is None
+    assert result['speed'][0] == pytest.approx(3.0)
+    assert result['track'][0] == pytest.approx(0.0)
+
+    assert history.interpolate([15], max_gap_s=10)['lat'] == pytest.approx([50.5])
+
+
+def test_interpolate_across_wrap():
+    history = PositionHistory(5)
+    fill(history, 8)
+
+    result = history.interpolate([7, 2.5, 3.5, 6.25])
+    assert result['lat'] == pytest.approx([50.007, None, 50.0035, 50.00625])
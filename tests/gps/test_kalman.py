@@ -0,0 +1,135 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+from gpsd_client_async import TpvMessage
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.kalman import PositionFilter
+from msu_manager.gps.monitor import GpsMonitor
+from msu_manager.gps.odometer import METERS_PER_DEGREE, haversine_m
+
+START = 1735689600.0
+
+
+def drive_north(filter: PositionFilter, count: int, noise_m: float = 0, speed: float = 10):
+    '''Feeds a fix per second of a vehicle going north at `speed`, returns the latest true time and position.'''
+    rng = random.Random(1)
+    for i in range(count):
+        t = START + i
+        lat = 52.52 + speed * i / METERS_PER_DEGREE
+        noisy_lat = lat + rng.gauss(0, noise_m) / METERS_PER_DEGREE
+        noisy_lon = 13.4 + rng.gauss(0, noise_m) / (METERS_PER_DEGREE * 0.6)
+        filter.update(t, noisy_lat, noisy_lon, speed=speed, track=0.0, eph=2 * noise_m or 1, eps=0.2)
+    return t, lat, 13.4
+
+
+def test_no_estimate_before_first_fix():
+    assert PositionFilter().estimate() is None
+
+
+def test_smoothing_reduces_noise():
+    filter = PositionFilter()
+    raw_errors = []
+    filtered_errors = []
+    rng = random.Random(2)
+    for i in range(60):
+        lat = 52.52 + 10 * i / METERS_PER_DEGREE
+        noisy_lat = lat + rng.gauss(0, 3) / METERS_PER_DEGREE
+        filter.update(START + i, noisy_lat, 13.4, speed=10, track=0.0, eph=6, eps=0.2)
+        if i >= 10:
+            estimate = filter.estimate()
+            raw_errors.append(haversine_m(lat, 13.4, noisy_lat, 13.4))
+            filtered_errors.append(haversine_m(lat, 13.4, estimate.lat, estimate.lon))
+
+    assert sum(filtered_errors) < 0.5 * sum(raw_errors)
+
+
+def test_prediction():
+    filter = PositionFilter()
+    t, lat, lon = drive_north(filter, 10)
+
+    estimate = filter.estimate()
+    assert estimate.time == t
+    assert estimate.predicted_s == 0
+    assert haversine_m(estimate.lat, estimate.lon, lat, lon) < 0.5
+    assert estimate.speed == pytest.approx(10, abs=0.1)
+    assert estimate.track == pytest.approx(0, abs=1)
+
+    # 20ms steps between fixes
+    predicted = filter.estimate(t + 0.02)
+    assert predicted.predicted_s == pytest.approx(0.02)
+    assert haversine_m(predicted.lat, predicted.lon, lat + 0.2 / METERS_PER_DEGREE, lon) < 0.5
+
+    far = filter.estimate(t + 2)
+    assert haversine_m(far.lat, far.lon, lat + 20 / METERS_PER_DEGREE, lon) < 1
+    # Uncertainty grows the further ahead
+    assert far.covariance[1][1] > predicted.covariance[1][1] > 0
+    assert far.covariance[3][3] > predicted.covariance[3][3]
+
+
+def test_covariance_shrinks_with_fixes():
+    filter = PositionFilter()
+    drive_north(filter, 1, noise_m=2)
+    first = filter.estimate().covariance
+    filter = PositionFilter()
+    drive_north(filter, 20, noise_m=2)
+    later = filter.estimate().covariance
+
+    assert later[0][0] < first[0][0]
+    assert later[1][1] < first[1][1]
+    # Symmetric, east / north independent
+    assert later[0][2] == later[2][0]
+    assert later[0][1] == later[0][3] == 0
+
+
+def test_restarts_after_gap():
+    filter = PositionFilter(max_gap_s=5)
+    drive_north(filter, 10)
+    filter.update(START + 100, 48.0, 11.0, speed=0, track=None)
+    estimate = filter.estimate()
+    assert (estimate.lat, estimate.lon) == (pytest.approx(48.0), pytest.approx(11.0))
+    assert estimate.speed == 0
+
+
+def test_no_prediction_beyond_max_gap():
+    filter = PositionFilter(max_gap_s=5)
+    t, _, _ = drive_north(filter, 10)
+    assert filter.estimate(t + 5) is not None
+    assert filter.estimate(t + 5.1) is None
+    assert filter.estimate(t - 5.1) is None
+
+
+def test_reset():
+    filter = PositionFilter()
+    drive_north(filter, 10)
+    filter.reset()
+    assert filter.estimate() is None
+
+    filter.update(START + 11, 48.0, 11.0)
+    estimate = filter.estimate()
+    assert (estimate.lat, estimate.lon) == (pytest.approx(48.0), pytest.approx(11.0))
+    assert estimate.speed == 0
+
+
+def test_monitor_filtered_position():
+    monitor = GpsMonitor(GpsConfig(enabled=True, kalman_enabled=True))
+    assert monitor.position.filtered is None
+
+    for i in range(5):
+        monitor._handle_tpv(TpvMessage(mode=3, lat=52.52 + 10 * i / METERS_PER_DEGREE, lon=13.4, speed=10, track=0, eph=2,
+                                       time=datetime.fromtimestamp(START + i, timezone.utc)))
+
+    position = monitor.position
+    assert position.filtered.time == START + 4
+    assert haversine_m(position.filtered.lat, position.filtered.lon, position.lat, position.lon) < 1
+    predicted = monitor.filtered_position(START + 4.5)
+    assert predicted.lat > position.filtered.lat
+    assert monitor.filtered_position(START + 60) is None
+
+    # Lost fix
+    monitor._handle_tpv(TpvMessage(mode=1))
+    assert monitor.position.filtered is None
+    assert monitor.filtered_position(START + 4.5) is None
+
+    assert GpsMonitor(GpsConfig(enabled=True)).filtered_position(START) is None
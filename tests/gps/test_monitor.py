@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from gpsd_client_async import SkyMessage, TpvMessage
+from prometheus_client import REGISTRY
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.monitor import GpsMonitor
+
+
+def test_position_without_fix():
+    monitor = GpsMonitor(GpsConfig(enabled=True))
+    position = monitor.position
+    assert position.fix == False
+    assert position.fix_age_s is None
+
+    monitor._handle_tpv(TpvMessage(mode=1))
+    assert monitor.position.mode == 1
+    assert monitor.position.fix == False
+
+
+def test_extended_position():
+    monitor = GpsMonitor(GpsConfig(enabled=True))
+    monitor._handle_sky(SkyMessage(nSat=12, uSat=8, hdop=0.9))
+    monitor._handle_tpv(TpvMessage(mode=3, lat=50.0, lon=10.0, alt=120.5, speed=13.2, track=271.0, eph=3.5, epv=5.0,
+                                   time=datetime(2025, 1, 1, tzinfo=timezone.utc)))
+
+    position = monitor.position
+    assert position.fix == True
+    assert (position.lat, position.lon, position.alt, position.speed, position.track) == (50.0, 10.0, 120.5, 13.2, 271.0)
+    assert position.time == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert (position.satellites_used, position.satellites_visible, position.hdop) == (8, 12, 0.9)
+    assert 0 <= position.fix_age_s < 0.1
+
+    # A later TPV without fix keeps the age of the latest fix
+    monitor._handle_tpv(TpvMessage(mode=1))
+    assert monitor.position.fix == False
+    assert monitor.position.fix_age_s is not None
+
+    assert REGISTRY.get_sample_value('gps_fix_mode') == 1
+    assert REGISTRY.get_sample_value('gps_satellites', {'state': 'used'}) == 8
+    assert REGISTRY.get_sample_value('gps_error_estimate_meters', {'direction': 'horizontal'}) == 3.5
+    # Collecting the registry takes a while, the gauge is read at collection time
+    fix_age_s = monitor.fix_age_s
+    assert fix_age_s <= REGISTRY.get_sample_value('gps_fix_age_seconds') < fix_age_s + 1
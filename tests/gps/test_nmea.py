@@ -0,0 +1,185 @@
+import asyncio
+import struct
+from datetime import datetime, timezone
+
+import pytest
+from gpsd_client_async import SkyMessage, TpvMessage
+from prometheus_client import REGISTRY
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.monitor import GpsMonitor
+from msu_manager.gps.nmea import NmeaParser, _ubx_checksum, format_sentence
+
+
+def epoch(time_of_day: str, gst: bool = False) -> bytes:
+    sentences = [
+        f'GPRMC,{time_of_day},A,4807.038,N,01131.000,E,022.4,084.4,010125,003.1,W',
+        f'GPGGA,{time_of_day},4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,',
+        'GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1',
+        'GPGSV,1,1,02,01,40,083,46,02,17,308,41',
+    ]
+    if gst:
+        sentences.append(f'GPGST,{time_of_day},0.006,0.023,0.020,273.6,3.0,4.0,5.0')
+    return b''.join(format_sentence(sentence) for sentence in sentences)
+
+
+def nav_pvt(lat: float, lon: float, fix_type: int = 3, month: int = 1, second: int = 0) -> bytes:
+    payload = struct.pack(
+        '<IHBBBBBBIiBBBBiiiiIIiiiiiIIHH4xihH',
+        0, 2025, month, 1, 12, 0, second, 0x03, 0, 500_000_000, fix_type, 0x01, 0, 11,
+        round(lon * 1e7), round(lat * 1e7), 100_000, 55_000, 1500, 2500, 0, 0, -200, 10_000, 9_000_000, 300, 0, 150, 0, 0, 0, 0,
+    )
+    frame = b'\x01\x07' + struct.pack('<H', len(payload)) + payload
+    return b'\xb5\x62' + frame + _ubx_checksum(frame)
+
+
+def tpvs(messages) -> list:
+    return [message for message in messages if isinstance(message, TpvMessage)]
+
+
+def test_epoch_to_tpv_and_sky():
+    parser = NmeaParser(device='/dev/ttyACM0')
+    messages = parser.feed(epoch('120000.00', gst=True))
+    # The first epoch is only complete once the next one starts
+    assert tpvs(messages) == []
+    sky = messages[0]
+    assert isinstance(sky, SkyMessage)
+    assert (sky.nSat, sky.uSat, sky.hdop, sky.vdop, sky.pdop) == (2, 8, 1.3, 2.1, 2.5)
+
+    # Starting the second epoch completes the first, which teaches the parser when an epoch is complete
+    tpv, second_tpv = tpvs(parser.feed(epoch('120000.10', gst=True)))
+    assert second_tpv.time.microsecond == 100_000
+    assert tpv.mode == 3
+    assert tpv.device == '/dev/ttyACM0'
+    assert tpv.time == datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert tpv.lat == pytest.approx(48.1173)
+    assert tpv.lon == pytest.approx(11.516667)
+    assert tpv.alt == 545.4
+    assert tpv.speed == pytest.approx(11.523, abs=0.001)
+    assert tpv.track == 84.4
+    assert tpv.eph == pytest.approx(10)
+    assert tpv.epv == pytest.approx(10)
+
+
+def test_emits_as_soon_as_epoch_is_complete():
+    parser = NmeaParser()
+    parser.feed(epoch('120000.00'))
+    parser.feed(epoch('120000.10'))
+
+    rmc, gga = epoch('120000.20').split(b'\r\n')[:2]
+    assert tpvs(parser.feed(rmc + b'\r\n')) == []
+    tpv, = tpvs(parser.feed(gga + b'\r\n'))
+    assert tpv.time.microsecond == 200_000
+
+
+def test_incremental_feeding():
+    parser = NmeaParser()
+    data = epoch('120000.00') + epoch('120000.10') + epoch('120000.20')
+    messages = []
+    for i in range(len(data)):
+        messages.extend(parser.feed(data[i:i + 1]))
+    messages.extend(parser.flush())
+    assert [tpv.time.microsecond for tpv in tpvs(messages)] == [0, 100_000, 200_000]
+
+
+def test_rejects_bad_checksum_and_garbage():
+    def rejected(reason):
+        return REGISTRY.get_sample_value('gps_serial_rejected_sentences_total', {'reason': reason}) or 0
+
+    checksum_before = rejected('checksum')
+    truncated_before = rejected('truncated')
+    parser = NmeaParser()
+    corrupted = format_sentence('GPGGA,120000.00,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,').replace(b'4807', b'4808')
+    parser.feed(corrupted)
+    assert rejected('checksum') == checksum_before + 1
+
+    # Line noise and a sentence cut off by the next one
+    parser.feed(b'\x00\xff noise $GPRMC,1200' + epoch('120000.10'))
+    assert rejected('truncated') == truncated_before + 1
+    tpv, = tpvs(parser.flush())
+    assert tpv.lat == pytest.approx(48.1173)
+
+
+def test_no_fix():
+    parser = NmeaParser()
+    parser.feed(format_sentence('GPRMC,120000.00,V,,,,,,,010125,,,N'))
+    parser.feed(format_sentence('GPGGA,120000.00,,,,,0,00,99.99,,,,,,'))
+    tpv, = tpvs(parser.flush())
+    assert tpv.mode == 1
+    assert tpv.lat is None
+
+
+def test_ubx_nav_pvt():
+    parser = NmeaParser(ubx=True)
+    data = nav_pvt(48.1, 11.5) + epoch('120000.00')
+    messages = []
+    for i in range(0, len(data), 7):
+        messages.extend(parser.feed(data[i:i + 7]))
+
+    tpv = messages[0]
+    assert tpv.mode == 3
+    assert tpv.time == datetime(2025, 1, 1, 12, 0, 0, 500_000, tzinfo=timezone.utc)
+    assert (tpv.lat, tpv.lon) == (pytest.approx(48.1), pytest.approx(11.5))
+    assert (tpv.alt, tpv.speed, tpv.track, tpv.climb) == (55.0, 10.0, pytest.approx(90.0), 0.2)
+    assert (tpv.eph, tpv.epv, tpv.eps) == (1.5, 2.5, 0.3)
+    assert (messages[1].uSat, messages[1].pdop) == (11, 1.5)
+    # NMEA is parsed alongside
+    assert isinstance(messages[2], SkyMessage)
+
+    tpv, _ = parser.feed(nav_pvt(48.1, 11.5, fix_type=0))
+    assert tpv.mode == 1
+
+
+def test_ubx_nav_pvt_bad_time():
+    parser = NmeaParser(ubx=True)
+    # Leap second
+    tpv, _ = parser.feed(nav_pvt(48.1, 11.5, second=60))
+    assert tpv.time == datetime(2025, 1, 1, 12, 0, 59, 500_000, tzinfo=timezone.utc)
+
+    # A frame that cannot be decoded is dropped, the stream continues after it
+    messages = parser.feed(nav_pvt(48.1, 11.5, month=13) + nav_pvt(48.2, 11.5))
+    assert len(messages) == 2
+    assert messages[0].lat == pytest.approx(48.2)
+
+
+@pytest.mark.asyncio
+async def test_monitor_serial_source(unused_tcp_port):
+    connected = asyncio.Event()
+    writers = []
+
+    def on_connect(_, writer):
+        writers.append(writer)
+        connected.set()
+
+    server = await asyncio.start_server(on_connect, '127.0.0.1', unused_tcp_port)
+    monitor = GpsMonitor(GpsConfig(enabled=True, source='serial', serial_device=f'socket://127.0.0.1:{unused_tcp_port}'))
+    task = asyncio.create_task(monitor.run())
+    try:
+        await asyncio.wait_for(connected.wait(), 1)
+        for i in range(3):
+            writers[0].write(epoch(f'12000{i}.00'))
+        await writers[0].drain()
+        await asyncio.sleep(0.2)
+
+        assert monitor.is_connected
+        position = monitor.position
+        assert position.fix == True
+        assert position.lat == pytest.approx(48.1173)
+        assert position.time == datetime(2025, 1, 1, 12, 0, 2, tzinfo=timezone.utc)
+        assert position.satellites_visible == 2
+        assert len(monitor.history) == 3
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        for writer in writers:
+            writer.close()
+        server.close()
+        await server.wait_closed()
+
+
+def test_serial_source_requires_device():
+    with pytest.raises(ValueError):
+        GpsConfig(enabled=True, source='serial')
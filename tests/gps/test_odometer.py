@@ -0,0 +1,88 @@
+import pytest
+
+from msu_manager.gps.odometer import Odometer, haversine_m
+
+
+def test_haversine():
+    # One degree of latitude is ~111.2km
+    assert haversine_m(50, 10, 51, 10) == pytest.approx(111195, rel=1e-3)
+    assert haversine_m(50, 10, 50, 10) == 0
+
+
+def test_accumulates_distance():
+    odometer = Odometer()
+    for i in range(11):
+        odometer.update(50 + i * 0.0001, 10, timestamp=i, speed=11)
+
+    assert odometer.state.total_m == pytest.approx(111.2, rel=1e-2)
+
+
+def test_stationary_jitter_is_ignored():
+    odometer = Odometer(min_step_m=5)
+    odometer.update(50, 10, timestamp=0, speed=0)
+    for i in range(1, 100):
+        # Jumps around by ~2m
+        odometer.update(50 + (i % 2) * 0.00002, 10, timestamp=i, speed=0.1, eph=3)
+
+    assert odometer.state.total_m == 0
+
+
+def test_implausible_jumps_are_ignored():
+    odometer = Odometer()
+    odometer.update(50, 10, timestamp=0, speed=10)
+    odometer.update(51, 10, timestamp=1, speed=10)
+    odometer.update(51.0001, 10, timestamp=2, speed=10)
+
+    assert odometer.state.total_m == pytest.approx(11.1, rel=1e-2)
+
+
+def test_trips():
+    odometer = Odometer()
+    odometer.update(50, 10, timestamp=0, speed=10)
+    odometer.update(50.0001, 10, timestamp=1, speed=10)
+
+    odometer.set_ignition(True, 1)
+    assert odometer.state.trip.distance_m == 0
+    odometer.update(50.0002, 10, timestamp=2, speed=10)
+    odometer.set_ignition(True, 2)
+    odometer.set_ignition(False, 3)
+
+    assert odometer.state.trip is None
+    assert odometer.state.last_trip.distance_m == pytest.approx(11.1, rel=1e-2)
+    assert (odometer.state.last_trip.start_time, odometer.state.last_trip.end_time) == (1, 3)
+    assert odometer.state.total_m == pytest.approx(22.2, rel=1e-2)
+
+
+def test_persistence(tmp_path):
+    odometer_file = tmp_path / 'odometer.json'
+    odometer = Odometer(state_file=odometer_file)
+    odometer.set_ignition(True, 0)
+    odometer.update(50, 10, timestamp=0, speed=10)
+    odometer.update(50.001, 10, timestamp=10, speed=10)
+    odometer.persist()
+
+    restored = Odometer(state_file=odometer_file)
+    assert restored.state.total_m == pytest.approx(111.2, rel=1e-2)
+    assert restored.state.trip.distance_m == pytest.approx(111.2, rel=1e-2)
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    odometer_file = tmp_path / 'odometer.json'
+    odometer_file.write_text('garbage')
+    assert Odometer(state_file=odometer_file).state.total_m == 0
+
+
+def test_truncated_file_is_kept(tmp_path):
+    odometer_file = tmp_path / 'odometer.json'
+    odometer = Odometer(state_file=odometer_file)
+    odometer.update(50, 10, timestamp=0, speed=10)
+    odometer.update(50.001, 10, timestamp=10, speed=10)
+    odometer.persist()
+    content = odometer_file.read_bytes()
+    odometer_file.write_bytes(content[:len(content) // 2])
+
+    restored = Odometer(state_file=odometer_file)
+    assert restored.state.total_m == 0
+    # The truncated file is moved aside instead of being overwritten by the next persist()
+    assert (tmp_path / 'odometer.json.corrupt').read_bytes() == content[:len(content) // 2]
+    assert not odometer_file.exists()
@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.fakegpsd import DEVICE_PATH, FakeGpsd
+from msu_manager.gps.monitor import GpsMonitor
+from msu_manager.gps.proxy import GpsdProxy
+
+
+@pytest_asyncio.fixture
+async def proxy():
+    proxy = GpsdProxy(port=0, queue_size=5)
+    await proxy.start()
+    yield proxy
+    await proxy.stop()
+
+
+@pytest_asyncio.fixture
+async def upstream(proxy):
+    fake_gpsd = FakeGpsd(rate_hz=50)
+    await fake_gpsd.start()
+    monitor = GpsMonitor(GpsConfig(enabled=True, gpsd_port=fake_gpsd.port))
+    monitor.add_line_listener(proxy.publish)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.2)
+    yield monitor
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await fake_gpsd.stop()
+
+
+async def read_message(reader: asyncio.StreamReader) -> dict:
+    return json.loads(await asyncio.wait_for(reader.readline(), 1))
+
+
+async def read_classes(reader: asyncio.StreamReader, count: int) -> list:
+    return [(await read_message(reader))['class'] for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_watch_forwards_upstream(proxy, upstream):
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.port)
+    writer.write(b'?WATCH={"enable":true,"json":true};\r\n')
+
+    version = await read_message(reader)
+    assert version['class'] == 'VERSION'
+    assert version['rev'] == 'fake'
+    devices = await read_message(reader)
+    assert devices['devices'][0]['path'] == DEVICE_PATH
+    assert (await read_message(reader))['class'] == 'WATCH'
+    assert 'TPV' in await read_classes(reader, 10)
+
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_watch_device_filter(proxy, upstream):
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.port)
+    writer.write(b'?WATCH={"enable":true,"json":true,"device":"/dev/ttyOTHER"};\r\n')
+    assert await read_classes(reader, 3) == ['VERSION', 'DEVICES', 'WATCH']
+
+    with pytest.raises(asyncio.TimeoutError):
+        await read_message(reader)
+
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_poll(proxy, upstream):
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.port)
+    assert (await read_message(reader))['class'] == 'VERSION'
+
+    writer.write(b'?POLL;\r\n')
+    poll = await read_message(reader)
+    assert poll['class'] == 'POLL'
+    assert poll['active'] == 1
+    assert poll['tpv'][0]['device'] == DEVICE_PATH
+    assert poll['sky'][0]['uSat'] == 8
+
+    writer.write(b'?NONSENSE;\r\n')
+    assert (await read_message(reader))['class'] == 'ERROR'
+
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_invalid_watch_argument(proxy):
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.port)
+    assert (await read_message(reader))['class'] == 'VERSION'
+
+    writer.write(b'?WATCH=1;\r\n?WATCH=[];\r\n?WATCH={"enable":;\r\n')
+    assert await read_classes(reader, 3) == ['ERROR', 'ERROR', 'ERROR']
+
+    # The client stays connected
+    writer.write(b'?POLL;\r\n')
+    assert (await read_message(reader))['class'] == 'POLL'
+
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_client_drops_oldest(proxy):
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy.port)
+    writer.write(b'?WATCH={"enable":true};\r\n')
+    assert await read_classes(reader, 3) == ['VERSION', 'DEVICES', 'WATCH']
+
+    # Publish without yielding, so the client can not catch up
+    for i in range(20):
+        proxy.publish(b'{"class":"PPS","n":%d}\r\n' % i, None)
+
+    received = [(await read_message(reader))['n'] for _ in range(5)]
+    assert received == [15, 16, 17, 18, 19]
+
+    writer.close()
@@ -0,0 +1,54 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from gpsd_client_async import TpvMessage
+
+from msu_manager.config import GpsConfig
+from msu_manager.gps.monitor import GpsMonitor
+
+
+def tpv(lat: float, second: int = 0) -> TpvMessage:
+    return TpvMessage(mode=3, lat=lat, lon=10.0, time=datetime(2025, 1, 1, 0, 0, second, tzinfo=timezone.utc))
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_fixes():
+    monitor = GpsMonitor(GpsConfig(enabled=True))
+    stream = monitor.stream()
+    next_event = asyncio.create_task(anext(stream))
+    await asyncio.sleep(0)
+
+    monitor._handle_tpv(tpv(50.0))
+
+    event = await asyncio.wait_for(next_event, 1)
+    assert event.startswith('data: ') and event.endswith('\n\n')
+    assert json.loads(event[len('data: '):])['lat'] == 50.0
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_decimation_and_drop_oldest():
+    monitor = GpsMonitor(GpsConfig(enabled=True, stream_queue_size=3))
+    fast = monitor.stream()
+    decimated = monitor.stream(min_interval_s=10)
+    first_fast = asyncio.create_task(anext(fast))
+    first_decimated = asyncio.create_task(anext(decimated))
+    await asyncio.sleep(0)
+
+    for i in range(6):
+        monitor._handle_tpv(tpv(50.0 + i, second=i))
+
+    # The queue of 3 only holds the latest fixes
+    assert json.loads((await first_fast)[len('data: '):])['lat'] == 53.0
+    assert [json.loads((await anext(fast))[len('data: '):])['lat'] for _ in range(2)] == [54.0, 55.0]
+
+    # Only the first of the remaining fixes is within the rate limit
+    assert json.loads((await first_decimated)[len('data: '):])['lat'] == 53.0
+    next_decimated = asyncio.create_task(anext(decimated))
+    await asyncio.sleep(0.1)
+    assert not next_decimated.done()
+
+    next_decimated.cancel()
+    await fast.aclose()
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from msu_manager.hcu.compact import (CompactFormatError, cobs_decode,
+                                     cobs_encode, decode_compact_message,
+                                     encode_compact_message)
+from msu_manager.hcu.messages import (HeartbeatMessage, LogMessage,
+                                      MetricMessage, ResumeMessage,
+                                      ShutdownMessage)
+
+
+@pytest.mark.parametrize('data', [b'', b'\x00', b'\x00\x00', b'\x01\x02\x00\x03', bytes(range(1, 255)), bytes(range(256)) * 3, os.urandom(1000)])
+def test_cobs_roundtrip(data):
+    encoded = cobs_encode(data)
+
+    assert b'\x00' not in encoded
+    assert cobs_decode(encoded) == data
+
+def test_cobs_invalid():
+    with pytest.raises(CompactFormatError):
+        cobs_decode(b'\x05ab')
+
+@pytest.mark.parametrize('message', [
+    ShutdownMessage(type='SHUTDOWN'),
+    ResumeMessage(type='RESUME'),
+    HeartbeatMessage(type='HEARTBEAT'),
+    HeartbeatMessage(type='HEARTBEAT', version='1.2.3'),
+    LogMessage(type='LOG', level='error', message='Überhitzung'),
+    MetricMessage(type='METRIC', key='temp0', value='42.0'),
+    MetricMessage(type='METRIC', key='', value=''),
+])
+def test_message_roundtrip(message):
+    frame = encode_compact_message(message)
+
+    assert frame[0] == 0 and frame[-1] == 0
+    assert decode_compact_message(cobs_decode(frame[1:-1])) == message
+
+def test_compact_is_smaller():
+    message = MetricMessage(type='METRIC', key='temp0', value='42.0')
+
+    assert len(encode_compact_message(message)) < len(message.model_dump_json()) / 2
+
+@pytest.mark.parametrize('payload', [b'', b'\x09', b'\x05\x05temp', b'\x05\x01a', b'\x01\x00', b'\x04\x01\xff\x00'])
+def test_invalid_payload(payload):
+    with pytest.raises(CompactFormatError):
+        decode_compact_message(payload)
+
+def test_field_too_long():
+    with pytest.raises(CompactFormatError):
+        encode_compact_message(LogMessage(type='LOG', level='info', message='x' * 256))
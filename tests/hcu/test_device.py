@@ -0,0 +1,41 @@
+import pytest
+
+from msu_manager.hcu.device import DeviceWatcher
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout():
+    testee = DeviceWatcher()
+    testee.start()
+
+    assert await testee.wait(0.05) == False
+
+    testee.stop()
+
+@pytest.mark.asyncio
+async def test_device_added_event():
+    testee = DeviceWatcher()
+    testee.start()
+    if not testee.is_event_driven:
+        pytest.skip('Device events not available in this environment')
+
+    # Simulate a uevent as sent by udev
+    testee._socket = FakeSocket([b'libudev\0\xfe\xed\xca\xfeACTION=add\0DEVNAME=/dev/ttyUSB0\0SUBSYSTEM=tty\0'], testee._socket)
+    testee._on_readable()
+
+    assert await testee.wait(1) == True
+    assert await testee.wait(0.05) == False
+
+    testee._socket = testee._socket.original
+    testee.stop()
+
+
+class FakeSocket:
+    def __init__(self, messages, original):
+        self._messages = messages
+        self.original = original
+
+    def recv(self, _):
+        if not self._messages:
+            raise BlockingIOError()
+        return self._messages.pop(0)
@@ -0,0 +1,136 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from msu_manager.config import DispatchOverflowPolicy
+from msu_manager.hcu.dispatcher import HcuDispatcher
+from msu_manager.hcu.messages import (HcuMessage, HeartbeatMessage, LogMessage,
+                                      MetricMessage, ResumeMessage,
+                                      ShutdownMessage)
+
+
+class RecordingController:
+    def __init__(self, delay_s: float = 0):
+        self.messages: List[HcuMessage] = []
+        self._delay_s = delay_s
+
+    async def process_message(self, message: HcuMessage):
+        await asyncio.sleep(self._delay_s)
+        self.messages.append(message)
+
+
+def metric(idx: int) -> MetricMessage:
+    return MetricMessage(type='METRIC', key='key', value=str(idx))
+
+def log(idx: int) -> LogMessage:
+    return LogMessage(type='LOG', level='info', message=str(idx))
+
+
+@pytest.mark.asyncio
+async def test_ordering_preserved():
+    controller = RecordingController(delay_s=0.01)
+    testee = HcuDispatcher(controller)
+    task = asyncio.create_task(testee.run())
+
+    # SHUTDOWN takes longer to process than RESUME, it must still be handled first
+    testee.submit(ShutdownMessage(type='SHUTDOWN'))
+    testee.submit(ResumeMessage(type='RESUME'))
+    testee.submit(metric(0))
+    await asyncio.sleep(0.1)
+
+    assert [type(m) for m in controller.messages] == [ShutdownMessage, ResumeMessage, MetricMessage]
+    assert testee.queue_depth == 0
+
+    task.cancel()
+
+@pytest.mark.asyncio
+async def test_drop_oldest():
+    controller = RecordingController()
+    testee = HcuDispatcher(controller, max_size=3, overflow_policy=DispatchOverflowPolicy.DROP_OLDEST)
+
+    for idx in range(5):
+        testee.submit(metric(idx))
+
+    task = asyncio.create_task(testee.run())
+    await asyncio.sleep(0.05)
+
+    assert [m.value for m in controller.messages] == ['2', '3', '4']
+
+    task.cancel()
+
+@pytest.mark.asyncio
+async def test_drop_newest():
+    controller = RecordingController()
+    testee = HcuDispatcher(controller, max_size=3, overflow_policy=DispatchOverflowPolicy.DROP_NEWEST)
+
+    for idx in range(5):
+        testee.submit(metric(idx))
+
+    task = asyncio.create_task(testee.run())
+    await asyncio.sleep(0.05)
+
+    assert [m.value for m in controller.messages] == ['0', '1', '2']
+
+    task.cancel()
+
+@pytest.mark.asyncio
+async def test_control_messages_never_dropped():
+    controller = RecordingController()
+    testee = HcuDispatcher(controller, max_size=2, overflow_policy=DispatchOverflowPolicy.DROP_NEWEST)
+
+    testee.submit(metric(0))
+    testee.submit(log(1))
+    testee.submit(ShutdownMessage(type='SHUTDOWN'))
+    testee.submit(ResumeMessage(type='RESUME'))
+    testee.submit(ShutdownMessage(type='SHUTDOWN'))
+    testee.submit(metric(2))
+
+    task = asyncio.create_task(testee.run())
+    await asyncio.sleep(0.05)
+
+    assert [type(m) for m in controller.messages] == [ShutdownMessage, ResumeMessage, ShutdownMessage]
+
+    task.cancel()
+
+@pytest.mark.asyncio
+async def test_drop_lowest_priority_under_sustained_overflow():
+    controller = RecordingController()
+    testee = HcuDispatcher(controller, max_size=3, overflow_policy=DispatchOverflowPolicy.DROP_OLDEST)
+
+    testee.submit(HeartbeatMessage(type='HEARTBEAT'))
+    testee.submit(metric(0))
+    testee.submit(HeartbeatMessage(type='HEARTBEAT', version='2'))
+    for idx in range(1, 1000):
+        testee.submit(metric(idx))
+    assert testee.queue_depth == 3
+
+    task = asyncio.create_task(testee.run())
+    await asyncio.sleep(0.05)
+
+    assert [(type(m), getattr(m, 'value', None)) for m in controller.messages] == [
+        (HeartbeatMessage, None), (HeartbeatMessage, None), (MetricMessage, '999'),
+    ]
+    assert testee.queue_depth == 0
+
+    task.cancel()
+
+@pytest.mark.asyncio
+async def test_controller_error_does_not_stop_dispatch():
+    controller = RecordingController()
+    testee = HcuDispatcher(controller)
+
+    original_process_message = controller.process_message
+    async def failing_once(message):
+        controller.process_message = original_process_message
+        raise ValueError('test')
+    controller.process_message = failing_once
+
+    task = asyncio.create_task(testee.run())
+    testee.submit(metric(0))
+    testee.submit(metric(1))
+    await asyncio.sleep(0.05)
+
+    assert [m.value for m in controller.messages] == ['1']
+
+    task.cancel()
@@ -0,0 +1,156 @@
+from msu_manager.hcu.compact import cobs_encode
+from msu_manager.hcu.framing import LineFramer
+
+
+def test_single_frame():
+    testee = LineFramer()
+
+    frames = testee.feed(b'{"type":"SHUTDOWN"}\n')
+
+    assert frames == [b'{"type":"SHUTDOWN"}']
+    assert testee.buffered_bytes == 0
+
+def test_frame_split_across_chunks():
+    testee = LineFramer()
+
+    assert testee.feed(b'{"type":') == []
+    assert testee.feed(b'"RESUME"') == []
+    assert testee.feed(b'}\n{"type"') == [b'{"type":"RESUME"}']
+    assert testee.buffered_bytes == len(b'{"type"')
+
+def test_partial_line_not_rescanned():
+    class ScanCountingBuffer(bytearray):
+        scanned = 0
+
+        def find(self, sub, start=0, end=None):
+            end = len(self) if end is None else end
+            self.scanned += max(0, end - start)
+            return super().find(sub, start, end)
+
+    testee = LineFramer()
+    testee._buffer = ScanCountingBuffer()
+
+    chunk = b'"0123456789",'
+    assert testee.feed(b'{"a":[') == []
+    for _ in range(200):
+        assert testee.feed(chunk) == []
+
+    # Every byte is scanned for the newline and the compact frame marker once, not once per chunk
+    assert testee._buffer.scanned <= 2 * (6 + 200 * len(chunk))
+    assert testee.feed(b'0]}\n') == [b'{"a":[' + 200 * chunk + b'0]}']
+
+def test_multiple_frames_in_one_chunk():
+    testee = LineFramer()
+
+    frames = testee.feed(b'{"a":1}\n{"b":2}\r\n{"c":3}\n')
+
+    assert frames == [b'{"a":1}', b'{"b":2}\r', b'{"c":3}']
+    assert testee.frame_count == 3
+
+def test_blank_lines_ignored():
+    testee = LineFramer()
+
+    frames = testee.feed(b'\n\r\n  \n{"a":1}\n')
+
+    assert frames == [b'{"a":1}']
+    assert testee.garbage_count == 0
+
+def test_oversize_complete_line_dropped():
+    testee = LineFramer(max_line_length=10)
+
+    frames = testee.feed(b'{"a":"0123456789"}\n{"b":2}\n')
+
+    assert frames == [b'{"b":2}']
+    assert testee.oversize_count == 1
+
+def test_oversize_unterminated_line_resyncs():
+    testee = LineFramer(max_line_length=10)
+
+    assert testee.feed(b'{"a":"01234567') == []
+    assert testee.oversize_count == 1
+    assert testee.buffered_bytes == 0
+
+    # Remainder of the oversize line must be discarded, even if it arrives in multiple chunks
+    assert testee.feed(b'89abcdef') == []
+    assert testee.feed(b'ghij"}\n{"b":2}\n') == [b'{"b":2}']
+    assert testee.oversize_count == 1
+
+def test_garbage_dropped():
+    testee = LineFramer()
+
+    frames = testee.feed(b'\x7f\xff\xfe noise\n{"a":1}\n')
+
+    assert frames == [b'{"a":1}']
+    assert testee.garbage_count == 1
+
+def test_garbage_prefix_stripped():
+    testee = LineFramer()
+
+    frames = testee.feed(b'\x7f\xff{"a":1}\n')
+
+    assert frames == [b'{"a":1}']
+    assert testee.garbage_count == 1
+
+def test_reset():
+    testee = LineFramer()
+
+    testee.feed(b'{"a":')
+    testee.reset()
+
+    assert testee.feed(b'{"b":2}\n') == [b'{"b":2}']
+
+def test_compact_frames():
+    testee = LineFramer()
+
+    frames = testee.feed(b'\x00' + cobs_encode(b'\x05\x00abc') + b'\x00\x00' + cobs_encode(b'\x01'))
+    assert frames == [b'\x05\x00abc']
+
+    frames = testee.feed(b'\x00')
+    assert frames == [b'\x01']
+
+def test_mixed_framing():
+    testee = LineFramer()
+
+    frames = testee.feed(b'{"a":1}\n\x00' + cobs_encode(b'\x02') + b'\x00{"b":2}\n')
+
+    assert frames == [b'{"a":1}', b'\x02', b'{"b":2}']
+
+def test_compact_frame_interrupts_unterminated_line():
+    testee = LineFramer()
+
+    frames = testee.feed(b'{"a":\x00' + cobs_encode(b'\x02') + b'\x00')
+
+    assert frames == [b'{"a":', b'\x02']
+
+def test_invalid_compact_frame_dropped():
+    testee = LineFramer()
+
+    # Valid type code, but the COBS code points beyond the terminator
+    frames = testee.feed(b'\x00\x05\x01b\x00{"a":1}\n')
+
+    assert frames == [b'{"a":1}']
+    assert testee.garbage_count == 1
+
+def test_noise_marker_recovers_json_lines():
+    testee = LineFramer()
+    lines = [b'{"idx":%03d}' % idx for idx in range(100)]
+
+    # A noise zero byte must not swallow the following JSON lines
+    frames = testee.feed(b'\x00' + b'\n'.join(lines) + b'\n')
+
+    assert frames == lines
+    assert testee.garbage_count == 1
+
+def test_stray_marker_does_not_hold_back_json_lines():
+    testee = LineFramer()
+
+    assert testee.feed(b'\x00') == []
+    assert testee.feed(b'{"type":"SHUTDOWN"}\n') == [b'{"type":"SHUTDOWN"}']
+    assert testee.garbage_count == 1
+
+def test_stray_marker_before_compact_frame():
+    testee = LineFramer()
+
+    frames = testee.feed(b'{"a":1}\n\x00\x00' + cobs_encode(b'\x01') + b'\x00{"b":2}\n')
+
+    assert frames == [b'{"a":1}', b'\x01', b'{"b":2}']
@@ -56,3 +56,53 @@ async def test_shutdown_inhibit_status_api(test_client, write_serial_input):
     assert response.status_code == 200
     assert abs(float(response.json()['remaining_runtime_s']) - 2) < 0.1
     assert bool(response.json()['shutdown_in_progress']) == True
+
+@pytest.mark.asyncio
+async def test_link_status_api(test_client, write_serial_input):
+    response = await test_client.get('/link/status')
+    assert response.status_code == 200
+    assert response.json()['state'] == 'UNKNOWN'
+
+    await write_serial_input(b'{"type":"HEARTBEAT","version":"0.0.3"}\n')
+    await asyncio.sleep(0.01)
+
+    response = await test_client.get('/link/status')
+    assert response.json()['state'] == 'UP'
+    assert response.json()['firmware_version'] == '0.0.3'
+    assert response.json()['seconds_since_last_heartbeat'] < 0.1
+
+@pytest.mark.asyncio
+async def test_logs_api(test_client, write_serial_input):
+    await write_serial_input(b'{"type":"LOG","level":"INFO","message":"first"}\n{"type":"LOG","level":"ERROR","message":"second"}\n{"type":"LOG","level":"DEBUG","message":"third"}\n')
+    await asyncio.sleep(0.05)
+
+    response = await test_client.get('/logs')
+    assert response.status_code == 200
+    assert [r['message'] for r in response.json()] == ['first', 'second', 'third']
+
+    response = await test_client.get('/logs', params={'after': response.json()[0]['seq'], 'limit': 1})
+    assert [r['message'] for r in response.json()] == ['second']
+
+    response = await test_client.get('/logs', params={'min_level': 'WARNING'})
+    assert [r['message'] for r in response.json()] == ['second']
+
+@pytest.mark.asyncio
+async def test_shutdown_leases_api(test_client, write_serial_input):
+    await write_serial_input(b'{"type":"SHUTDOWN"}\n')
+    await asyncio.sleep(0.01)
+
+    assert (await test_client.put('/shutdown/leases/uploader/3')).status_code == 204
+    assert (await test_client.put('/shutdown/leases/recorder/2')).status_code == 204
+    assert (await test_client.put('/shutdown/leases/recorder/-1')).status_code == 400
+
+    response = await test_client.get('/shutdown/leases')
+    assert sorted(lease['client_id'] for lease in response.json()) == ['recorder', 'uploader']
+    response = await test_client.get('/shutdown/status')
+    assert abs(response.json()['remaining_runtime_s'] - 3) < 0.1
+
+    assert (await test_client.delete('/shutdown/leases/uploader')).status_code == 204
+    assert (await test_client.delete('/shutdown/leases/uploader')).status_code == 404
+
+    response = await test_client.get('/shutdown/status')
+    assert abs(response.json()['remaining_runtime_s'] - 2) < 0.1
+    assert [lease['client_id'] for lease in (await test_client.get('/shutdown/leases')).json()] == ['recorder']
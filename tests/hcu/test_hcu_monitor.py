@@ -85,4 +85,142 @@ async def test_shutdown_failing(make_hcu_skill, write_serial_input):
     )
 
     await write_serial_input(b'{"type":"SHUTDOWN"}\n')
-    await asyncio.sleep(0.2)
\ No newline at end of file
+    await asyncio.sleep(0.2)
+
+
+@pytest.mark.asyncio
+async def test_reconnect_after_connection_lost(tmp_shutdown_file, serial_device_path_mock, unused_tcp_port):
+    connections = []
+    server = await asyncio.start_server(lambda _, writer: connections.append(writer), '127.0.0.1', unused_tcp_port)
+
+    skill = HcuSkill(HcuControllerConfig(
+        enabled=True,
+        serial_device=serial_device_path_mock,
+        serial_baud_rate=9600,
+        shutdown_command=['touch', str(tmp_shutdown_file)],
+        shutdown_delay_s=0,
+        serial_reconnect_min_s=0.1,
+    ))
+    await skill.run()
+    await asyncio.sleep(0.1)
+    assert len(connections) == 1
+
+    connections[0].close()
+    await asyncio.sleep(0.5)
+    assert len(connections) == 2
+
+    connections[1].write(b'{"type":"SHUTDOWN"}\n')
+    await connections[1].drain()
+    await asyncio.sleep(0.2)
+    assert tmp_shutdown_file.exists()
+
+    await skill.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_backoff(tmp_shutdown_file, serial_device_path_mock, unused_tcp_port):
+    skill = HcuSkill(HcuControllerConfig(
+        enabled=True,
+        serial_device=serial_device_path_mock,
+        serial_baud_rate=9600,
+        shutdown_command=['touch', str(tmp_shutdown_file)],
+        serial_reconnect_min_s=0.1,
+        serial_reconnect_max_s=0.2,
+    ))
+    # Start without a serial device being available
+    await skill.run()
+    await asyncio.sleep(0.1)
+
+    connections = []
+    server = await asyncio.start_server(lambda _, writer: connections.append(writer), '127.0.0.1', unused_tcp_port)
+    await asyncio.sleep(0.4)
+    assert len(connections) == 1
+
+    await skill.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_backoff_for_dropping_connection(tmp_shutdown_file, serial_device_path_mock, unused_tcp_port):
+    connections = []
+
+    def accept_and_drop(_, writer):
+        connections.append(writer)
+        writer.close()
+
+    server = await asyncio.start_server(accept_and_drop, '127.0.0.1', unused_tcp_port)
+    skill = HcuSkill(HcuControllerConfig(
+        enabled=True,
+        serial_device=serial_device_path_mock,
+        serial_baud_rate=9600,
+        shutdown_command=['touch', str(tmp_shutdown_file)],
+        serial_reconnect_min_s=0.2,
+        serial_reconnect_max_s=1,
+    ))
+    await skill.run()
+    # Reopened 0.2s, 0.4s, 0.8s, ... after the connection dropped instead of right away
+    await asyncio.sleep(1.5)
+    assert 2 <= len(connections) <= 3
+
+    await skill.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_reopen_on_heartbeat_lost(tmp_shutdown_file, serial_device_path_mock, unused_tcp_port):
+    connections = []
+    server = await asyncio.start_server(lambda _, writer: connections.append(writer), '127.0.0.1', unused_tcp_port)
+
+    skill = HcuSkill(HcuControllerConfig(
+        enabled=True,
+        serial_device=serial_device_path_mock,
+        serial_baud_rate=9600,
+        shutdown_command=['touch', str(tmp_shutdown_file)],
+        heartbeat_degraded_timeout_s=0.1,
+        heartbeat_lost_timeout_s=0.3,
+        serial_reconnect_min_s=0.1,
+    ))
+    await skill.run()
+    await asyncio.sleep(0.1)
+    assert len(connections) == 1
+    connections[0].write(b'{"type":"HEARTBEAT"}\n')
+    await connections[0].drain()
+
+    # The HCU goes silent, the serial port must be reopened once
+    await asyncio.sleep(1)
+    assert len(connections) == 2
+    await asyncio.sleep(0.5)
+    assert len(connections) == 2
+
+    await skill.close()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_no_reopen_without_heartbeats(tmp_shutdown_file, serial_device_path_mock, unused_tcp_port):
+    connections = []
+    server = await asyncio.start_server(lambda _, writer: connections.append(writer), '127.0.0.1', unused_tcp_port)
+
+    skill = HcuSkill(HcuControllerConfig(
+        enabled=True,
+        serial_device=serial_device_path_mock,
+        serial_baud_rate=9600,
+        shutdown_command=['touch', str(tmp_shutdown_file)],
+        heartbeat_degraded_timeout_s=0.1,
+        heartbeat_lost_timeout_s=0.2,
+        serial_reconnect_min_s=0.1,
+    ))
+    await skill.run()
+
+    # Firmware that does not send heartbeats keeps its serial connection
+    await asyncio.sleep(0.8)
+    assert len(connections) == 1
+
+    await skill.close()
+    server.close()
+    await server.wait_closed()
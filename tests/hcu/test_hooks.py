@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from msu_manager.config import PreShutdownHookConfig
+from msu_manager.hcu.controller import HcuController
+from msu_manager.hcu.hooks import HookResult, run_pre_shutdown_hooks
+
+
+@pytest.mark.asyncio
+async def test_hooks_run_concurrently():
+    hooks = [PreShutdownHookConfig(name=f'sleep{i}', command=['sleep', '0.3']) for i in range(3)]
+
+    start = time.monotonic()
+    outcomes = await run_pre_shutdown_hooks(hooks, deadline_s=5)
+
+    assert time.monotonic() - start < 0.8
+    assert [o.result for o in outcomes] == [HookResult.SUCCESS] * 3
+
+
+@pytest.mark.asyncio
+async def test_hook_results():
+    hooks = [
+        PreShutdownHookConfig(name='ok', command=['true']),
+        PreShutdownHookConfig(name='failing', command=['false']),
+        PreShutdownHookConfig(name='slow', command=['sleep', '5'], timeout_s=0.2),
+        PreShutdownHookConfig(name='very_slow', command=['sleep', '5'], timeout_s=10),
+    ]
+
+    start = time.monotonic()
+    outcomes = await run_pre_shutdown_hooks(hooks, deadline_s=0.5)
+
+    assert time.monotonic() - start < 1
+    assert {o.name: o.result for o in outcomes} == {
+        'ok': HookResult.SUCCESS,
+        'failing': HookResult.FAILED,
+        'slow': HookResult.TIMEOUT,
+        'very_slow': HookResult.DEADLINE_EXCEEDED,
+    }
+
+
+@pytest.mark.asyncio
+async def test_no_hooks():
+    assert await run_pre_shutdown_hooks([], deadline_s=1) == []
+
+
+@pytest.mark.asyncio
+async def test_hooks_run_before_shutdown_command(tmp_path):
+    hook_file = tmp_path / 'hook_executed'
+    shutdown_file = tmp_path / 'shutdown_executed'
+    hooks = [PreShutdownHookConfig(name='touch', command=['sh', '-c', f'sleep 0.2 && touch {hook_file}'])]
+    controller = HcuController(['sh', '-c', f'test -f {hook_file} && touch {shutdown_file}'], 0.1, pre_shutdown_hooks=hooks)
+
+    await controller.handle_shutdown()
+    await asyncio.sleep(0.6)
+
+    assert hook_file.exists()
+    assert shutdown_file.exists()
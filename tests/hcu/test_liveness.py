@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from msu_manager.hcu.liveness import LinkState, LivenessTracker
+
+
+@pytest.mark.asyncio
+async def test_state_transitions():
+    lost_calls = []
+    testee = LivenessTracker(degraded_timeout_s=0.1, lost_timeout_s=0.2, on_lost=lambda: lost_calls.append(True))
+    testee.start()
+
+    assert testee.state == LinkState.UNKNOWN
+
+    testee.heartbeat('1.0.0')
+    assert testee.state == LinkState.UP
+    assert testee.firmware_version == '1.0.0'
+
+    await asyncio.sleep(0.15)
+    assert testee.state == LinkState.DEGRADED
+
+    await asyncio.sleep(0.1)
+    assert testee.state == LinkState.LOST
+    assert len(lost_calls) == 1
+
+    # on_lost is called once per loss
+    await asyncio.sleep(0.3)
+    assert len(lost_calls) == 1
+
+    testee.heartbeat()
+    assert testee.state == LinkState.UP
+    assert testee.firmware_version == '1.0.0'
+
+    await asyncio.sleep(0.25)
+    assert testee.state == LinkState.LOST
+    assert len(lost_calls) == 2
+
+    testee.stop()
+
+@pytest.mark.asyncio
+async def test_regular_heartbeats_keep_link_up():
+    testee = LivenessTracker(degraded_timeout_s=0.1, lost_timeout_s=0.2)
+    testee.start()
+
+    for _ in range(10):
+        testee.heartbeat()
+        await asyncio.sleep(0.05)
+        assert testee.state == LinkState.UP
+
+    testee.stop()
+
+@pytest.mark.asyncio
+async def test_never_lost_without_any_heartbeat():
+    lost_calls = []
+    testee = LivenessTracker(degraded_timeout_s=0.05, lost_timeout_s=0.1, on_lost=lambda: lost_calls.append(True))
+    testee.start()
+
+    await asyncio.sleep(0.25)
+    assert testee.state == LinkState.UNKNOWN
+    assert testee.seconds_since_last_heartbeat is None
+    assert lost_calls == []
+
+    testee.stop()
+
+@pytest.mark.asyncio
+async def test_degraded_recovers_in_time():
+    testee = LivenessTracker(degraded_timeout_s=0.05, lost_timeout_s=1)
+    testee.start()
+    testee.heartbeat()
+
+    await asyncio.sleep(0.08)
+    assert testee.state == LinkState.DEGRADED
+
+    testee.heartbeat()
+    await asyncio.sleep(0.03)
+    assert testee.state == LinkState.UP
+    await asyncio.sleep(0.05)
+    assert testee.state == LinkState.DEGRADED
+
+    testee.stop()
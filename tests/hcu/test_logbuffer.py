@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from msu_manager.broadcast import Broadcaster
+from msu_manager.hcu.logbuffer import HcuLogBuffer, level_number
+
+
+def test_level_number():
+    assert level_number('info') == level_number('INFO') == 20
+    assert level_number('WARN') == 30
+    assert level_number('bogus') == 20
+
+
+def test_capacity_is_bounded():
+    buffer = HcuLogBuffer(capacity=3)
+    for i in range(10):
+        buffer.append('INFO', f'message {i}')
+
+    assert buffer.size == 3
+    assert [r.message for r in buffer.get()] == ['message 7', 'message 8', 'message 9']
+    assert [r.seq for r in buffer.get()] == [8, 9, 10]
+
+
+def test_paging():
+    buffer = HcuLogBuffer(capacity=10)
+    for i in range(5):
+        buffer.append('INFO', f'message {i}')
+
+    page = buffer.get(after_seq=0, limit=2)
+    assert [r.message for r in page] == ['message 0', 'message 1']
+    page = buffer.get(after_seq=page[-1].seq, limit=2)
+    assert [r.message for r in page] == ['message 2', 'message 3']
+    page = buffer.get(after_seq=page[-1].seq, limit=2)
+    assert [r.message for r in page] == ['message 4']
+    assert buffer.get(after_seq=page[-1].seq) == []
+
+
+def test_level_filtering():
+    buffer = HcuLogBuffer(min_level='INFO')
+    buffer.append('DEBUG', 'not kept')
+    buffer.append('INFO', 'info')
+    buffer.append('ERROR', 'error')
+
+    assert [r.message for r in buffer.get()] == ['info', 'error']
+    assert [r.message for r in buffer.get(min_level='WARNING')] == ['error']
+
+
+@pytest.mark.asyncio
+async def test_stream():
+    buffer = HcuLogBuffer()
+    buffer.append('INFO', 'before subscription')
+
+    stream = buffer.stream(min_level='INFO')
+    next_event = asyncio.create_task(anext(stream))
+    await asyncio.sleep(0)
+
+    buffer.append('DEBUG', 'filtered')
+    buffer.append('INFO', 'after subscription')
+
+    event = await asyncio.wait_for(next_event, 1)
+    assert event.startswith('id: 3\ndata: ')
+    assert event.endswith('\n\n')
+    assert json.loads(event.split('data: ')[1])['message'] == 'after subscription'
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_from_last_event_id():
+    buffer = HcuLogBuffer()
+    for i in range(3):
+        buffer.append('INFO', f'message {i}')
+
+    stream = buffer.stream(last_seq=1)
+    events = [await asyncio.wait_for(anext(stream), 1) for _ in range(2)]
+    assert [json.loads(e.split('data: ')[1])['message'] for e in events] == ['message 1', 'message 2']
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_resume_while_appending():
+    buffer = HcuLogBuffer(capacity=3)
+    for i in range(3):
+        buffer.append('INFO', f'message {i}')
+
+    stream = buffer.stream(last_seq=0)
+    seqs = []
+    for _ in range(6):
+        event = await asyncio.wait_for(anext(stream), 1)
+        seqs.append(int(event.split('\n')[0][4:]))
+        # Rotates the buffer while the backlog is being consumed
+        buffer.append('INFO', f'message {len(seqs) + 2}')
+    assert seqs == [1, 2, 3, 4, 5, 6]
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_broadcaster_drops_oldest_for_slow_subscriber():
+    broadcaster = Broadcaster(queue_size=2)
+    async with broadcaster.subscribe() as queue:
+        assert broadcaster.subscriber_count == 1
+        for i in range(5):
+            broadcaster.publish(i)
+        assert queue.dropped == 3
+        assert [queue.get_nowait(), queue.get_nowait()] == [3, 4]
+    assert not broadcaster.has_subscribers
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from msu_manager.hcu.metrics import MetricIngestor
+
+
+def gauge_value(key: str) -> float | None:
+    return REGISTRY.get_sample_value('hcu_metric', {'key': key})
+
+def rejected_count(reason: str) -> float:
+    return REGISTRY.get_sample_value('hcu_metric_rejected_total', {'reason': reason}) or 0
+
+
+@pytest.mark.asyncio
+async def test_immediate_export():
+    testee = MetricIngestor(coalesce_window_s=0)
+
+    testee.ingest('test_immediate', '42.5')
+
+    assert gauge_value('test_immediate') == 42.5
+
+@pytest.mark.asyncio
+async def test_coalescing_last_write_wins():
+    testee = MetricIngestor(coalesce_window_s=0.05)
+
+    testee.ingest('test_coalesce', '1')
+    testee.ingest('test_coalesce', '2')
+    testee.ingest('test_coalesce', '3')
+
+    assert gauge_value('test_coalesce') == 0
+
+    await asyncio.sleep(0.1)
+
+    assert gauge_value('test_coalesce') == 3
+
+@pytest.mark.asyncio
+async def test_non_numeric_rejected():
+    testee = MetricIngestor(coalesce_window_s=0)
+    rejected_before = rejected_count('not_numeric')
+
+    testee.ingest('test_non_numeric', '1.5')
+    testee.ingest('test_non_numeric', 'abc')
+
+    assert gauge_value('test_non_numeric') == 1.5
+    assert rejected_count('not_numeric') == rejected_before + 1
+
+@pytest.mark.asyncio
+async def test_allowlist():
+    testee = MetricIngestor(coalesce_window_s=0, key_allowlist=['test_allowed'])
+    rejected_before = rejected_count('not_allowed')
+
+    testee.ingest('test_allowed', '1')
+    testee.ingest('test_not_allowed', '1')
+
+    assert gauge_value('test_allowed') == 1
+    assert gauge_value('test_not_allowed') is None
+    assert rejected_count('not_allowed') == rejected_before + 1
+
+@pytest.mark.asyncio
+async def test_max_keys():
+    testee = MetricIngestor(coalesce_window_s=0, max_keys=2)
+    rejected_before = rejected_count('max_keys_exceeded')
+
+    testee.ingest('test_max_keys_0', '1')
+    testee.ingest('test_max_keys_1', '1')
+    testee.ingest('test_max_keys_2', '1')
+    testee.ingest('test_max_keys_0', '2')
+
+    assert testee.key_count == 2
+    assert gauge_value('test_max_keys_0') == 2
+    assert gauge_value('test_max_keys_2') is None
+    assert rejected_count('max_keys_exceeded') == rejected_before + 1
+
+@pytest.mark.asyncio
+async def test_non_numeric_does_not_register_key():
+    testee = MetricIngestor(coalesce_window_s=0, max_keys=1)
+
+    testee.ingest('test_non_numeric_key', 'abc')
+    testee.ingest('test_numeric_key', '1')
+
+    assert testee.key_count == 1
+    assert gauge_value('test_non_numeric_key') is None
+    assert gauge_value('test_numeric_key') == 1
@@ -0,0 +1,47 @@
+from msu_manager.hcu.compact import encode_compact_message
+from msu_manager.hcu.messages import MetricMessage, ShutdownMessage
+from msu_manager.hcu.protocol import HcuProtocol
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.messages = []
+
+    def submit(self, message):
+        self.messages.append(message)
+
+
+def test_messages_submitted():
+    dispatcher = RecordingDispatcher()
+    testee = HcuProtocol(dispatcher=dispatcher)
+
+    testee.data_received(b'{"type":"SHUTDOWN"}\n{"type":"METRIC","key":"temp0",')
+    testee.data_received(b'"value":"42.0"}\n')
+
+    assert [type(m) for m in dispatcher.messages] == [ShutdownMessage, MetricMessage]
+
+def test_invalid_messages_rejected():
+    dispatcher = RecordingDispatcher()
+    testee = HcuProtocol(dispatcher=dispatcher)
+
+    # None of these must raise out of data_received()
+    testee.data_received(b'{"type":"UNKNOWN"}\n')
+    testee.data_received(b'{"type":"METRIC","key":"temp0"}\n')
+    testee.data_received(b'{"type":"LOG", broken json\n')
+    testee.data_received(b'{"type":"LOG","level":"info","message":"\xff\xfe"}\n')
+    testee.data_received(b'{"type":"RESUME"}\n')
+
+    assert [m.type for m in dispatcher.messages] == ['RESUME']
+
+def test_compact_messages_submitted():
+    dispatcher = RecordingDispatcher()
+    testee = HcuProtocol(dispatcher=dispatcher)
+
+    testee.data_received(encode_compact_message(MetricMessage(type='METRIC', key='temp0', value='42.0')))
+    testee.data_received(b'{"type":"RESUME"}\n')
+    testee.data_received(encode_compact_message(ShutdownMessage(type='SHUTDOWN')))
+    # Valid COBS, but unknown type code
+    testee.data_received(b'\x00\x02\x09\x00')
+
+    assert [m.type for m in dispatcher.messages] == ['METRIC', 'RESUME', 'SHUTDOWN']
+    assert dispatcher.messages[0].value == '42.0'
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+from msu_manager.hcu.messages import MetricMessage, ShutdownMessage
+from msu_manager.hcu.replay import (RecordingError, RecordingWriter,
+                                   read_recording, replay)
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.messages = []
+
+    def submit(self, message):
+        self.messages.append(message)
+
+    @property
+    def queue_depth(self) -> int:
+        return 0
+
+
+def test_recording_roundtrip():
+    file = io.BytesIO()
+    writer = RecordingWriter(file)
+    writer.write(100.0, b'{"type":')
+    writer.write(100.25, b'"SHUTDOWN"}\n')
+    writer.write(101.5, b'')
+
+    file.seek(0)
+    chunks = list(read_recording(file))
+
+    assert chunks == [(0.0, b'{"type":'), (0.25, b'"SHUTDOWN"}\n'), (1.5, b'')]
+
+def test_invalid_recording():
+    with pytest.raises(RecordingError):
+        list(read_recording(io.BytesIO(b'not a recording')))
+
+def test_truncated_recording():
+    file = io.BytesIO()
+    RecordingWriter(file).write(0, b'{"type":"SHUTDOWN"}\n')
+
+    with pytest.raises(RecordingError):
+        list(read_recording(io.BytesIO(file.getvalue()[:-3])))
+
+@pytest.mark.asyncio
+async def test_replay(tmp_path):
+    recording = tmp_path / 'hcu.rec'
+    with open(recording, 'wb') as file:
+        writer = RecordingWriter(file)
+        writer.write(0, b'{"type":"METRIC","key":"temp0","value":"1"}\n{"type":')
+        writer.write(0.1, b'"SHUTDOWN"}\n')
+        writer.write(0.2, b'\xff\xff noise\n')
+
+    dispatcher = RecordingDispatcher()
+    stats = await replay(recording, dispatcher, speed=2)
+
+    assert [type(m) for m in dispatcher.messages] == [MetricMessage, ShutdownMessage]
+    assert stats.chunks == 3
+    assert stats.frames == 2
+    assert stats.garbage_frames == 1
+    assert 0.1 <= stats.duration_s < 0.5
+
+@pytest.mark.asyncio
+async def test_replay_drain_timeout(tmp_path):
+    recording = tmp_path / 'hcu.rec'
+    with open(recording, 'wb') as file:
+        RecordingWriter(file).write(0, b'{"type":"SHUTDOWN"}\n')
+
+    class StuckDispatcher(RecordingDispatcher):
+        @property
+        def queue_depth(self) -> int:
+            return 1
+
+    stats = await replay(recording, StuckDispatcher(), speed=0, drain_timeout_s=0.2)
+
+    assert stats.frames == 1
+    assert stats.duration_s < 1
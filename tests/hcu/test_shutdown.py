@@ -1,8 +1,11 @@
+import asyncio
 import time
 
 import pytest
 
-from msu_manager.hcu.shutdown import ShutdownError, ShutdownModel
+from msu_manager.hcu.controller import HcuController
+from msu_manager.hcu.leases import LeaseTable
+from msu_manager.hcu.shutdown import ShutdownError, ShutdownModel, ShutdownPhase
 
 
 def test_start():
@@ -111,3 +114,98 @@ def test_shutdown_start_inhibit_reset_start():
 
     assert abs(testee.time_remaining - 20) < 0.1
     assert testee.is_active == True
+
+
+def test_clock_is_injectable():
+    now = 100.0
+    testee = ShutdownModel(10, clock=lambda: now)
+
+    testee.start()
+    testee.inhibit(5)
+    assert testee.deadline == 110
+    assert testee.time_remaining == 10
+
+    now = 108.0
+    testee.inhibit(5)
+    assert testee.deadline == 113
+    assert testee.time_remaining == 5
+
+
+@pytest.mark.asyncio
+async def test_controller_inhibit_reschedules_without_new_task(tmp_path):
+    shutdown_file = tmp_path / 'shutdown_executed'
+    controller = HcuController(['touch', str(shutdown_file)], 0.2)
+
+    await controller.handle_shutdown()
+    assert controller.shutdown_phase == ShutdownPhase.SCHEDULED
+    assert controller._shutdown_task is None
+
+    # Concurrent inhibit requests only move the deadline
+    for seconds in (1, 0.5, 0.6):
+        controller.inhibit_shutdown(seconds)
+    assert controller._shutdown_task is None
+    assert abs(controller.remaining_shutdown_time - 0.6) < 0.05
+
+    await asyncio.sleep(0.4)
+    assert not shutdown_file.exists()
+    await asyncio.sleep(0.5)
+    assert shutdown_file.exists()
+    assert controller.shutdown_phase == ShutdownPhase.IDLE
+    assert controller.remaining_shutdown_time is None
+
+
+@pytest.mark.asyncio
+async def test_controller_inhibit_can_shorten_deadline(tmp_path):
+    shutdown_file = tmp_path / 'shutdown_executed'
+    controller = HcuController(['touch', str(shutdown_file)], 0.1)
+
+    controller.inhibit_shutdown(5)
+    await controller.handle_shutdown()
+    controller.inhibit_shutdown(0.2)
+
+    await asyncio.sleep(0.4)
+    assert shutdown_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_controller_resume_cancels_timer(tmp_path):
+    shutdown_file = tmp_path / 'shutdown_executed'
+    controller = HcuController(['touch', str(shutdown_file)], 0.1)
+
+    await controller.handle_shutdown()
+    await controller.handle_resume()
+    assert controller.shutdown_phase == ShutdownPhase.IDLE
+
+    await asyncio.sleep(0.3)
+    assert not shutdown_file.exists()
+
+
+def test_latest_lease_wins():
+    now = 100.0
+    testee = ShutdownModel(10, clock=lambda: now)
+
+    testee.start()
+    testee.inhibit(30, 'uploader')
+    testee.inhibit(20, 'recorder')
+    assert testee.deadline == 130
+
+    testee.release_inhibit('uploader')
+    assert testee.deadline == 120
+
+    testee.inhibit(5, 'recorder')
+    assert testee.deadline == 110
+    assert testee.inhibit_leases == {'recorder': 5}
+
+    now = 106.0
+    assert testee.inhibit_leases == {}
+    assert testee.is_inhibited == False
+
+
+def test_lease_renewals_keep_heap_bounded():
+    testee = LeaseTable()
+    for _ in range(1000):
+        testee.acquire('uploader', 10)
+        testee.acquire('recorder', 5)
+
+    assert len(testee._heap) < 100
+    assert set(testee.active()) == {'uploader', 'recorder'}
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from msu_manager.hcu import state as state_module
+from msu_manager.hcu.controller import HcuController
+from msu_manager.hcu.shutdown import ShutdownPhase
+from msu_manager.hcu.state import PersistedHcuState, StateStore
+
+
+def test_save_load(tmp_path):
+    store = StateStore(tmp_path / 'state.json')
+    assert store.load() is None
+
+    store.save(PersistedHcuState(ignition_state='off', shutdown_phase=ShutdownPhase.SCHEDULED, shutdown_timer_expiry=42.0, inhibit_leases={'uploader': 50.0}))
+
+    state = StateStore(tmp_path / 'state.json').load()
+    assert state.ignition_state == 'off'
+    assert state.shutdown_phase == ShutdownPhase.SCHEDULED
+    assert state.shutdown_timer_expiry == 42.0
+    assert state.inhibit_leases == {'uploader': 50.0}
+    assert [p.name for p in tmp_path.iterdir()] == ['state.json']
+
+
+def test_corrupt_file_is_ignored(tmp_path):
+    (tmp_path / 'state.json').write_text('{"ignition_st')
+    assert StateStore(tmp_path / 'state.json').load() is None
+
+
+def test_state_from_previous_boot_is_ignored(tmp_path, monkeypatch):
+    StateStore(tmp_path / 'state.json').save(PersistedHcuState(ignition_state='off'))
+
+    monkeypatch.setattr(state_module, 'read_boot_id', lambda: 'another-boot')
+    assert StateStore(tmp_path / 'state.json').load() is None
+
+
+@pytest.mark.asyncio
+async def test_pending_shutdown_survives_restart(tmp_path):
+    shutdown_file = tmp_path / 'shutdown_executed'
+    state_file = tmp_path / 'state.json'
+
+    controller = HcuController(['touch', str(shutdown_file)], 0.3, state_store=StateStore(state_file))
+    await controller.handle_shutdown()
+    controller.inhibit_shutdown(0.5, 'uploader')
+    await asyncio.sleep(0.1)
+    # Simulate a crash, i.e. the timer is gone without any cleanup
+    controller._shutdown_timer.cancel()
+
+    restarted = HcuController(['touch', str(shutdown_file)], 0.3, state_store=StateStore(state_file))
+    restarted.restore_state()
+    assert restarted.ignition_state == 'off'
+    assert restarted.shutdown_phase == ShutdownPhase.SCHEDULED
+    assert abs(restarted.remaining_shutdown_time - 0.4) < 0.05
+    assert 'uploader' in restarted.shutdown_inhibit_leases
+
+    await asyncio.sleep(0.6)
+    assert shutdown_file.exists()
+    assert StateStore(state_file).load().shutdown_phase == ShutdownPhase.IDLE
+
+
+@pytest.mark.asyncio
+async def test_resumed_shutdown_is_not_restored(tmp_path):
+    state_file = tmp_path / 'state.json'
+
+    controller = HcuController(['true'], 10, state_store=StateStore(state_file))
+    await controller.handle_shutdown()
+    await controller.handle_resume()
+
+    restarted = HcuController(['true'], 10, state_store=StateStore(state_file))
+    restarted.restore_state()
+    assert restarted.ignition_state == 'on'
+    assert not restarted.is_shutdown_scheduled
+
+
+@pytest.mark.asyncio
+async def test_ignition_listener():
+    controller = HcuController(['true'], 10)
+    states = []
+    controller.add_ignition_listener(states.append)
+
+    await controller.handle_shutdown()
+    await controller.handle_shutdown()
+    await controller.handle_resume()
+
+    assert states == ['unknown', 'off', 'on']
@@ -1,3 +1,5 @@
+import asyncio
+
 from msu_manager.command import run_command, run_sudo_command
 
 import pytest
@@ -33,4 +35,13 @@ async def test_run_sudo_command_failing_noargs():
 @pytest.mark.asyncio
 async def test_run_command_raise_on_fail():
     with pytest.raises(IOError):
-        await run_command(('false',), raise_on_fail=True)
\ No newline at end of file
+        await run_command(('false',), raise_on_fail=True)
+
+
+@pytest.mark.asyncio
+async def test_run_command_timeout_kills_process(tmp_path):
+    marker = tmp_path / 'marker'
+    with pytest.raises(asyncio.TimeoutError):
+        await run_command(('sh', '-c', f'sleep 0.5 && touch {marker}'), timeout_s=0.1)
+    await asyncio.sleep(0.6)
+    assert not marker.exists()
@@ -2,8 +2,9 @@ import pytest
 from pydantic_core import ValidationError
 
 from msu_manager.hcu.messages import (HeartbeatMessage, LogMessage,
+                                      MessageType, MetricMessage,
                                       ResumeMessage, ShutdownMessage,
-                                      validate_json_message,
+                                      peek_message_type, validate_json_message,
                                       validate_python_message)
 
 
@@ -64,4 +65,20 @@ def test_json_parsing():
     }
     ''')
     assert isinstance(m, ShutdownMessage)
-    assert m.type == 'SHUTDOWN'
\ No newline at end of file
+    assert m.type == 'SHUTDOWN'
+
+def test_json_bytes_parsing_with_known_type():
+    m = validate_json_message(b'{"type": "METRIC", "key": "temp0", "value": "42.0"}', MessageType.METRIC)
+    assert isinstance(m, MetricMessage)
+    assert m.key == 'temp0'
+
+def test_json_parsing_with_wrong_type():
+    with pytest.raises(ValidationError):
+        validate_json_message(b'{"type": "SHUTDOWN"}', MessageType.METRIC)
+
+def test_peek_message_type():
+    assert peek_message_type(b'{"type":"SHUTDOWN"}') == MessageType.SHUTDOWN
+    assert peek_message_type(b'{ "level": "info", "type" : "LOG", "message": "type" }') == MessageType.LOG
+    assert peek_message_type(b'{"type":"invalid_message"}') is None
+    assert peek_message_type(b'{"type":"UNKNOWN"}') is None
+    assert peek_message_type(b'{"key":"value"}') is None